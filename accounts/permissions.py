@@ -0,0 +1,81 @@
+"""
+Per-request permissions.
+
+The role checks in accounts.utils are resolved once into a
+PermissionContext; after that, "may this user manage this row" is an id
+comparison, and "which rows may they see" is VisibleQuerySet.visible_to(),
+shared by the Tables, graphs and dashboard views.
+"""
+from dataclasses import dataclass
+
+from django.db import models
+
+from .utils import can_access_tables, can_add_records, can_view_all, is_staff_role
+
+
+@dataclass(frozen=True)
+class PermissionContext:
+    user_id: int | None
+    view_all: bool          # admin/manager: every row
+    manage_own: bool        # staff: rows they created
+    access_tables: bool
+    add_records: bool
+
+    @classmethod
+    def for_user(cls, user) -> "PermissionContext":
+        authenticated = user.is_authenticated
+        return cls(
+            user_id=user.pk if authenticated else None,
+            view_all=authenticated and can_view_all(user),
+            manage_own=authenticated and is_staff_role(user),
+            access_tables=can_access_tables(user),
+            add_records=authenticated and can_add_records(user),
+        )
+
+    def _owner_id(self, obj):
+        owner_field = getattr(type(obj), "OWNER_FIELD", None)
+        return getattr(obj, f"{owner_field}_id", None) if owner_field else None
+
+    def can_view(self, obj) -> bool:
+        """Rows without an owner are visible to everyone with table access."""
+        if self.view_all or getattr(type(obj), "OWNER_FIELD", None) is None:
+            return True
+        return self._owner_id(obj) == self.user_id
+
+    def can_manage(self, obj) -> bool:
+        """Same rule as accounts.utils.can_manage_record."""
+        return self.can_manage_owned_by(self._owner_id(obj))
+
+    def can_manage_owned_by(self, owner_id) -> bool:
+        """can_manage() for a row known only by its owner id (e.g. a values_list row)."""
+        if self.view_all:
+            return True
+        return self.manage_own and self.user_id is not None and owner_id == self.user_id
+
+
+def permissions(request) -> PermissionContext:
+    """The request's PermissionContext, built on first use."""
+    perms = getattr(request, "_permissions", None)
+    if perms is None or perms.user_id != getattr(request.user, "pk", None):
+        perms = request._permissions = PermissionContext.for_user(request.user)
+    return perms
+
+
+def _as_permissions(user_or_perms) -> PermissionContext:
+    if isinstance(user_or_perms, PermissionContext):
+        return user_or_perms
+    return PermissionContext.for_user(user_or_perms)
+
+
+class VisibleQuerySet(models.QuerySet):
+    """
+    For models with an OWNER_FIELD (the FK to the creating user):
+    Model.objects.visible_to(user or PermissionContext) keeps only the
+    rows that user may see. Models without one are visible in full.
+    """
+
+    def visible_to(self, user_or_perms):
+        perms = _as_permissions(user_or_perms)
+        if perms.view_all or getattr(self.model, "OWNER_FIELD", None) is None:
+            return self
+        return self.filter(**{f"{self.model.OWNER_FIELD}_id": perms.user_id})
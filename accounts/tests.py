@@ -1,3 +1,53 @@
-from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, TestCase
+
+from crm.models import DiabetesRiskAssessment, HealthCheck
+from .models import User
+from .permissions import PermissionContext, permissions
+from .utils import can_manage_record
+
+
+class PermissionContextTests(TestCase):
+    def setUp(self):
+        self.users = {
+            role: User.objects.create_user(role.lower(), password="x", role=role)
+            for role in User.Role.values
+        }
+        self.checks = [
+            HealthCheck.objects.create(forename="Ann", surname="Smith", created_by=self.users[role])
+            for role in ("STAFF", "MANAGER")
+        ]
+
+    def test_matches_can_manage_record_for_every_role(self):
+        for user in [*self.users.values(), User(username="root", is_superuser=True)]:
+            perms = PermissionContext.for_user(user)
+            for check in self.checks:
+                self.assertEqual(perms.can_manage(check), can_manage_record(user, check), (user.role, check.id))
+
+    def test_visible_to_keeps_own_rows_unless_view_all(self):
+        staff_check = self.checks[0]
+        self.assertEqual(list(HealthCheck.objects.visible_to(self.users["STAFF"])), [staff_check])
+        self.assertEqual(HealthCheck.objects.visible_to(self.users["ADMIN"]).count(), 2)
+        self.assertFalse(HealthCheck.objects.visible_to(AnonymousUser()).exists())
+
+    def test_assessments_visible_to_all_managed_by_view_all_roles(self):
+        # Unchanged from can_manage_record: assessments have no created_by
+        assessment = DiabetesRiskAssessment.objects.create(
+            forename="Ann", surname="Smith", gender="F", ethnicity="WHITE", date_of_birth=date(1970, 1, 1),
+            waist_cm=90, height_cm=170, weight_kg=70, family_history="NO", high_bp="NO",
+            age_score=0, gender_score=0, ethnicity_score=0, family_history_score=0, waist_score=0,
+            bmi=24.2, bmi_score=0, bp_score=0, total_score=0, submitted_by=self.users["STAFF"],
+        )
+        for user in self.users.values():
+            perms = PermissionContext.for_user(user)
+            self.assertEqual(perms.can_manage(assessment), can_manage_record(user, assessment), user.role)
+            self.assertTrue(perms.can_view(assessment))
+            self.assertEqual(list(DiabetesRiskAssessment.objects.visible_to(perms)), [assessment])
+        self.assertFalse(PermissionContext.for_user(self.users["STAFF"]).can_manage(assessment))
+
+    def test_resolved_once_per_request(self):
+        request = RequestFactory().get("/")
+        request.user = self.users["STAFF"]
+        self.assertIs(permissions(request), permissions(request))
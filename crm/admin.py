@@ -1,5 +1,8 @@
 from django.contrib import admin
 
+from .models import ScoringRuleSet
 
 
-
+@admin.register(ScoringRuleSet)
+class ScoringRuleSetAdmin(admin.ModelAdmin):
+    list_display = ("version", "is_active", "note", "created_at")
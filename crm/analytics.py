@@ -0,0 +1,194 @@
+"""
+Whole-table statistics for the graphs page, computed with NumPy.
+
+Rows are fetched once as a float matrix (one column per field, NaN for
+NULL or unparseable values); everything else is array arithmetic on it.
+Correlations use pairwise-complete rows, like pandas' DataFrame.corr():
+each pair of fields is compared over the rows where both are present.
+"""
+import numpy as np
+
+
+SUMMARY_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def _as_float(v) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def numeric_matrix(qs, fields) -> np.ndarray:
+    """`fields` of every row of `qs` as an (n, len(fields)) float array, in one values_list() pass."""
+    rows = qs.order_by().values_list(*fields).iterator(chunk_size=5000)
+    flat = np.fromiter((_as_float(v) for row in rows for v in row), dtype=np.float64)
+    return flat.reshape(-1, len(fields))
+
+
+def pearson_matrix(X: np.ndarray) -> np.ndarray:
+    """
+    Pairwise-complete Pearson r for every pair of columns, from a handful
+    of matrix products over the 0/1 "present" mask. NaN where a pair has
+    fewer than two rows or no variance.
+    """
+    present = np.isfinite(X)
+    M = present.astype(np.float64)
+    # Centre first (r doesn't change) so the sums below don't lose precision
+    Z = np.where(present, X, 0.0)
+    Z = np.where(present, Z - Z.sum(axis=0) / np.maximum(M.sum(axis=0), 1), 0.0)
+
+    n = M.T @ M                   # rows where both i and j are present
+    sx = Z.T @ M                  # sum of x_i over those rows
+    sxx = (Z * Z).T @ M
+    sxy = Z.T @ Z
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sxy - sx * sx.T / n
+        var_i = sxx - sx * sx / n
+        r = cov / np.sqrt(var_i * var_i.T)
+    r[n < 2] = np.nan
+    return np.clip(r, -1.0, 1.0)
+
+
+def _ranks(a: np.ndarray) -> np.ndarray:
+    """1-based ranks, ties sharing their average rank (scipy's rankdata "average")."""
+    _, inverse, counts = np.unique(a, return_inverse=True, return_counts=True)
+    ends = np.cumsum(counts)
+    return ((ends - counts + 1 + ends) / 2)[inverse]
+
+
+def spearman_matrix(X: np.ndarray) -> np.ndarray:
+    """Pairwise-complete Spearman rho: Pearson r of the ranks within each pair's rows."""
+    k = X.shape[1]
+    present = np.isfinite(X)
+    rho = np.eye(k)
+    rho[present.sum(axis=0) < 2, :] = np.nan
+    rho[:, present.sum(axis=0) < 2] = np.nan
+    for i in range(k):
+        for j in range(i + 1, k):
+            both = present[:, i] & present[:, j]
+            if both.sum() < 2:
+                rho[i, j] = rho[j, i] = np.nan
+                continue
+            pair = np.column_stack([_ranks(X[both, i]), _ranks(X[both, j])])
+            rho[i, j] = rho[j, i] = pearson_matrix(pair)[0, 1]
+    return rho
+
+
+def column_summary(X: np.ndarray, percentiles=SUMMARY_PERCENTILES) -> dict:
+    """Per column: count, nulls, mean, std (sample), min, max and percentiles, as lists."""
+    present = np.isfinite(X)
+    count = present.sum(axis=0)
+    has_values = count > 0
+    Z = np.where(present, X, 0.0)
+    mean = Z.sum(axis=0) / np.maximum(count, 1)
+    sq = (np.where(present, Z - mean, 0.0) ** 2).sum(axis=0)
+    std = np.where(count > 1, np.sqrt(sq / np.maximum(count - 1, 1)), np.nan)
+    mean = np.where(has_values, mean, np.nan)
+
+    stats = {
+        "count": count.tolist(),
+        "nulls": (len(X) - count).tolist(),
+        "mean": mean,
+        "std": std,
+        "min": np.full(X.shape[1], np.nan),
+        "max": np.full(X.shape[1], np.nan),
+        "percentiles": {p: np.full(X.shape[1], np.nan) for p in percentiles},
+    }
+    if has_values.any():
+        cols = X[:, has_values]
+        stats["min"][has_values] = np.nanmin(cols, axis=0)
+        stats["max"][has_values] = np.nanmax(cols, axis=0)
+        values = np.nanpercentile(cols, percentiles, axis=0)
+        for p, row in zip(percentiles, values):
+            stats["percentiles"][p][has_values] = row
+
+    for key in ("mean", "std", "min", "max"):
+        stats[key] = nan_to_none(stats[key])
+    stats["percentiles"] = {str(p): nan_to_none(v) for p, v in stats["percentiles"].items()}
+    return stats
+
+
+def nan_to_none(a: np.ndarray) -> list:
+    """Array -> JSON-ready list (nested for 2-D), NaN as None."""
+    a = np.asarray(a, dtype=np.float64)
+    return np.where(np.isfinite(a), a, None).tolist()
+
+
+# -----------------------------
+# Distributions
+# -----------------------------
+MAX_GROUPS = 12
+OTHER_GROUP = "Other"
+
+
+def numeric_with_groups(qs, field: str, group: str):
+    """`field` as a float array and `group` as a parallel list, from one values_list() pass."""
+    values, groups = [], []
+    for value, label in qs.order_by().values_list(field, group).iterator(chunk_size=5000):
+        values.append(_as_float(value))
+        groups.append(label)
+    return np.array(values, dtype=np.float64), groups
+
+
+def _group_codes(groups, max_groups: int):
+    """Labels and a code per row; groups beyond the `max_groups` - 1 largest become "Other"."""
+    labels, codes = np.unique(np.asarray(groups, dtype=str), return_inverse=True)
+    labels = [label.strip() or "Unknown" for label in labels.tolist()]
+    if len(labels) <= max_groups:
+        return labels, codes
+
+    sizes = np.bincount(codes, minlength=len(labels))
+    top = np.argsort(-sizes, kind="stable")[:max_groups - 1]
+    remap = np.full(len(labels), max_groups - 1)
+    remap[top] = np.arange(max_groups - 1)
+    return [labels[i] for i in top] + [OTHER_GROUP], remap[codes]
+
+
+def histogram(values, groups=None, bins: int = 20, integer: bool = False,
+              max_groups: int = MAX_GROUPS, percentiles=SUMMARY_PERCENTILES) -> dict:
+    """
+    Bucketed counts and quantiles of `values`, overall or per group.
+
+    All groups share one set of bin edges, so their counts line up; the
+    counts of every group come from a single bincount. Integer fields with
+    fewer distinct values than `bins` get one bin per value.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    present = np.isfinite(values)
+    if groups is None:
+        labels, codes = ["All"], np.zeros(int(present.sum()), dtype=np.intp)
+    else:
+        labels, codes = _group_codes(np.asarray(groups, dtype=object)[present], max_groups)
+    values = values[present]
+
+    if len(values) == 0:
+        edges = np.array([])
+    elif integer and values.max() - values.min() < bins:
+        edges = np.arange(values.min() - 0.5, values.max() + 1.5)
+    else:
+        edges = np.histogram_bin_edges(values, bins=bins)
+
+    n_bins = max(len(edges) - 1, 0)
+    if n_bins:
+        # right-closed last bin, like np.histogram
+        idx = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, n_bins - 1)
+        counts = np.bincount(codes * n_bins + idx, minlength=len(labels) * n_bins).reshape(len(labels), n_bins)
+    else:
+        counts = np.zeros((len(labels), 0), dtype=np.intp)
+
+    series = []
+    for g, label in enumerate(labels):
+        v = values[codes == g]
+        series.append({
+            "label": label,
+            "n": len(v),
+            "counts": counts[g].tolist(),
+            "mean": float(v.mean()) if len(v) else None,
+            "quantiles": dict(zip(
+                (str(p) for p in percentiles),
+                np.percentile(v, percentiles).tolist() if len(v) else [None] * len(percentiles),
+            )),
+        })
+    return {"edges": edges.tolist(), "total": len(values), "nulls": int((~present).sum()), "series": series}
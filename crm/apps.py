@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class CrmConfig(AppConfig):
     name = 'crm'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import install_fts_after_migrate
+
+        post_migrate.connect(install_fts_after_migrate, sender=self)
@@ -0,0 +1,132 @@
+"""
+Latency / query-count benchmarks of the hot CRM views (manage.py run_benchmarks).
+
+Each Scenario is one GET through the full middleware stack with the test
+client, logged in as a real user, against whatever data is in the database
+(see generate_synthetic_data). Results are plain dicts so they can be
+written as JSON and compared across commits.
+
+Graphs endpoints answer repeats from crm.result_cache; their scenarios are
+`cold`: each request carries a fresh dummy parameter, which is part of the
+cache key, so every timed request does the queries and NumPy work.
+"""
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from itertools import count
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from forms_builder.models import FormDefinition
+from .profiling import RequestProfile, percentile
+from .synthetic import SYNTHETIC_FORM_NAME
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    url_name: str
+    params: dict = field(default_factory=dict)   # "{form}" is replaced by the form id
+    htmx: bool = False
+    form_arg: bool = False                       # url takes the form id
+    cold: bool = False                           # bypass crm.result_cache
+
+
+SCENARIOS = [
+    Scenario("dashboard", "dashboard"),
+    Scenario("tables_page", "tables_page", {"table": "healthchecks"}),
+    Scenario("tables_page_htmx_30d", "tables_page", {"table": "healthchecks", "date": "30d"}, htmx=True),
+    Scenario("tables_page_search", "tables_page", {"table": "healthchecks", "q": "smith"}, htmx=True),
+    Scenario("tables_page_sort_bmi", "tables_page", {"table": "healthchecks", "sort": "-bmi"}, htmx=True),
+    Scenario("tables_page_form", "tables_page", {"table": "form:{form}"}, htmx=True),
+    Scenario("graphs_data_correlation", "graphs_data", {"mode": "correlation", "x": "systolic", "y": "bmi"}, cold=True),
+    Scenario("graphs_data_grid", "graphs_data", {"mode": "correlation", "x": "age", "y": "bmi", "sample": "grid"}, cold=True),
+    Scenario("graphs_data_bmi_improvement", "graphs_data", {"mode": "bmi_improvement"}, cold=True),
+    Scenario("graphs_data_histogram_bmi_gp", "graphs_data", {"mode": "histogram", "field": "bmi", "group": "gp"}, cold=True),
+    Scenario("graphs_summary", "graphs_summary", cold=True),
+    Scenario("form_results", "form_results", form_arg=True),
+    Scenario("form_results_search", "form_results", {"q": "follow"}, form_arg=True),
+]
+
+
+def benchmark_form_id():
+    """The synthetic survey, else the form with the most submissions."""
+    form_id = FormDefinition.objects.filter(name=SYNTHETIC_FORM_NAME).values_list("id", flat=True).first()
+    if form_id is None:
+        form_id = (
+            FormDefinition.objects.annotate(n=Count("submissions")).order_by("-n", "id")
+            .values_list("id", flat=True).first()
+        )
+    return form_id
+
+
+def benchmark_client(user) -> Client:
+    # Outside the test runner "testserver" is not an allowed host
+    hosts = [h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"]
+    client = Client(SERVER_NAME=hosts[0] if hosts else "localhost")
+    client.force_login(user)
+    return client
+
+
+def run_scenario(client, scenario: Scenario, form_id=None, iterations: int = 20, warmup: int = 2) -> dict:
+    if "{form}" in str(scenario.params) or scenario.form_arg:
+        if form_id is None:
+            return {"skipped": "no forms"}
+    url = reverse(scenario.url_name, args=[form_id] if scenario.form_arg else [])
+    params = {k: v.format(form=form_id) for k, v in scenario.params.items()}
+    headers = {"HX-Request": "true"} if scenario.htmx else {}
+
+    requests = count()
+
+    def get():
+        query = dict(params, _cold=next(requests)) if scenario.cold else params
+        response = client.get(url, query, headers=headers)
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response
+
+    for _ in range(warmup):
+        get()
+
+    timings, queries, repeated = [], [], 0
+    for _ in range(iterations):
+        profile = RequestProfile()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(profile))
+            start = time.perf_counter()
+            response = get()
+            timings.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            return {"error": f"HTTP {response.status_code}"}
+        queries.append(profile.queries)
+        repeated = max(repeated, sum(n for n in profile.fingerprints.values() if n > 1))
+
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "cold": scenario.cold,
+        "p50_ms": round(percentile(timings, 50) * 1000, 2),
+        "p95_ms": round(percentile(timings, 95) * 1000, 2),
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 2),
+        "min_ms": round(timings[0] * 1000, 2),
+        "max_ms": round(timings[-1] * 1000, 2),
+        "queries": max(queries),
+        "repeated_queries": repeated,
+    }
+
+
+def compare(baseline: dict, current: dict) -> list[tuple]:
+    """[(scenario, old p50, new p50, % change, old queries, new queries)] for scenarios in both runs."""
+    rows = []
+    for name, new in current.items():
+        old = baseline.get(name)
+        if not old or "p50_ms" not in old or "p50_ms" not in new:
+            continue
+        change = (new["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100 if old["p50_ms"] else 0.0
+        rows.append((name, old["p50_ms"], new["p50_ms"], change, old["queries"], new["queries"]))
+    return rows
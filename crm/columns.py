@@ -0,0 +1,91 @@
+"""
+Visible columns of the model tables on the Tables page.
+
+Each user can pick which columns of a TableConfig they see (stored in
+crm.TableColumnPreference; default: all). The page then fetches only those
+columns with values_list() and renders rows from tuples: no model
+instances, and no Decimal/datetime conversion for hidden columns.
+Foreign keys are shown as str() of the related row, looked up once per
+page with in_bulk().
+"""
+from dataclasses import dataclass
+
+from .models import TableColumnPreference
+
+
+def table_columns(cfg) -> list:
+    """Every column a table can show: its model fields except id."""
+    return [f for f in cfg.model._meta.fields if f.name != "id"]
+
+
+def visible_columns(user, cfg) -> list:
+    """The user's chosen columns for `cfg`, or all of them."""
+    by_name = {f.name: f for f in table_columns(cfg)}
+    chosen = (
+        TableColumnPreference.objects.filter(user=user, table_key=cfg.key)
+        .values_list("columns", flat=True)
+        .first()
+    )
+    fields = [by_name[name] for name in chosen or [] if name in by_name]
+    return fields or list(by_name.values())
+
+
+def save_visible_columns(user, cfg, names) -> list:
+    """Store the chosen columns (unknown names dropped; none = back to all)."""
+    allowed = [f.name for f in table_columns(cfg)]
+    names = [n for n in allowed if n in set(names)]
+    if not names or names == allowed:
+        TableColumnPreference.objects.filter(user=user, table_key=cfg.key).delete()
+        return allowed
+    TableColumnPreference.objects.update_or_create(user=user, table_key=cfg.key, defaults={"columns": names})
+    return names
+
+
+# -----------------------------
+# Fetching rows as tuples
+# -----------------------------
+@dataclass
+class Projection:
+    """values_list() layout: id, then whatever paging/permissions need, then the columns."""
+    names: list
+    columns: list
+
+    def __post_init__(self):
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    def apply(self, qs):
+        return qs.values_list(*self.names)
+
+    def row_key(self, sort_name: str):
+        """keyset_page() row_key for tuples sorted on `sort_name`."""
+        sort_i, id_i = self.index[sort_name], self.index["id"]
+        return lambda row: (row[sort_i], row[id_i])
+
+    def cells(self, rows) -> list[list]:
+        """Display values per row, in column order; FKs become str(related)."""
+        related = {}
+        for f in self.columns:
+            if f.is_relation:
+                i = self.index[f.attname]
+                ids = {row[i] for row in rows if row[i] is not None}
+                objs = f.related_model._default_manager.in_bulk(ids) if ids else {}
+                related[i] = {pk: str(obj) for pk, obj in objs.items()}
+
+        positions = [self.index[f.attname] for f in self.columns]
+        return [
+            [related[i].get(row[i]) if i in related else row[i] for i in positions]
+            for row in rows
+        ]
+
+
+def projection(columns, *extra) -> Projection:
+    names = ["id"]
+    for name in [*extra, *(f.attname for f in columns)]:
+        if name not in names:
+            names.append(name)
+    return Projection(names, list(columns))
+
+
+def instance_cells(obj, columns) -> list:
+    """cells() for one model instance (single-row HTMX responses)."""
+    return [getattr(obj, f.name) for f in columns]
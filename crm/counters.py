@@ -0,0 +1,177 @@
+"""
+Dashboard counters: per-day rollups kept in crm.DailyCounter.
+
+Each COUNTERS entry counts rows of one model per local day of `date_field`,
+per owner (plus a global owner_id=0 row) and optionally per bucket. Signals
+(crm.signals) keep them current on create/update/delete; bulk_create()
+paths call record_created(). `manage.py reconcile_counters` rebuilds them
+from the source tables.
+
+Adding a dashboard tile is a new COUNTERS entry + a reconcile run.
+"""
+from collections import Counter as Tally
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable
+
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyCounter
+from .scoring import risk_level_from_total
+
+
+GLOBAL = 0
+
+
+@dataclass(frozen=True)
+class CounterSpec:
+    metric: str
+    model: str                      # app_label.ModelName
+    date_field: str                 # DateTimeField, bucketed by local date
+    owner_field: str                # FK attname of the creating user
+    bucket_fields: tuple = ()
+    # values of bucket_fields -> bucket label
+    bucket: Callable[..., str] = field(default=lambda *values: "")
+
+
+COUNTERS = [
+    CounterSpec("healthchecks", "crm.HealthCheck", "created_at", "created_by_id"),
+    CounterSpec(
+        "healthchecks_by_gp", "crm.HealthCheck", "created_at", "created_by_id",
+        bucket_fields=("gp",),
+        bucket=lambda gp: (gp or "").strip()[:150] or "Unknown",
+    ),
+    CounterSpec(
+        "diabetes_by_band", "crm.DiabetesRiskAssessment", "submitted_at", "submitted_by_id",
+        bucket_fields=("total_score",),
+        bucket=lambda total: risk_level_from_total(total),
+    ),
+]
+
+
+def counters_for(model) -> list[CounterSpec]:
+    label = model._meta.label
+    return [c for c in COUNTERS if c.model == label]
+
+
+def _day(value) -> "datetime.date":
+    if isinstance(value, datetime):
+        return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+    return value
+
+
+def counter_keys(spec: CounterSpec, obj) -> list[tuple]:
+    """The DailyCounter keys this object counts towards: (metric, owner, day, bucket)."""
+    when = getattr(obj, spec.date_field)
+    if when is None:
+        return []
+    day = _day(when)
+    bucket = spec.bucket(*(getattr(obj, f) for f in spec.bucket_fields))
+    owner = getattr(obj, spec.owner_field) or GLOBAL
+    keys = [(spec.metric, GLOBAL, day, bucket)]
+    if owner != GLOBAL:
+        keys.append((spec.metric, owner, day, bucket))
+    return keys
+
+
+def apply_deltas(deltas: Tally):
+    """Add each {(metric, owner, day, bucket): n} to its counter row, creating rows as needed."""
+    with transaction.atomic():
+        for (metric, owner, day, bucket), n in sorted(deltas.items(), key=lambda kv: str(kv[0])):
+            if not n:
+                continue
+            key = {"metric": metric, "owner_id": owner, "day": day, "bucket": bucket}
+            if DailyCounter.objects.filter(**key).update(count=F("count") + n):
+                continue
+            try:
+                with transaction.atomic():
+                    DailyCounter.objects.create(count=n, **key)
+            except IntegrityError:
+                # created by a concurrent request between our UPDATE and INSERT
+                DailyCounter.objects.filter(**key).update(count=F("count") + n)
+
+
+def record_created(objs):
+    """Count newly created objects (all of one model), e.g. after bulk_create()."""
+    objs = list(objs)
+    if not objs:
+        return
+    deltas = Tally()
+    for spec in counters_for(type(objs[0])):
+        for obj in objs:
+            deltas.update(counter_keys(spec, obj))
+    apply_deltas(deltas)
+
+
+# -----------------------------
+# Reading
+# -----------------------------
+def counter_total(metric: str, owner: int = GLOBAL, since=None, bucket: str = "") -> int:
+    rows = DailyCounter.objects.filter(metric=metric, owner_id=owner, bucket=bucket)
+    if since is not None:
+        rows = rows.filter(day__gte=since)
+    return rows.aggregate(n=Sum("count"))["n"] or 0
+
+
+def counter_buckets(metric: str, owner: int = GLOBAL, since=None, limit=None) -> list[tuple[str, int]]:
+    """[(bucket, count), ...] largest first."""
+    rows = DailyCounter.objects.filter(metric=metric, owner_id=owner)
+    if since is not None:
+        rows = rows.filter(day__gte=since)
+    rows = (
+        rows.values("bucket")
+        .annotate(n=Sum("count"))
+        .filter(n__gt=0)
+        .order_by("-n", "bucket")
+        .values_list("bucket", "n")
+    )
+    return list(rows[:limit] if limit else rows)
+
+
+# -----------------------------
+# Reconciliation
+# -----------------------------
+def rebuild_counters(metrics=None) -> dict[str, int]:
+    """
+    Recompute counters from the source tables (one grouped query each).
+    Returns {metric: rows written}.
+    """
+    written = {}
+
+    for spec in COUNTERS:
+        if metrics and spec.metric not in metrics:
+            continue
+
+        model = apps.get_model(spec.model)
+        owner = spec.owner_field[:-3] if spec.owner_field.endswith("_id") else spec.owner_field
+        grouped = (
+            model.objects.filter(**{f"{spec.date_field}__isnull": False})
+            .annotate(_day=TruncDate(spec.date_field))
+            .values("_day", owner, *spec.bucket_fields)
+            .annotate(n=Count("pk"))
+            .order_by()
+        )
+
+        totals = Tally()
+        for row in grouped:
+            bucket = spec.bucket(*(row[f] for f in spec.bucket_fields))
+            totals[(GLOBAL, row["_day"], bucket)] += row["n"]
+            if row[owner]:
+                totals[(row[owner], row["_day"], bucket)] += row["n"]
+
+        with transaction.atomic():
+            DailyCounter.objects.filter(metric=spec.metric).delete()
+            DailyCounter.objects.bulk_create(
+                [
+                    DailyCounter(metric=spec.metric, owner_id=o, day=d, bucket=b, count=n)
+                    for (o, d, b), n in totals.items()
+                ],
+                batch_size=1000,
+            )
+        written[spec.metric] = len(totals)
+
+    return written
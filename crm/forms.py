@@ -1,5 +1,5 @@
 from django import forms
-from .models import HealthCheck
+from .models import DiabetesRiskAssessment, HealthCheck
 from django.forms.widgets import DateInput
 
 class HealthCheckForm(forms.ModelForm):
@@ -69,3 +69,39 @@ class DiabetesRiskForm(forms.Form):
         widget=forms.RadioSelect,
         label="Have you been given medicine for high blood pressure OR told you have high blood pressure?",
     )
+
+    def to_assessment(self, user) -> DiabetesRiskAssessment:
+        """Unsaved, unscored assessment from cleaned_data (see crm.scoring.apply_scores)."""
+        cd = self.cleaned_data
+        return DiabetesRiskAssessment(
+            submitted_by=user,
+            forename=cd["forename"],
+            surname=cd["surname"],
+            gender=cd["gender"],
+            ethnicity=cd["ethnicity"],
+            postcode=cd.get("postcode") or "",
+            gp=cd.get("gp") or "",
+            date_of_birth=cd["date_of_birth"],
+            systolic=cd.get("systolic"),
+            diastolic=cd.get("diastolic"),
+            pulse=cd.get("pulse"),
+            waist_cm=cd["waist_cm"],
+            height_cm=cd["height_cm"],
+            weight_kg=cd["weight_kg"],
+            family_history=cd["family_history"],
+            high_bp=cd["high_bp"],
+        )
+
+
+# Upload kinds understood by crm.importing
+IMPORT_KINDS = {
+    "healthchecks": "Health checks",
+    "diabetes": "Diabetes risk assessments",
+}
+
+
+class RecordImportForm(forms.Form):
+    kind = forms.ChoiceField(label="Records", choices=list(IMPORT_KINDS.items()))
+    file = forms.FileField(label="CSV file", help_text="First row: column names, as on the single-record form.")
+    dry_run = forms.BooleanField(label="Check only (don't save)", required=False)
+
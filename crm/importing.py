@@ -0,0 +1,168 @@
+"""
+Bulk CSV import of health checks and diabetes risk assessments.
+
+Rows are read with csv.reader (streamed, never the whole file), checked
+with the same forms the single-record pages use, and written in batches:
+one transaction + one bulk_create per batch. bulk_create skips save()
+signals, so each batch also links Person rows (crm.people.assign_people)
+and bumps the dashboard counters (crm.counters.record_created) and the
+data version (crm.versions.bump) itself.
+Diabetes scores are computed per batch with the active rule set.
+
+A file that stops being readable CSV part-way (bad UTF-8, malformed
+quoting) ends the import at that line: batches before it stay saved and
+the result says where it stopped.
+"""
+import csv
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from .counters import record_created
+from .forms import IMPORT_KINDS, DiabetesRiskForm, HealthCheckForm
+from .models import DiabetesRiskAssessment, HealthCheck
+from .people import assign_people
+from .scoring import active_rule_set, compiled
+from .utils_diabetes import ages_on, calculate_bmi
+from .versions import bump
+
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 500
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0      # valid rows (saved unless dry_run)
+    failed: int = 0
+    # [(line number, "field: message; ..."), ...], first MAX_REPORTED_ERRORS only
+    errors: list = field(default_factory=list)
+    # set when the file could not be read past this line
+    stopped_at: int | None = None
+    stop_reason: str = ""
+
+    def add_error(self, line: int, form_errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            message = "; ".join(
+                f"{name}: {' '.join(msgs)}" if name != "__all__" else " ".join(msgs)
+                for name, msgs in form_errors.items()
+            )
+            self.errors.append((line, message))
+
+
+def _unreadable(e: Exception) -> str:
+    return "not valid UTF-8" if isinstance(e, UnicodeDecodeError) else f"unreadable CSV ({e})"
+
+
+def _header_key(name: str) -> str:
+    """'Date of Birth ' -> 'date_of_birth'"""
+    return "_".join((name or "").strip().lower().replace("-", " ").split())
+
+
+def _build_healthchecks(rows, user):
+    objs, bad = [], []
+    for line, data in rows:
+        form = HealthCheckForm(data)
+        if not form.is_valid():
+            bad.append((line, form.errors))
+            continue
+        obj = form.save(commit=False)
+        obj.created_by = user
+        objs.append(obj)
+    return objs, bad
+
+
+def _build_assessments(rows, user, rule_set):
+    objs, bad = [], []
+    for line, data in rows:
+        form = DiabetesRiskForm(data)
+        if not form.is_valid():
+            bad.append((line, form.errors))
+            continue
+        obj = form.to_assessment(user)
+        obj.bmi = calculate_bmi(obj.height_cm, obj.weight_kg)
+        obj.rules_version = rule_set
+        objs.append(obj)
+
+    if objs:
+        today = timezone.localdate()
+        scores = compiled(rule_set).score_batch(
+            age=ages_on([o.date_of_birth for o in objs], [today] * len(objs)),
+            gender=[o.gender for o in objs],
+            ethnicity=[o.ethnicity for o in objs],
+            family_history=[o.family_history for o in objs],
+            high_bp=[o.high_bp for o in objs],
+            waist_cm=[o.waist_cm for o in objs],
+            bmi=[o.bmi for o in objs],
+        )
+        for name, values in scores.items():
+            for obj, value in zip(objs, values.tolist()):
+                setattr(obj, name, value)
+    return objs, bad
+
+
+def import_csv(stream, kind: str, user, batch_size: int = IMPORT_BATCH_SIZE,
+               dry_run: bool = False) -> ImportResult:
+    """
+    Import a CSV text stream (header row required; column names as the
+    form fields, case/spacing-insensitive). Invalid rows are skipped and
+    reported; valid rows are saved even if others fail. If the stream
+    can't be read past some line, the rows before it are still imported
+    and `stopped_at` / `stop_reason` say where and why.
+    """
+    if kind not in IMPORT_KINDS:
+        raise ValueError(f"Unknown import kind {kind!r}")
+
+    model = HealthCheck if kind == "healthchecks" else DiabetesRiskAssessment
+    rule_set = active_rule_set() if kind == "diabetes" else None
+
+    result = ImportResult()
+    reader = csv.reader(stream)
+    try:
+        header = [_header_key(h) for h in next(reader, [])]
+    except (UnicodeDecodeError, csv.Error) as e:
+        result.stopped_at, result.stop_reason = 1, _unreadable(e)
+        return result
+    # header is line 1; reader.line_num tracks multi-line quoted cells
+    rows = (
+        (reader.line_num, {k: v.strip() for k, v in zip(header, values) if k})
+        for values in reader
+        if any(v.strip() for v in values)
+    )
+
+    while result.stopped_at is None:
+        chunk = []
+        try:
+            for row in islice(rows, batch_size):
+                chunk.append(row)
+        except UnicodeDecodeError as e:
+            # decoding fails before the line is counted
+            result.stopped_at, result.stop_reason = reader.line_num + 1, _unreadable(e)
+        except csv.Error as e:
+            result.stopped_at, result.stop_reason = reader.line_num, _unreadable(e)
+        if not chunk:
+            break
+        result.rows += len(chunk)
+
+        if kind == "healthchecks":
+            objs, bad = _build_healthchecks(chunk, user)
+        else:
+            objs, bad = _build_assessments(chunk, user, rule_set)
+
+        for line, errors in bad:
+            result.add_error(line, errors)
+        result.created += len(objs)
+        if not objs or dry_run:
+            continue
+
+        with transaction.atomic():
+            assign_people(objs)
+            model.objects.bulk_create(objs, batch_size=500)
+            record_created(objs)
+            bump(model)
+
+    return result
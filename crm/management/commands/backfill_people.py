@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from crm.models import DiabetesRiskAssessment, HealthCheck
+from crm.people import backfill_people
+
+
+class Command(BaseCommand):
+    help = "Link HealthCheck and DiabetesRiskAssessment rows to Person identity rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument(
+            "--all", action="store_true",
+            help="Re-check every row, not just rows with no person (e.g. after changing normalisation).",
+        )
+
+    def handle(self, *args, **options):
+        for model in (HealthCheck, DiabetesRiskAssessment):
+            n = backfill_people(
+                model,
+                chunk_size=options["chunk_size"],
+                only_missing=not options["all"],
+            )
+            self.stdout.write(f"{model._meta.verbose_name_plural}: linked {n} row(s)")
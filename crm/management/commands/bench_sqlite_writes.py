@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+from crm.profiling import percentile
+
+
+BENCH_ALIAS = "sqlite_bench"
+
+
+def profile_options(name: str) -> dict:
+    """DATABASES OPTIONS for a profile: SQLite defaults, or settings.SQLITE_PRAGMAS."""
+    if name == "plain":
+        return {}
+    return {
+        "init_command": ";".join(f"PRAGMA {k}={v}" for k, v in settings.SQLITE_PRAGMAS.items()),
+        "transaction_mode": "IMMEDIATE",
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent form-submission writes (plus dashboard-style readers) against a "
+        "scratch SQLite file, with SQLite's default settings and with the tuned "
+        "profile from settings.SQLITE_PRAGMAS. Never touches the real database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profile", choices=["plain", "tuned", "both"], default="both")
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--readers", type=int, default=2)
+        parser.add_argument("--seconds", type=float, default=5.0, help="Run time per profile.")
+        parser.add_argument("--rows", type=int, default=20000, help="Rows in the table before the run.")
+        parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        if connections.settings[DEFAULT_DB_ALIAS]["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("This benchmark is for the SQLite backend.")
+        if options["writers"] < 1 or options["readers"] < 0 or options["seconds"] <= 0:
+            raise CommandError("Need --writers >= 1, --readers >= 0 and --seconds > 0")
+
+        names = ["plain", "tuned"] if options["profile"] == "both" else [options["profile"]]
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in names:
+                results[name] = self._run(os.path.join(tmp, f"{name}.sqlite3"), profile_options(name), options)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            f"{options['writers']} writers, {options['readers']} readers, {options['seconds']:g}s each\n"
+            f"{'profile':<8} {'writes/s':>9} {'locked':>7} {'p50 ms':>8} {'p95 ms':>8} {'reads/s':>8}"
+        )
+        for name, r in results.items():
+            self.stdout.write(
+                f"{name:<8} {r['writes_per_s']:>9.0f} {r['locked']:>7} "
+                f"{r['write_p50_ms']:>8.1f} {r['write_p95_ms']:>8.1f} {r['reads_per_s']:>8.0f}"
+            )
+        if len(results) == 2 and results["plain"]["writes_per_s"]:
+            ratio = results["tuned"]["writes_per_s"] / results["plain"]["writes_per_s"]
+            self.stdout.write(self.style.SUCCESS(f"Tuned: {ratio:.1f}x the write throughput"))
+
+    # -----------------------------
+    # One profile
+    # -----------------------------
+    def _run(self, path, db_options, options):
+        db = dict(connections.settings[DEFAULT_DB_ALIAS], NAME=path, OPTIONS=db_options, CONN_MAX_AGE=0)
+        connections.settings[BENCH_ALIAS] = db
+        try:
+            self._seed(options["rows"])
+            deadline = time.perf_counter() + options["seconds"]
+            stats = [{"latencies": [], "locked": 0, "reads": 0} for _ in range(options["writers"] + options["readers"])]
+            threads = [
+                threading.Thread(target=self._writer, args=(i, deadline, stats[i]))
+                for i in range(options["writers"])
+            ] + [
+                threading.Thread(target=self._reader, args=(deadline, stats[options["writers"] + i]))
+                for i in range(options["readers"])
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            connections[BENCH_ALIAS].close()
+            del connections[BENCH_ALIAS]
+            del connections.settings[BENCH_ALIAS]
+
+        latencies = sorted(x for s in stats for x in s["latencies"])
+        seconds = options["seconds"]
+        return {
+            "writes": len(latencies),
+            "writes_per_s": len(latencies) / seconds,
+            "locked": sum(s["locked"] for s in stats),
+            "write_p50_ms": percentile(latencies, 50) * 1000,
+            "write_p95_ms": percentile(latencies, 95) * 1000,
+            "reads_per_s": sum(s["reads"] for s in stats) / seconds,
+        }
+
+    def _seed(self, rows):
+        payload = json.dumps({f"q{i}": "some answer text" for i in range(8)})
+        with transaction.atomic(using=BENCH_ALIAS), connections[BENCH_ALIAS].cursor() as c:
+            c.execute(
+                "CREATE TABLE submission (id INTEGER PRIMARY KEY, form_id INTEGER NOT NULL, "
+                "answers TEXT NOT NULL, submitted_at REAL NOT NULL)"
+            )
+            c.execute("CREATE INDEX submission_form ON submission (form_id)")
+            c.executemany(
+                "INSERT INTO submission (form_id, answers, submitted_at) VALUES (%s, %s, %s)",
+                [(i % 20, payload, time.time()) for i in range(rows)],
+            )
+
+    def _writer(self, n, deadline, stats):
+        """A volunteer saving submissions: read something, then insert, in one transaction."""
+        payload = json.dumps({f"q{i}": f"answer {n}" for i in range(8)})
+        try:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    with transaction.atomic(using=BENCH_ALIAS), connections[BENCH_ALIAS].cursor() as c:
+                        c.execute("SELECT COUNT(*) FROM submission WHERE form_id = %s", [n % 20])
+                        c.execute(
+                            "INSERT INTO submission (form_id, answers, submitted_at) VALUES (%s, %s, %s)",
+                            [n % 20, payload, time.time()],
+                        )
+                except OperationalError:  # database is locked
+                    stats["locked"] += 1
+                    continue
+                stats["latencies"].append(time.perf_counter() - start)
+        finally:
+            connections[BENCH_ALIAS].close()
+
+    def _reader(self, deadline, stats):
+        """Dashboard-style aggregate over the whole table."""
+        try:
+            while time.perf_counter() < deadline:
+                try:
+                    with connections[BENCH_ALIAS].cursor() as c:
+                        c.execute("SELECT form_id, COUNT(*), MAX(submitted_at) FROM submission GROUP BY form_id")
+                        c.fetchall()
+                except OperationalError:
+                    continue
+                stats["reads"] += 1
+        finally:
+            connections[BENCH_ALIAS].close()
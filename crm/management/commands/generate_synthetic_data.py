@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from crm import synthetic
+from crm.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic health checks, diabetes assessments and "
+        "form submissions for benchmarking (see crm.synthetic). Adds to what is "
+        "there; use a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--healthchecks", type=int, default=10000)
+        parser.add_argument("--assessments", type=int, default=5000)
+        parser.add_argument("--submissions", type=int, default=5000)
+        parser.add_argument("--people", type=int, help="Size of the patient pool (default: a third of the records).")
+        parser.add_argument("--users-per-role", type=int, default=2)
+        parser.add_argument("--days", type=int, default=730, help="Spread records over this many past days.")
+        parser.add_argument("--batch-size", type=int, default=synthetic.SYNTHETIC_BATCH_SIZE)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        counts = [options["healthchecks"], options["assessments"], options["submissions"]]
+        if min(counts) < 0 or options["days"] < 1 or options["batch_size"] < 1:
+            raise CommandError("Counts must be >= 0; --days and --batch-size >= 1")
+
+        rng = np.random.default_rng(options["seed"])
+        people = synthetic.make_people(rng, options["people"] or max(1, (counts[0] + counts[1]) // 3))
+        if any(counts[:2]):
+            synthetic.link_people(people)
+        users = synthetic.synthetic_users(options["users_per_role"])
+        # volunteers fill forms but never create CRM records
+        creators = [u for role, group in users.items() if role != "VOLUNTEER" for u in group]
+        everyone = [u for group in users.values() for u in group]
+        common = {"days": options["days"], "batch_size": options["batch_size"]}
+
+        steps = [
+            ("health checks", lambda n: synthetic.generate_healthchecks(rng, people, creators, n, **common)),
+            ("diabetes assessments", lambda n: synthetic.generate_assessments(rng, people, creators, n, **common)),
+            ("form submissions", lambda n: synthetic.generate_submissions(
+                rng, synthetic.synthetic_form(), everyone, n, **common)),
+        ]
+        for (label, run), n in zip(steps, counts):
+            if not n:
+                continue
+            start = time.perf_counter()
+            run(n)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{n:>10,} {label} in {elapsed:.1f}s ({n / elapsed:,.0f}/s)")
+
+        if any(counts[:2]):
+            rebuild_counters()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {len(people):,} people, {len(everyone)} users ({synthetic.SYNTHETIC_USER_PREFIX}*)."
+        ))
@@ -0,0 +1,60 @@
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.forms import IMPORT_KINDS
+from crm.importing import IMPORT_BATCH_SIZE, import_csv
+
+
+class Command(BaseCommand):
+    help = "Import health checks or diabetes risk assessments from a CSV file (header row required)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(IMPORT_KINDS))
+        parser.add_argument("path", help="CSV file, or - for stdin.")
+        parser.add_argument("--user", required=True, help="Username recorded as creator.")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Validate only; save nothing.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(**{User.USERNAME_FIELD: options["user"]})
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['user']!r}")
+
+        start = time.perf_counter()
+        if options["path"] == "-":
+            result = self._import(sys.stdin, user, options)
+        else:
+            try:
+                with open(options["path"], encoding="utf-8-sig", newline="") as stream:
+                    result = self._import(stream, user, options)
+            except OSError as e:
+                raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+
+        for line, message in result.errors:
+            self.stderr.write(f"line {line}: {message}")
+        if result.failed > len(result.errors):
+            self.stderr.write(f"... and {result.failed - len(result.errors)} more invalid row(s)")
+
+        if result.stopped_at:
+            self.stderr.write(
+                f"line {result.stopped_at}: {result.stop_reason}; stopped here, nothing after it was read"
+            )
+
+        verb = "valid" if options["dry_run"] else "imported"
+        rate = result.rows / elapsed * 60 if elapsed else 0
+        self.stdout.write(
+            f"{result.rows} row(s): {result.created} {verb}, {result.failed} invalid "
+            f"in {elapsed:.1f}s ({rate:,.0f} rows/min)"
+        )
+
+    def _import(self, stream, user, options):
+        return import_csv(
+            stream, options["kind"], user,
+            batch_size=options["batch_size"], dry_run=options["dry_run"],
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from crm.search import install_fts_indexes
+
+
+class Command(BaseCommand):
+    help = "Create or rebuild the FTS5 search index for every table in crm.table_registry.TABLES."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--force", action="store_true",
+            help="Rebuild even if the index looks up to date.",
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = install_fts_indexes(using=options["database"], force=options["force"])
+        if rebuilt:
+            for name in rebuilt:
+                self.stdout.write(self.style.SUCCESS(f"Rebuilt {name}"))
+        else:
+            self.stdout.write("Search indexes already up to date (or FTS5 not available).")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.counters import COUNTERS, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the dashboard's DailyCounter rows from the source tables "
+        "(after raw SQL edits, loaddata, or adding a counter)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "metric", nargs="*",
+            help="Metrics to rebuild (default: all). Known: " + ", ".join(c.metric for c in COUNTERS),
+        )
+
+    def handle(self, *args, **options):
+        known = {c.metric for c in COUNTERS}
+        unknown = set(options["metric"]) - known
+        if unknown:
+            raise CommandError(f"Unknown metric(s): {', '.join(sorted(unknown))}")
+
+        for metric, rows in rebuild_counters(metrics=options["metric"] or None).items():
+            self.stdout.write(f"{metric}: {rows} counter row(s)")
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.snapshot import SNAPSHOTS, refresh, snapshot_dir
+
+
+class Command(BaseCommand):
+    help = (
+        "Bring the memory-mapped graphs snapshot (settings.CRM_SNAPSHOT_DIR) up to date. "
+        "Appends rows added since the last run; rebuilds a table whose rows were "
+        "edited or deleted. Meant to run from cron every few minutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "model", nargs="*",
+            help="Models to refresh (default: all). Known: " + ", ".join(SNAPSHOTS),
+        )
+        parser.add_argument("--full", action="store_true", help="Rebuild from scratch.")
+
+    def handle(self, *args, **options):
+        unknown = set(options["model"]) - set(SNAPSHOTS)
+        if unknown:
+            raise CommandError(f"Unknown model(s): {', '.join(sorted(unknown))}")
+
+        for label in options["model"] or SNAPSHOTS:
+            start = time.perf_counter()
+            result = refresh(SNAPSHOTS[label], full=options["full"])
+            self.stdout.write(
+                f"{label}: {result['action']}, {result['rows']} rows (+{result['added']}) "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+        self.stdout.write(f"Snapshot directory: {snapshot_dir()}")
@@ -0,0 +1,116 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from crm.benchmarks import SCENARIOS, benchmark_client, benchmark_form_id, compare, run_scenario
+from crm.models import DiabetesRiskAssessment, HealthCheck
+from crm.synthetic import SYNTHETIC_USER_PREFIX
+from forms_builder.models import FormSubmission
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the hot CRM views through the test client: p50/p95 latency and "
+        "query counts per scenario. --output saves JSON, --compare diffs against "
+        "a saved run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--only", action="append", default=[], metavar="SCENARIO",
+                            help="Run just this scenario (repeatable). Names: " + ", ".join(s.name for s in SCENARIOS))
+        parser.add_argument("--user", help="Username to run as (default: an admin).")
+        parser.add_argument("--output", help="Write results to this JSON file.")
+        parser.add_argument("--compare", help="Earlier --output file to compare with.")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be >= 1")
+        unknown = set(options["only"]) - {s.name for s in SCENARIOS}
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"], encoding="utf-8") as f:
+                    baseline = json.load(f)["results"]
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Cannot read {options['compare']}: {e}")
+
+        user = self._user(options["user"])
+        client = benchmark_client(user)
+        form_id = benchmark_form_id()
+        scenarios = [s for s in SCENARIOS if not options["only"] or s.name in options["only"]]
+
+        self.stdout.write(f"{'scenario':<30} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8}")
+        results = {}
+        for scenario in scenarios:
+            result = run_scenario(client, scenario, form_id, options["iterations"], options["warmup"])
+            results[scenario.name] = result
+            if "p50_ms" in result:
+                self.stdout.write(
+                    f"{scenario.name:<30} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['queries']:>8}"
+                )
+            else:
+                self.stdout.write(f"{scenario.name:<30} {result.get('error') or result.get('skipped')}")
+
+        if options["output"]:
+            report = {
+                "meta": {
+                    "commit": _git_commit(),
+                    "when": timezone.now().isoformat(timespec="seconds"),
+                    "user": user.get_username(),
+                    "database": connection.vendor,
+                    "python": platform.python_version(),
+                    "django": django.get_version(),
+                    "rows": {
+                        "healthchecks": HealthCheck.objects.count(),
+                        "diabetes_assessments": DiabetesRiskAssessment.objects.count(),
+                        "form_submissions": FormSubmission.objects.count(),
+                    },
+                },
+                "results": results,
+            }
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+        if baseline is not None:
+            self.stdout.write(f"\n{'scenario':<30} {'p50 before':>10} {'after':>9} {'change':>8} {'queries':>10}")
+            for name, old, new, change, old_q, new_q in compare(baseline, results):
+                style = self.style.ERROR if change > 10 else self.style.SUCCESS if change < -10 else str
+                self.stdout.write(style(
+                    f"{name:<30} {old:>10.1f} {new:>9.1f} {change:>+7.0f}% {old_q:>4} -> {new_q:<4}"
+                ))
+
+    def _user(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(**{User.USERNAME_FIELD: username})
+            except User.DoesNotExist:
+                raise CommandError(f"No user {username!r}")
+        admins = User.objects.filter(Q(is_superuser=True) | Q(role=User.Role.ADMIN), is_active=True)
+        # prefer the synthetic admin so runs are comparable across databases
+        user = (admins.filter(username__startswith=SYNTHETIC_USER_PREFIX).order_by("id").first()
+                or admins.order_by("id").first())
+        if user is None:
+            raise CommandError("No admin user; pass --user or run generate_synthetic_data first.")
+        return user
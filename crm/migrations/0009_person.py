@@ -0,0 +1,78 @@
+# Generated by Django 6.0 on 2026-10-18 12:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copy of crm.people.identity_key(): the migration must not change
+# if that normalisation does later.
+def identity_key(forename, surname, postcode):
+    def name(value):
+        return " ".join((value or "").split()).casefold()
+
+    return name(surname), name(forename), "".join((postcode or "").split()).upper()
+
+
+def link_existing_rows(apps, schema_editor, chunk_size=2000):
+    Person = apps.get_model("crm", "Person")
+    ids = {}
+
+    for model_name in ("HealthCheck", "DiabetesRiskAssessment"):
+        model = apps.get_model("crm", model_name)
+        rows = model.objects.order_by("id").only("id", "forename", "surname", "postcode")
+        batch = []
+        for obj in rows.iterator(chunk_size=chunk_size):
+            key = identity_key(obj.forename, obj.surname, obj.postcode)
+            if key not in ids:
+                ids[key] = Person.objects.get_or_create(
+                    surname_norm=key[0], forename_norm=key[1], postcode_norm=key[2],
+                    defaults={
+                        "forename": (obj.forename or "").strip(),
+                        "surname": (obj.surname or "").strip(),
+                        "postcode": (obj.postcode or "").strip(),
+                    },
+                )[0].id
+            obj.person_id = ids[key]
+            batch.append(obj)
+            if len(batch) >= chunk_size:
+                model.objects.bulk_update(batch, ["person"], batch_size=500)
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ["person"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0008_remove_diabetesriskassessment_age_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Person',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('forename_norm', models.CharField(max_length=100)),
+                ('surname_norm', models.CharField(max_length=100)),
+                ('postcode_norm', models.CharField(blank=True, max_length=20)),
+                ('forename', models.CharField(max_length=100)),
+                ('surname', models.CharField(max_length=100)),
+                ('postcode', models.CharField(blank=True, max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('surname_norm', 'forename_norm', 'postcode_norm'), name='person_identity')],
+            },
+        ),
+        migrations.AddField(
+            model_name='diabetesriskassessment',
+            name='person',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='diabetes_risk_assessments', to='crm.person'),
+        ),
+        migrations.AddField(
+            model_name='healthcheck',
+            name='person',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='healthchecks', to='crm.person'),
+        ),
+        migrations.RunPython(link_existing_rows, migrations.RunPython.noop),
+    ]
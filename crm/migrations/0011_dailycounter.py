@@ -0,0 +1,76 @@
+# Generated by Django 6.0 on 2026-10-18 18:00
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+# Frozen copy of crm.counters.COUNTERS / rebuild_counters() as of this
+# migration: (metric, model, date field, owner FK, bucket field, bucket label)
+def _risk_band(total):
+    for edge, label in ((6, "Low"), (15, "Increased"), (24, "Moderate")):
+        if total <= edge:
+            return label
+    return "High"
+
+
+SEED = [
+    ("healthchecks", "HealthCheck", "created_at", "created_by", None, lambda value: ""),
+    ("healthchecks_by_gp", "HealthCheck", "created_at", "created_by", "gp",
+     lambda gp: (gp or "").strip()[:150] or "Unknown"),
+    ("diabetes_by_band", "DiabetesRiskAssessment", "submitted_at", "submitted_by", "total_score", _risk_band),
+]
+
+
+def seed_counters(apps, schema_editor):
+    DailyCounter = apps.get_model("crm", "DailyCounter")
+
+    for metric, model_name, date_field, owner, bucket_field, bucket in SEED:
+        model = apps.get_model("crm", model_name)
+        grouped = (
+            model.objects.filter(**{f"{date_field}__isnull": False})
+            .annotate(_day=TruncDate(date_field))
+            .values("_day", owner, *filter(None, [bucket_field]))
+            .annotate(n=Count("pk"))
+            .order_by()
+        )
+
+        totals = Counter()
+        for row in grouped:
+            label = bucket(row[bucket_field] if bucket_field else None)
+            totals[(0, row["_day"], label)] += row["n"]  # owner_id=0: everyone
+            if row[owner]:
+                totals[(row[owner], row["_day"], label)] += row["n"]
+
+        DailyCounter.objects.filter(metric=metric).delete()
+        DailyCounter.objects.bulk_create(
+            [DailyCounter(metric=metric, owner_id=o, day=d, bucket=b, count=n) for (o, d, b), n in totals.items()],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0010_person_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50)),
+                ('bucket', models.CharField(blank=True, max_length=150)),
+                ('owner_id', models.BigIntegerField(default=0)),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('metric', 'owner_id', 'day', 'bucket'), name='dailycounter_key')],
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
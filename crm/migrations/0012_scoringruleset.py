@@ -0,0 +1,62 @@
+# Generated by Django 6.0 on 2026-10-18 18:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# The thresholds the hard-coded scoring used until now (crm.scoring.DEFAULT_RULES)
+RULES_V1 = {
+    "bands": {
+        "age": {"edges": [49, 59, 69], "points": [0, 5, 9, 13], "inclusive": True},
+        "waist_cm": {"edges": [90, 99.9, 109.9], "points": [0, 4, 6, 9], "inclusive": False},
+        "bmi": {"edges": [25, 29.9, 34.9], "points": [0, 3, 5, 8], "inclusive": False},
+    },
+    "categories": {
+        "gender": {"F": 0, "M": 1},
+        "ethnicity": {"WHITE": 0, "OTHER": 6},
+        "family_history": {"YES": 5, "NO": 0},
+        "high_bp": {"YES": 5, "NO": 0},
+    },
+}
+
+
+def seed_v1(apps, schema_editor):
+    ScoringRuleSet = apps.get_model("crm", "ScoringRuleSet")
+    DiabetesRiskAssessment = apps.get_model("crm", "DiabetesRiskAssessment")
+
+    v1, _ = ScoringRuleSet.objects.get_or_create(
+        version=1,
+        defaults={"rules": RULES_V1, "is_active": True, "note": "Original hard-coded thresholds"},
+    )
+    # Every existing assessment was scored with these thresholds
+    DiabetesRiskAssessment.objects.filter(rules_version__isnull=True).update(rules_version=v1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0011_dailycounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoringRuleSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(unique=True)),
+                ('rules', models.JSONField()),
+                ('is_active', models.BooleanField(default=False)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-version'],
+            },
+        ),
+        migrations.AddField(
+            model_name='diabetesriskassessment',
+            name='rules_version',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='assessments', to='crm.scoringruleset'),
+        ),
+        migrations.RunPython(seed_v1, migrations.RunPython.noop),
+    ]
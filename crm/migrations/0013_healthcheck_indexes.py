@@ -0,0 +1,54 @@
+# Generated by Django 6.0 on 2026-10-18 18:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0012_scoringruleset'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='healthcheck',
+            name='created_by',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='healthchecks', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='healthcheck',
+            name='person',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='healthchecks', to='crm.person'),
+        ),
+        migrations.AddIndex(
+            model_name='healthcheck',
+            index=models.Index(fields=['created_by', '-id'], name='healthcheck_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthcheck',
+            index=models.Index(fields=['check_date'], name='healthcheck_check_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthcheck',
+            index=models.Index(fields=['created_at'], name='healthcheck_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthcheck',
+            index=models.Index(fields=['surname'], name='healthcheck_surname_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthcheck',
+            index=models.Index(fields=['forename'], name='healthcheck_forename_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthcheck',
+            index=models.Index(fields=['postcode'], name='healthcheck_postcode_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthcheck',
+            index=models.Index(fields=['person', 'created_at'], name='healthcheck_person_idx'),
+        ),
+    ]
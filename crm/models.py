@@ -1,8 +1,46 @@
 from django.conf import settings
 from django.db import models
 
+from accounts.permissions import VisibleQuerySet
+
+
+class Person(models.Model):
+    """
+    One row per patient, identified by normalised forename + surname +
+    postcode (see crm.people). HealthCheck and DiabetesRiskAssessment rows
+    are linked to it on save, so per-person lookups are integer-key joins.
+    """
+    forename_norm = models.CharField(max_length=100)
+    surname_norm = models.CharField(max_length=100)
+    postcode_norm = models.CharField(max_length=20, blank=True)
+
+    # As first entered, for display
+    forename = models.CharField(max_length=100)
+    surname = models.CharField(max_length=100)
+    postcode = models.CharField(max_length=20, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["surname_norm", "forename_norm", "postcode_norm"],
+                name="person_identity",
+            ),
+        ]
+        # surname prefix search uses the person_identity index
+        indexes = [
+            models.Index(fields=["forename_norm"], name="person_forename_idx"),
+            models.Index(fields=["postcode_norm"], name="person_postcode_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.forename} {self.surname} ({self.postcode})"
+
 
 class HealthCheck(models.Model):
+    OWNER_FIELD = "created_by"  # see accounts.permissions
+
     forename = models.CharField(max_length=100)
     surname = models.CharField(max_length=100)
     gender = models.CharField(max_length=50, blank=True)
@@ -20,17 +58,67 @@ class HealthCheck(models.Model):
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.PROTECT,
-        related_name="healthchecks"
+        related_name="healthchecks",
+        db_index=False,  # covered by healthcheck_owner_idx
     )
     check_date = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    person = models.ForeignKey(
+        Person,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="healthchecks",
+        db_index=False,  # covered by healthcheck_person_idx
+    )
+
+    objects = VisibleQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Tables/graphs for staff: WHERE created_by = ? ORDER BY id DESC
+            models.Index(fields=["created_by", "-id"], name="healthcheck_owner_idx"),
+            # Tables date filter (check_date >= ?) and date sorts
+            models.Index(fields=["check_date"], name="healthcheck_check_date_idx"),
+            models.Index(fields=["created_at"], name="healthcheck_created_idx"),
+            # Tables sort by name / postcode
+            models.Index(fields=["surname"], name="healthcheck_surname_idx"),
+            models.Index(fields=["forename"], name="healthcheck_forename_idx"),
+            models.Index(fields=["postcode"], name="healthcheck_postcode_idx"),
+            # Graphs progression: one person's checks in date order
+            models.Index(fields=["person", "created_at"], name="healthcheck_person_idx"),
+        ]
+
     def __str__(self):
         return f"{self.forename} {self.surname} ({self.created_at:%Y-%m-%d})"
 
 
 
+class ScoringRuleSet(models.Model):
+    """
+    One version of the diabetes risk thresholds/points (format: see
+    crm.scoring). Versions are never edited once used: add a new version
+    and mark it active instead.
+    """
+    version = models.PositiveIntegerField(unique=True)
+    rules = models.JSONField()
+    is_active = models.BooleanField(default=False)
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-version"]
+
+    def __str__(self):
+        return f"Scoring rules v{self.version}" + (" (active)" if self.is_active else "")
+
+
 class DiabetesRiskAssessment(models.Model):
+    # No OWNER_FIELD: as always, everyone with table access sees every
+    # assessment and only admins/managers manage them (accounts.permissions)
+
     # ---- Identity ----
     forename = models.CharField(max_length=100)
     surname = models.CharField(max_length=100)
@@ -66,6 +154,14 @@ class DiabetesRiskAssessment(models.Model):
     bp_score = models.IntegerField()
 
     total_score = models.IntegerField()
+    rules_version = models.ForeignKey(
+        ScoringRuleSet,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="assessments",
+    )
 
     # ---- Hybrid JSON snapshot ----
     json_path = models.CharField(max_length=300, blank=True)
@@ -78,9 +174,71 @@ class DiabetesRiskAssessment(models.Model):
     )
     submitted_at = models.DateTimeField(auto_now_add=True)
 
+    person = models.ForeignKey(
+        Person,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="diabetes_risk_assessments",
+    )
+
+    objects = VisibleQuerySet.as_manager()
+
     class Meta:
         ordering = ["-submitted_at"]
 
     def __str__(self):
         return f"{self.forename} {self.surname} ({self.total_score}"
 
+
+
+class DailyCounter(models.Model):
+    """
+    Pre-aggregated row counts for the dashboard: one row per metric,
+    bucket (e.g. GP or risk band, "" for none), owner and day.
+    Maintained by crm.counters on create/update/delete.
+    """
+    metric = models.CharField(max_length=50)
+    bucket = models.CharField(max_length=150, blank=True)
+    # User id of the record's creator; 0 = everyone (global rollup).
+    # Not a FK so the global row can share the unique constraint.
+    owner_id = models.BigIntegerField(default=0)
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["metric", "owner_id", "day", "bucket"],
+                name="dailycounter_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.metric}[{self.bucket}] owner={self.owner_id} {self.day}: {self.count}"
+
+
+class TableColumnPreference(models.Model):
+    """Columns a user chose to see on one Tables page table (crm.columns)."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    table_key = models.CharField(max_length=100)
+    columns = models.JSONField(default=list)  # field names, in display order
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "table_key"], name="tablecolumnpreference_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.table_key}: {', '.join(self.columns)}"
+
+
+class DataVersion(models.Model):
+    """Change stamp per table (or per slice of one), bumped on every write (crm.versions)."""
+    key = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key}@{self.version}"
@@ -0,0 +1,167 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, FieldError, ValidationError
+from django.db.models import BooleanField, Expression, F, Value
+
+
+PAGE_SIZE = 200
+
+
+def _cursor_default(o):
+    # Full precision on purpose: DjangoJSONEncoder trims microseconds, which
+    # would make two rows created in the same millisecond compare equal.
+    if isinstance(o, (datetime, date, time)):
+        return o.isoformat()
+    if isinstance(o, Decimal):
+        return str(o)
+    raise TypeError(f"Cannot encode {type(o).__name__} in a cursor")
+
+
+def encode_cursor(value, pk) -> str:
+    raw = json.dumps([value, pk], default=_cursor_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str | None, field=None):
+    """
+    Returns (value, pk) or None if the cursor is missing/garbled.
+    `field` is the model field being sorted on, used to turn the JSON value
+    back into a date/Decimal/etc. so it compares correctly in SQL.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, pk = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        pk = int(pk)
+        if value is not None and field is not None:
+            value = field.to_python(value)
+    except (ValueError, TypeError, binascii.Error, UnicodeError, ValidationError):
+        return None
+    return value, pk
+
+
+def parse_sort(raw: str | None, allowed, default: str = "-id"):
+    """
+    "-check_date" -> ("check_date", True). Anything not in `allowed`
+    falls back to `default`.
+    """
+    raw = (raw or "").strip() or default
+    descending = raw.startswith("-")
+    name = raw.lstrip("-")
+    if name not in allowed and name != "id":
+        return parse_sort(default, allowed, default)
+    return name, descending
+
+
+def ordering_for(sort_field: str, descending: bool):
+    """order_by() args for (sort_field, id) with NULLs last, as keyset_page() pages them."""
+    if sort_field == "id":
+        return ["-id" if descending else "id"]
+    if descending:
+        return [F(sort_field).desc(nulls_last=True), "-id"]
+    return [F(sort_field).asc(nulls_last=True), "id"]
+
+
+class RowAfter(Expression):
+    """
+    (sort_field, id) > (value, pk), or < when descending, as one SQL row
+    value. SQLite (and PostgreSQL) seek an index on sort_field straight to
+    that row; the equivalent `a < v OR (a = v AND id < pk)` makes SQLite
+    walk the index from its start, so deep pages would get slower.
+    NULL sort values never compare true: keyset_page() pages them apart.
+    """
+    output_field = BooleanField()
+
+    def __init__(self, sort_field: str, descending: bool, value, pk):
+        super().__init__()
+        self.columns = [F(sort_field), F("id")]
+        self.params = [value, pk]
+        self.values = []
+        self.op = "<" if descending else ">"
+
+    def resolve_expression(self, query=None, allow_joins=True, reuse=None, summarize=False, for_save=False):
+        c = self.copy()
+        c.columns = [col.resolve_expression(query, allow_joins, reuse, summarize) for col in self.columns]
+        c.values = [Value(v, output_field=_output_field(col)) for v, col in zip(self.params, c.columns)]
+        return c
+
+    def as_sql(self, compiler, connection):
+        lhs, rhs, params = [], [], []
+        for expr, out in ((self.columns, lhs), (self.values, rhs)):
+            for e in expr:
+                sql, p = compiler.compile(e)
+                out.append(sql)
+                params.extend(p)
+        return f"({', '.join(lhs)}) {self.op} ({', '.join(rhs)})", params
+
+
+def _output_field(expr):
+    try:
+        return expr.output_field
+    except FieldError:
+        return None  # e.g. RawSQL annotations without one
+
+
+def _nullable(qs, sort_field: str) -> bool:
+    try:
+        return qs.model._meta.get_field(sort_field).null
+    except FieldDoesNotExist:
+        return True  # annotations, e.g. a LEFT JOINed answer
+
+
+def keyset_page(qs, sort_field="id", descending=True, cursor=None, page_size=PAGE_SIZE,
+                field=None, row_key=None):
+    """
+    Fetch one page of `qs` ordered by (sort_field, id) starting after `cursor`.
+
+    Every page is a bounded index range scan (no OFFSET), so page N costs
+    the same as page 1. Rows with a NULL sort_field come last, ordered by
+    id: they are fetched by a second query once the non-NULL rows run out,
+    so neither query needs an OR. Returns (rows, next_cursor); next_cursor
+    is None on the last page.
+
+    row_key(row) -> (sort_value, pk) lets callers page over values()/tuples;
+    by default rows are model instances.
+    """
+    if row_key is None:
+        def row_key(row):
+            return getattr(row, sort_field), row.pk
+
+    id_order = "-id" if descending else "id"
+    decoded = decode_cursor(cursor, field)
+    limit = page_size + 1
+
+    if sort_field == "id":
+        qs = qs.order_by(id_order)
+        if decoded is not None:
+            qs = qs.filter(**{f"id__{'lt' if descending else 'gt'}": decoded[1]})
+        rows = list(qs[:limit])
+    else:
+        rows = []
+        nullable = _nullable(qs, sort_field)
+        in_null_block = nullable and decoded is not None and decoded[0] is None
+        if not in_null_block:
+            values = qs.filter(**{f"{sort_field}__isnull": False}) if nullable else qs
+            values = values.order_by(f"-{sort_field}" if descending else sort_field, id_order)
+            if decoded is not None:
+                values = values.filter(RowAfter(sort_field, descending, *decoded))
+            rows = list(values[:limit])
+        if nullable and len(rows) < limit:
+            nulls = qs.filter(**{f"{sort_field}__isnull": True}).order_by(id_order)
+            if in_null_block:
+                nulls = nulls.filter(**{f"id__{'lt' if descending else 'gt'}": decoded[1]})
+            rows += list(nulls[:limit - len(rows)])
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor(*row_key(rows[-1]))
+
+    return rows, next_cursor
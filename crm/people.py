@@ -0,0 +1,110 @@
+"""
+Person identity: maps (forename, surname, postcode) to a crm.Person row.
+
+Names are compared case-insensitively with whitespace collapsed, postcodes
+upper-cased without spaces, so "ann  smith, ab1 2cd" and "Ann Smith, AB12CD"
+are the same person.
+"""
+from django.db.models import Q
+
+from .models import Person
+from .versions import bump, rewrite_key
+
+
+def normalise_name(value) -> str:
+    return " ".join((value or "").split()).casefold()
+
+
+def normalise_postcode(value) -> str:
+    return "".join((value or "").split()).upper()
+
+
+def identity_key(forename, surname, postcode) -> tuple[str, str, str]:
+    """(surname, forename, postcode) normalised, matching the unique index order."""
+    return normalise_name(surname), normalise_name(forename), normalise_postcode(postcode)
+
+
+def person_for(forename, surname, postcode) -> Person:
+    sn, fn, pc = identity_key(forename, surname, postcode)
+    person, _ = Person.objects.get_or_create(
+        surname_norm=sn,
+        forename_norm=fn,
+        postcode_norm=pc,
+        defaults={
+            "forename": (forename or "").strip(),
+            "surname": (surname or "").strip(),
+            "postcode": (postcode or "").strip(),
+        },
+    )
+    return person
+
+
+def _lookup(keys) -> dict:
+    found = {}
+    keys = list(keys)
+    # chunk to stay under SQLite's bound-parameter limit
+    for i in range(0, len(keys), 250):
+        q = Q()
+        for sn, fn, pc in keys[i:i + 250]:
+            q |= Q(surname_norm=sn, forename_norm=fn, postcode_norm=pc)
+        for p in Person.objects.filter(q).only("id", "surname_norm", "forename_norm", "postcode_norm"):
+            found[(p.surname_norm, p.forename_norm, p.postcode_norm)] = p.id
+    return found
+
+
+def assign_people(objs):
+    """
+    Set person_id on many unsaved/unsynced HealthCheck or
+    DiabetesRiskAssessment objects with a handful of queries
+    (for bulk_create() paths, which skip the pre_save signal).
+    """
+    objs = list(objs)
+    if not objs:
+        return objs
+
+    keyed = [(identity_key(o.forename, o.surname, o.postcode), o) for o in objs]
+    ids = _lookup({k for k, _ in keyed})
+
+    missing = {}
+    for key, o in keyed:
+        if key not in ids and key not in missing:
+            missing[key] = Person(
+                surname_norm=key[0], forename_norm=key[1], postcode_norm=key[2],
+                forename=(o.forename or "").strip(),
+                surname=(o.surname or "").strip(),
+                postcode=(o.postcode or "").strip(),
+            )
+    if missing:
+        # ignore_conflicts: another worker may have created some meanwhile
+        Person.objects.bulk_create(missing.values(), ignore_conflicts=True, batch_size=500)
+        bump(Person)
+        ids.update(_lookup(missing.keys()))
+
+    for key, o in keyed:
+        o.person_id = ids[key]
+    return objs
+
+
+def backfill_people(model, chunk_size: int = 2000, only_missing: bool = True) -> int:
+    """Link existing rows of `model` to Person rows. Returns rows updated."""
+    qs = model.objects.order_by("id")
+    if only_missing:
+        qs = qs.filter(person__isnull=True)
+
+    updated = 0
+    last_id = 0
+    while True:
+        batch = list(
+            qs.filter(id__gt=last_id).only("id", "forename", "surname", "postcode", "person_id")[:chunk_size]
+        )
+        if not batch:
+            return updated
+        last_id = batch[-1].id
+
+        before = {o.id: o.person_id for o in batch}
+        assign_people(batch)
+        changed = [o for o in batch if o.person_id != before[o.id]]
+        model.objects.bulk_update(changed, ["person"], batch_size=500)
+        if changed:
+            bump(model, rewrite_key(model))
+        updated += len(changed)
@@ -0,0 +1,254 @@
+"""
+Opt-in request profiling: SQL query count/time, repeated queries, template
+render time and peak Python memory, aggregated per URL name in-process.
+
+Enable with CRM_PROFILING = True (env CRM_PROFILING=1). When disabled the
+middleware raises MiddlewareNotUsed, so it is dropped from the chain and
+costs nothing. CRM_PROFILING_MEMORY additionally runs tracemalloc, which
+is slow; leave it off unless memory is the question. tracemalloc's peak is
+process-wide, so under a threaded server it is only recorded for requests
+that ran with no other request overlapping them. The report lives at
+/profiling/ (see crm.views_profiling).
+
+Numbers are per process: with several workers each keeps its own.
+"""
+import re
+import tracemalloc
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template as DjangoTemplate
+
+
+SAMPLES_PER_VIEW = 500       # latencies kept for percentiles
+TOP_REPEATED = 10            # repeated-query fingerprints kept per view
+
+_local = threading.local()
+_stats: dict = {}
+_stats_lock = threading.Lock()
+
+# Requests in flight, and how many have started: a request that began alone
+# and sees the same start count when it finishes had the process to itself.
+_inflight = 0
+_started = 0
+_inflight_lock = threading.Lock()
+
+
+def profiling_enabled() -> bool:
+    return getattr(settings, "CRM_PROFILING", False)
+
+
+# -----------------------------
+# Collection
+# -----------------------------
+_IN_LIST = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql: str) -> str:
+    """SQL with IN-lists collapsed, so `id IN (%s, %s)` and `id IN (%s)` match."""
+    return _SPACE.sub(" ", _IN_LIST.sub("(...)", sql)).strip()
+
+
+class RequestProfile:
+    __slots__ = ("queries", "sql_time", "fingerprints", "template_time", "_template_depth")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.fingerprints = Counter()
+        self.template_time = 0.0
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+
+def _patch_template_render():
+    """Time the Django template backend's render() for the profiled request."""
+    if getattr(DjangoTemplate.render, "_crm_profiled", False):
+        return
+    original = DjangoTemplate.render
+
+    def render(self, context=None, request=None):
+        profile = getattr(_local, "profile", None)
+        if profile is None:
+            return original(self, context, request)
+        # render_to_string inside a render: count the outer one only
+        profile._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            profile._template_depth -= 1
+            if not profile._template_depth:
+                profile.template_time += time.perf_counter() - start
+
+    render._crm_profiled = True
+    DjangoTemplate.render = render
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not profiling_enabled():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.track_memory = getattr(settings, "CRM_PROFILING_MEMORY", False)
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _patch_template_render()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        _local.profile = profile
+
+        if self.track_memory:
+            ticket = _enter()
+            if ticket is not None:
+                tracemalloc.reset_peak()
+            mem_start = tracemalloc.get_traced_memory()[0]
+
+        start = time.perf_counter()
+        peak = None
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+            if self.track_memory:
+                # the peak is process-wide; keep it only if no other request overlapped
+                peak = tracemalloc.get_traced_memory()[1] - mem_start
+                if not _leave(ticket):
+                    peak = None
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "<unresolved>"
+        _record(view, elapsed, profile, peak)
+
+        response["Server-Timing"] = ", ".join([
+            f"total;dur={elapsed * 1000:.1f}",
+            f'db;dur={profile.sql_time * 1000:.1f};desc="{profile.queries} queries"',
+            f"tpl;dur={profile.template_time * 1000:.1f}",
+        ])
+        return response
+
+
+def _enter():
+    """Count a request in; returns a ticket if no other request is running."""
+    global _inflight, _started
+    with _inflight_lock:
+        _inflight += 1
+        _started += 1
+        return _started if _inflight == 1 else None
+
+
+def _leave(ticket) -> bool:
+    """Count a request out; True if nothing overlapped it since _enter()."""
+    global _inflight
+    with _inflight_lock:
+        _inflight -= 1
+        return ticket is not None and ticket == _started
+
+
+# -----------------------------
+# Aggregation
+# -----------------------------
+def _new_entry():
+    return {
+        "requests": 0,
+        "time": 0.0,
+        "max_time": 0.0,
+        "samples": deque(maxlen=SAMPLES_PER_VIEW),
+        "queries": 0,
+        "max_queries": 0,
+        "sql_time": 0.0,
+        "template_time": 0.0,
+        "peak_memory": None,
+        "memory_requests": 0,
+        # fingerprint -> [requests where it repeated, most repeats in one request]
+        "repeated": {},
+    }
+
+
+def _record(view: str, elapsed: float, profile: RequestProfile, peak):
+    repeated = [(sql, n) for sql, n in profile.fingerprints.items() if n > 1]
+
+    with _stats_lock:
+        entry = _stats.setdefault(view, _new_entry())
+        entry["requests"] += 1
+        entry["time"] += elapsed
+        entry["max_time"] = max(entry["max_time"], elapsed)
+        entry["samples"].append(elapsed)
+        entry["queries"] += profile.queries
+        entry["max_queries"] = max(entry["max_queries"], profile.queries)
+        entry["sql_time"] += profile.sql_time
+        entry["template_time"] += profile.template_time
+        if peak is not None:
+            entry["peak_memory"] = max(entry["peak_memory"] or 0, peak)
+            entry["memory_requests"] += 1
+
+        for sql, n in repeated:
+            seen = entry["repeated"].setdefault(sql, [0, 0])
+            seen[0] += 1
+            seen[1] = max(seen[1], n)
+        if len(entry["repeated"]) > TOP_REPEATED * 5:
+            keep = sorted(entry["repeated"].items(), key=lambda kv: -kv[1][1])[:TOP_REPEATED]
+            entry["repeated"] = dict(keep)
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def report() -> list[dict]:
+    """Per-view summary, slowest total time first. Times in milliseconds."""
+    with _stats_lock:
+        snapshot = {view: dict(e, samples=sorted(e["samples"]), repeated=dict(e["repeated"]))
+                    for view, e in _stats.items()}
+
+    rows = []
+    for view, e in snapshot.items():
+        n = e["requests"]
+        rows.append({
+            "view": view,
+            "requests": n,
+            "avg_ms": e["time"] / n * 1000,
+            "p50_ms": percentile(e["samples"], 50) * 1000,
+            "p95_ms": percentile(e["samples"], 95) * 1000,
+            "max_ms": e["max_time"] * 1000,
+            "avg_queries": e["queries"] / n,
+            "max_queries": e["max_queries"],
+            "avg_sql_ms": e["sql_time"] / n * 1000,
+            "avg_template_ms": e["template_time"] / n * 1000,
+            "peak_memory_kb": None if e["peak_memory"] is None else e["peak_memory"] / 1024,
+            "memory_requests": e["memory_requests"],
+            "repeated_queries": [
+                {"sql": sql, "requests": hits, "max_repeats": most}
+                for sql, (hits, most) in sorted(e["repeated"].items(), key=lambda kv: -kv[1][1])[:TOP_REPEATED]
+            ],
+        })
+    rows.sort(key=lambda r: -r["avg_ms"] * r["requests"])
+    return rows
+
+
+def reset():
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,131 @@
+"""
+Cache of computed analytics responses (graphs_data and friends).
+
+Values are the serialised response bytes. Keys are built by the caller
+from the request parameters, the visibility scope and the current data
+versions (crm.versions), so a cached entry can never be served after the
+data it came from changed: stale entries just stop being asked for and
+age out.
+
+settings.CRM_RESULT_CACHE picks the store:
+  {"BACKEND": "locmem", "MAX_BYTES": n}  per-process LRU, at most n bytes
+  {"BACKEND": "django", "ALIAS": name}   a CACHES entry (file, database,
+                                          memcached...), shared by workers
+  {"BACKEND": "none"}                    no caching
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class LRUBytesCache:
+    """In-process LRU over bytes values, evicting least-recently-used entries beyond max_bytes."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoCache:
+    """A Django cache backend; eviction is the backend's own (MAX_ENTRIES, TIMEOUT)."""
+
+    def __init__(self, alias: str = "default"):
+        self.cache = caches[alias]
+
+    def get(self, key: str):
+        return self.cache.get(key)
+
+    def set(self, key: str, value: bytes):
+        self.cache.set(key, value)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class NoCache:
+    def get(self, key: str):
+        return None
+
+    def set(self, key: str, value: bytes):
+        pass
+
+    def clear(self):
+        pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def build(config: dict):
+    backend = config.get("BACKEND", "locmem")
+    if backend == "locmem":
+        return LRUBytesCache(config.get("MAX_BYTES", DEFAULT_MAX_BYTES))
+    if backend == "django":
+        return DjangoCache(config.get("ALIAS", "default"))
+    if backend == "none":
+        return NoCache()
+    raise ImproperlyConfigured(f"Unknown CRM_RESULT_CACHE backend {backend!r}")
+
+
+def result_cache():
+    """The configured store, built on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = build(getattr(settings, "CRM_RESULT_CACHE", {}))
+    return _cache
+
+
+def reset():
+    """Forget the store (tests, or after changing the setting)."""
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+def digest(*parts) -> str:
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def cache_key(prefix: str, *parts) -> str:
+    """Short, backend-safe key: memcached allows 250 chars and no spaces."""
+    return f"crm:{prefix}:{digest(*parts)}"
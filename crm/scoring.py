@@ -0,0 +1,163 @@
+"""
+Diabetes risk scoring rules, stored as versioned threshold tables.
+
+A crm.ScoringRuleSet row holds `rules` JSON like DEFAULT_RULES below. Each
+version is compiled once per process into sorted boundary tuples, so a
+band lookup is one bisect (O(log n)) and a batch is one np.digitize.
+
+Bands: `edges` ascending, len(points) == len(edges) + 1. "inclusive": true
+means a value equal to an edge falls in the band below it (age <= 49),
+false means it falls in the band above (waist < 90).
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+import numpy as np
+
+from .models import ScoringRuleSet
+from .utils_diabetes import age_from_dob, calculate_bmi
+
+
+# Version 1 (seeded by migration 0012). Changing scoring = a new row, not an edit here.
+DEFAULT_RULES = {
+    "bands": {
+        "age": {"edges": [49, 59, 69], "points": [0, 5, 9, 13], "inclusive": True},
+        "waist_cm": {"edges": [90, 99.9, 109.9], "points": [0, 4, 6, 9], "inclusive": False},
+        "bmi": {"edges": [25, 29.9, 34.9], "points": [0, 3, 5, 8], "inclusive": False},
+    },
+    "categories": {
+        "gender": {"F": 0, "M": 1},
+        "ethnicity": {"WHITE": 0, "OTHER": 6},
+        "family_history": {"YES": 5, "NO": 0},
+        "high_bp": {"YES": 5, "NO": 0},
+    },
+}
+
+# Assessment score field <- rule name
+BAND_SCORES = {"age_score": "age", "waist_score": "waist_cm", "bmi_score": "bmi"}
+CATEGORY_SCORES = {
+    "gender_score": "gender",
+    "ethnicity_score": "ethnicity",
+    "family_history_score": "family_history",
+    "bp_score": "high_bp",
+}
+SCORE_FIELDS = [*BAND_SCORES, *CATEGORY_SCORES, "total_score"]
+
+
+class Band:
+    __slots__ = ("edges", "values", "inclusive", "_bisect")
+
+    def __init__(self, edges, values, inclusive: bool):
+        edges = tuple(float(e) for e in edges)
+        if list(edges) != sorted(edges) or len(values) != len(edges) + 1:
+            raise ValueError(f"Bad band: edges {edges}, values {values}")
+        self.edges = edges
+        self.values = tuple(values)
+        self.inclusive = inclusive
+        self._bisect = bisect_left if inclusive else bisect_right
+
+    def __call__(self, value):
+        return self.values[self._bisect(self.edges, value)]
+
+    def batch(self, values) -> np.ndarray:
+        idx = np.digitize(np.asarray(values, dtype=np.float64), self.edges, right=self.inclusive)
+        return np.asarray(self.values)[idx]
+
+
+class CompiledRules:
+    def __init__(self, rules: dict, version=None):
+        self.version = version
+        self.bands = {
+            name: Band(spec["edges"], spec["points"], spec.get("inclusive", False))
+            for name, spec in rules["bands"].items()
+        }
+        self.categories = {name: dict(points) for name, points in rules["categories"].items()}
+
+        missing = (set(BAND_SCORES.values()) - set(self.bands)) | (set(CATEGORY_SCORES.values()) - set(self.categories))
+        if missing:
+            raise ValueError(f"Scoring rules missing: {', '.join(sorted(missing))}")
+
+    def score(self, *, age, gender, ethnicity, family_history, high_bp, waist_cm, bmi) -> dict[str, int]:
+        """{score field: points} for one assessment. Unknown category codes score 0."""
+        inputs = locals()
+        scores = {field: self.bands[name](inputs[name]) for field, name in BAND_SCORES.items()}
+        for field, name in CATEGORY_SCORES.items():
+            scores[field] = self.categories[name].get(inputs[name], 0)
+        scores["total_score"] = sum(scores.values())
+        return scores
+
+    def score_batch(self, *, age, gender, ethnicity, family_history, high_bp, waist_cm, bmi) -> dict[str, np.ndarray]:
+        """score() over equal-length columns; {score field: int array}."""
+        inputs = locals()
+        scores = {field: self.bands[name].batch(inputs[name]) for field, name in BAND_SCORES.items()}
+        for field, name in CATEGORY_SCORES.items():
+            scores[field] = _category_batch(inputs[name], self.categories[name])
+        scores["total_score"] = sum(scores.values())
+        return scores
+
+
+def _category_batch(values, mapping: dict) -> np.ndarray:
+    codes, inverse = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    lookup = np.array([mapping.get(c, 0) for c in codes], dtype=np.int64)
+    return lookup[inverse.reshape(-1)]
+
+
+# total_score -> level. Deliberately not versioned: dashboard counters
+# and reports bucket every assessment by the same levels.
+RISK_LEVELS = Band([6, 15, 24], ["Low", "Increased", "Moderate", "High"], inclusive=True)
+
+
+def risk_level_from_total(total: int) -> str:
+    return RISK_LEVELS(total)
+
+
+# -----------------------------
+# Per-version cache
+# -----------------------------
+DEFAULT = CompiledRules(DEFAULT_RULES, version=1)
+
+_compiled: dict[int, CompiledRules] = {}
+_compiled_lock = threading.Lock()
+
+
+def compiled(rule_set) -> CompiledRules:
+    """CompiledRules for a ScoringRuleSet row; compiled once per process per version."""
+    rules = _compiled.get(rule_set.version)
+    if rules is None:
+        rules = CompiledRules(rule_set.rules, version=rule_set.version)
+        with _compiled_lock:
+            rules = _compiled.setdefault(rule_set.version, rules)
+    return rules
+
+
+def active_rule_set():
+    rule_set = ScoringRuleSet.objects.filter(is_active=True).order_by("-version").first()
+    if rule_set is None:
+        raise ScoringRuleSet.DoesNotExist("No active scoring rule set; run migrations.")
+    return rule_set
+
+
+def apply_scores(assessment, rule_set=None, on: date | None = None):
+    """
+    Fill bmi, every *_score, total_score and rules_version on a
+    DiabetesRiskAssessment from its raw answers (age as of `on`, default
+    today). The one place assessments are scored.
+    """
+    rule_set = rule_set or active_rule_set()
+    if assessment.height_cm and assessment.weight_kg:
+        assessment.bmi = calculate_bmi(assessment.height_cm, assessment.weight_kg)
+
+    scores = compiled(rule_set).score(
+        age=age_from_dob(assessment.date_of_birth, on),
+        gender=assessment.gender,
+        ethnicity=assessment.ethnicity,
+        family_history=assessment.family_history,
+        high_bp=assessment.high_bp,
+        waist_cm=assessment.waist_cm,
+        bmi=assessment.bmi,
+    )
+    for field, value in scores.items():
+        setattr(assessment, field, value)
+    assessment.rules_version = rule_set
+    return assessment
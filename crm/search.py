@@ -0,0 +1,230 @@
+"""
+Full-text search for the Tables page.
+
+Every table in crm.table_registry.TABLES gets an SQLite FTS5 index over its
+`search_fields`. The index is an external-content FTS5 table kept in sync by
+INSERT/UPDATE/DELETE triggers on the source table, so it also covers
+bulk_create(), queryset.update() and raw SQL (which skip model signals).
+
+Indexes are (re)created after `migrate` (see CrmConfig.ready). If the
+search_fields of a table change, a migration rebuilt the source table
+and dropped its triggers, or the triggers differ from the ones this
+module creates, the index is recreated and repopulated.
+
+Backends without FTS5 fall back to the old OR of `__icontains`.
+"""
+import re
+
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .table_registry import TABLES
+
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# (db alias, fts table name) pairs we have confirmed exist in this process
+_ready: set[tuple[str, str]] = set()
+
+
+def fts_table_name(cfg) -> str:
+    return f"crm_fts_{cfg.key}"
+
+
+def build_match(q: str) -> str | None:
+    """
+    "ann smi" -> '"ann"* "smi"*'  (every word must match, as a prefix).
+    Words are quoted so user input can never be read as FTS5 syntax.
+    """
+    tokens = _TOKEN_RE.findall(q or "")
+    if not tokens:
+        return None
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def fts_supported(connection) -> bool:
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any(row[0] == "ENABLE_FTS5" for row in cursor.fetchall())
+
+
+# -----------------------------
+# Install / rebuild
+# -----------------------------
+def _columns(cfg) -> list[str]:
+    return [cfg.model._meta.get_field(f).column for f in cfg.search_fields]
+
+
+def _table_exists(cursor, name: str) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [name])
+    return cursor.fetchone() is not None
+
+
+def _trigger_names(name: str) -> list[str]:
+    return [f"{name}_ai", f"{name}_ad", f"{name}_au"]
+
+
+def _trigger_sql(cfg, qn) -> dict[str, str]:
+    """CREATE TRIGGER statement for each sync trigger, by trigger name."""
+    name = fts_table_name(cfg)
+    source = cfg.model._meta.db_table
+    pk = cfg.model._meta.pk.column
+    cols = _columns(cfg)
+
+    col_list = ", ".join(qn(c) for c in cols)
+    new_vals = ", ".join(f"new.{qn(c)}" for c in cols)
+    old_vals = ", ".join(f"old.{qn(c)}" for c in cols)
+    insert_new = f"INSERT INTO {qn(name)}(rowid, {col_list}) VALUES (new.{qn(pk)}, {new_vals}); "
+    delete_old = (
+        f"INSERT INTO {qn(name)}({qn(name)}, rowid, {col_list}) "
+        f"VALUES ('delete', old.{qn(pk)}, {old_vals}); "
+    )
+    ai, ad, au = _trigger_names(name)
+    return {
+        ai: f"CREATE TRIGGER {qn(ai)} AFTER INSERT ON {qn(source)} BEGIN {insert_new}END",
+        ad: f"CREATE TRIGGER {qn(ad)} AFTER DELETE ON {qn(source)} BEGIN {delete_old}END",
+        # Only when an indexed column changes: saves that touch other
+        # columns leave the FTS index alone
+        au: (
+            f"CREATE TRIGGER {qn(au)} AFTER UPDATE OF {col_list}, {qn(pk)} ON {qn(source)} "
+            f"BEGIN {delete_old}{insert_new}END"
+        ),
+    }
+
+
+def _triggers_current(cursor, cfg, qn) -> bool:
+    """All three triggers exist and were created by the current _trigger_sql()."""
+    expected = _trigger_sql(cfg, qn)
+    cursor.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+        list(expected),
+    )
+    return dict(cursor.fetchall()) == expected
+
+
+def _indexed_columns(cursor, name: str) -> list[str]:
+    cursor.execute(f'PRAGMA table_info("{name}")')
+    return [row[1] for row in cursor.fetchall()]
+
+
+def _create(cursor, cfg, qn):
+    name = fts_table_name(cfg)
+    source = cfg.model._meta.db_table
+    pk = cfg.model._meta.pk.column
+    col_list = ", ".join(qn(c) for c in _columns(cfg))
+    triggers = _trigger_sql(cfg, qn)
+
+    for trigger in triggers:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {qn(trigger)}")
+    cursor.execute(f"DROP TABLE IF EXISTS {qn(name)}")
+
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE {qn(name)} USING fts5("
+        f"{col_list}, content={qn(source)}, content_rowid={qn(pk)}, "
+        f"tokenize='unicode61 remove_diacritics 2')"
+    )
+    for sql in triggers.values():
+        cursor.execute(sql)
+    cursor.execute(f"INSERT INTO {qn(name)}({qn(name)}) VALUES ('rebuild')")
+
+
+def install_fts_indexes(using=DEFAULT_DB_ALIAS, force=False) -> list[str]:
+    """
+    Make sure every registered table has an up-to-date FTS index.
+    Returns the names of indexes that were (re)built.
+    """
+    connection = connections[using]
+    if not fts_supported(connection):
+        return []
+
+    qn = connection.ops.quote_name
+    rebuilt = []
+
+    with connection.cursor() as cursor:
+        for cfg in TABLES.values():
+            if not cfg.search_fields:
+                continue
+            if not _table_exists(cursor, cfg.model._meta.db_table):
+                continue  # e.g. migrating backwards
+
+            name = fts_table_name(cfg)
+            up_to_date = (
+                _table_exists(cursor, name)
+                and _indexed_columns(cursor, name) == _columns(cfg)
+                and _triggers_current(cursor, cfg, qn)
+            )
+            if up_to_date and not force:
+                _ready.add((using, name))
+                continue
+
+            _create(cursor, cfg, qn)
+            _ready.add((using, name))
+            rebuilt.append(name)
+
+    return rebuilt
+
+
+def install_fts_after_migrate(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    install_fts_indexes(using=using)
+
+
+def _fts_ready(cfg, using=DEFAULT_DB_ALIAS) -> bool:
+    name = fts_table_name(cfg)
+    if (using, name) in _ready:
+        return True
+
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        if _table_exists(cursor, name):
+            _ready.add((using, name))
+            return True
+    return False
+
+
+# -----------------------------
+# Querying
+# -----------------------------
+def _icontains_filter(cfg, qs, q):
+    search_q = Q()
+    for field in cfg.search_fields:
+        search_q |= Q(**{f"{field}__icontains": q})
+    return qs.filter(search_q)
+
+
+def search_queryset(cfg, qs, q: str, ranked: bool = False):
+    """
+    Restrict `qs` to rows matching the search box text `q`.
+
+    With FTS5 this is an index lookup (prefix match on every word). When
+    `ranked` is set the rows are annotated with `search_rank` (bm25, lower
+    is better) so callers can order by relevance.
+    """
+    if not q or not cfg.search_fields:
+        return qs
+
+    match = build_match(q)
+    if match is None or not _fts_ready(cfg, qs.db):
+        return _icontains_filter(cfg, qs, q)
+
+    qn = connections[qs.db].ops.quote_name
+    name = qn(fts_table_name(cfg))
+    qs = qs.filter(pk__in=RawSQL(f"SELECT rowid FROM {name} WHERE {name} MATCH %s", [match]))
+
+    if ranked:
+        source = qn(cfg.model._meta.db_table)
+        pk = qn(cfg.model._meta.pk.column)
+        qs = qs.annotate(search_rank=RawSQL(
+            f"SELECT rank FROM {name} WHERE {name} MATCH %s AND rowid = {source}.{pk}",
+            [match],
+        ))
+    return qs
+
+
+def is_ranked(cfg, q: str, using=DEFAULT_DB_ALIAS) -> bool:
+    """True if search_queryset(..., ranked=True) will add `search_rank`."""
+    return bool(q and cfg.search_fields and build_match(q) and _fts_ready(cfg, using))
@@ -0,0 +1,82 @@
+from collections import Counter as Tally
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .counters import apply_deltas, counter_keys, counters_for
+from .models import DiabetesRiskAssessment, HealthCheck, Person
+from .people import identity_key, person_for
+from .versions import bump, rewrite_key
+
+
+@receiver(pre_save, sender=HealthCheck)
+@receiver(pre_save, sender=DiabetesRiskAssessment)
+def link_person(sender, instance, raw=False, **kwargs):
+    if raw:
+        return  # loaddata: fixtures carry person_id
+
+    # Skip the lookup when the linked Person is loaded and still matches
+    current = instance._state.fields_cache.get("person")
+    key = identity_key(instance.forename, instance.surname, instance.postcode)
+    if current is not None and current.pk == instance.person_id and \
+            (current.surname_norm, current.forename_norm, current.postcode_norm) == key:
+        return
+
+    instance.person = person_for(instance.forename, instance.surname, instance.postcode)
+
+
+# -----------------------------
+# Dashboard counters
+# -----------------------------
+def _keys(instance) -> Tally:
+    keys = Tally()
+    for spec in counters_for(type(instance)):
+        keys.update(counter_keys(spec, instance))
+    return keys
+
+
+@receiver(pre_save, sender=HealthCheck)
+@receiver(pre_save, sender=DiabetesRiskAssessment)
+def remember_counter_keys(sender, instance, raw=False, **kwargs):
+    instance._counter_keys = Tally()
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    old = sender.objects.filter(pk=instance.pk).first()
+    if old is not None:
+        instance._counter_keys = _keys(old)
+
+
+@receiver(post_save, sender=HealthCheck)
+@receiver(post_save, sender=DiabetesRiskAssessment)
+def update_counters(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return  # reconcile_counters after loaddata
+    deltas = _keys(instance)
+    deltas.subtract(getattr(instance, "_counter_keys", Tally()))
+    if any(deltas.values()):
+        apply_deltas(deltas)
+
+
+@receiver(post_delete, sender=HealthCheck)
+@receiver(post_delete, sender=DiabetesRiskAssessment)
+def uncount_deleted(sender, instance, **kwargs):
+    deltas = Tally()
+    deltas.subtract(_keys(instance))
+    apply_deltas(deltas)
+
+
+# -----------------------------
+# Data versions
+# -----------------------------
+@receiver(post_save, sender=HealthCheck)
+@receiver(post_save, sender=DiabetesRiskAssessment)
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=HealthCheck)
+@receiver(post_delete, sender=DiabetesRiskAssessment)
+@receiver(post_delete, sender=Person)
+def bump_data_version(sender, created=False, **kwargs):
+    # post_delete has no `created`: deletes count as rewrites too
+    if created:
+        bump(sender)
+    else:
+        bump(sender, rewrite_key(sender))
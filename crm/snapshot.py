@@ -0,0 +1,179 @@
+"""
+Columnar snapshot of the numeric columns the graphs read.
+
+`manage.py refresh_snapshot` (run it from cron, e.g. every few minutes)
+writes each model in SNAPSHOTS to one float64 .npy matrix in
+settings.CRM_SNAPSHOT_DIR, column-major so every column is contiguous,
+plus a small JSON manifest. Workers open the matrix with mmap: no copy,
+shared page cache, no SQLite or per-row float conversion.
+
+Refreshes are incremental: only rows with id > the manifest's max_id are
+fetched and appended. That is safe while the model's rewrite stamp
+(crm.versions.rewrite_key) is unchanged since the build, i.e. rows were
+only inserted; otherwise the snapshot is rebuilt in full.
+
+Reads are never stale. snapshot_matrix() returns None, so callers use
+the ORM, when existing rows changed since the build. Rows inserted since
+the build are read from the database and appended to the mapped ones.
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .analytics import numeric_matrix
+from .models import DiabetesRiskAssessment, HealthCheck
+from .versions import bump, rewrite_key, version_key, versions
+
+
+@dataclass(frozen=True)
+class SnapshotSpec:
+    model: type
+    columns: tuple   # attnames; "id" and the owner column (if the model has an OWNER_FIELD) first
+
+    @property
+    def label(self) -> str:
+        return self.model._meta.label_lower
+
+
+SNAPSHOTS = {
+    spec.label: spec
+    for spec in (
+        SnapshotSpec(HealthCheck, ("id", "created_by_id", "systolic", "diastolic", "pulse", "bmi", "age", "risk")),
+        SnapshotSpec(DiabetesRiskAssessment, (
+            "id", "submitted_by_id", "total_score", "bmi", "waist_cm", "systolic", "diastolic", "pulse",
+        )),
+    )
+}
+
+
+def snapshot_dir() -> Path:
+    return Path(settings.CRM_SNAPSHOT_DIR)
+
+
+def _manifest_path(label: str) -> Path:
+    return snapshot_dir() / f"{label}.json"
+
+
+def read_manifest(label: str):
+    try:
+        with open(_manifest_path(label)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# -----------------------------
+# Building
+# -----------------------------
+def _stamps(spec) -> tuple[int, int]:
+    found = versions(spec.model, rewrite_key(spec.model))
+    return found[version_key(spec.model)], found[rewrite_key(spec.model)]
+
+
+def refresh(spec: SnapshotSpec, full: bool = False) -> dict:
+    """Bring one snapshot up to date. Returns what was done, for the command's output."""
+    manifest = read_manifest(spec.label)
+    # Stamps first: a write during the fetch moves them past what we record
+    version, rewrite = _stamps(spec)
+    if not rewrite:
+        # A never-rewritten table is stamped 0 in every database; give this
+        # one its own stamp so a snapshot can't be matched to another copy
+        bump(rewrite_key(spec.model))
+        version, rewrite = _stamps(spec)
+
+    if manifest and not full and manifest["columns"] == list(spec.columns):
+        if manifest["version"] == version:
+            return {"action": "up to date", "rows": manifest["rows"], "added": 0}
+        append = manifest["rewrite"] == rewrite
+    else:
+        append = False
+
+    start = manifest["max_id"] if append else 0
+    new = numeric_matrix(spec.model.objects.filter(id__gt=start), list(spec.columns))
+    new = new[np.argsort(new[:, 0], kind="stable")]
+    data = np.concatenate([_open(spec.label, manifest["file"]), new]) if append else new
+
+    name = f"{spec.label}-{time.time_ns():x}.npy"
+    directory = snapshot_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    np.save(directory / name, np.asfortranarray(data))
+
+    _write_manifest(spec.label, {
+        "columns": list(spec.columns),
+        "file": name,
+        "rows": len(data),
+        "max_id": int(data[:, 0].max()) if len(data) else start,
+        "version": version,
+        "rewrite": rewrite,
+        "built_at": time.time(),
+    })
+    if manifest and manifest["file"] != name:
+        # Workers that still map the old file keep reading it until they reopen
+        (directory / manifest["file"]).unlink(missing_ok=True)
+    return {"action": "appended" if append else "rebuilt", "rows": len(data), "added": len(new)}
+
+
+def _write_manifest(label: str, manifest: dict):
+    path = _manifest_path(label)
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+# -----------------------------
+# Reading
+# -----------------------------
+_mapped: dict[str, tuple[str, np.ndarray]] = {}
+_mapped_lock = threading.Lock()
+
+
+def _open(label: str, file: str) -> np.ndarray:
+    """The snapshot matrix, memory-mapped read-only; reopened when a refresh replaced the file."""
+    with _mapped_lock:
+        cached = _mapped.get(label)
+        if cached is None or cached[0] != file:
+            data = np.load(snapshot_dir() / file, mmap_mode="r")
+            _mapped[label] = cached = (file, data)
+        return cached[1]
+
+
+def snapshot_matrix(model, fields, perms):
+    """
+    `fields` of every row `perms` may see, as an (n, len(fields)) float
+    array: the mapped snapshot plus rows inserted since it was built.
+    None when there is no usable snapshot (callers fall back to the ORM).
+    """
+    spec = SNAPSHOTS.get(model._meta.label_lower)
+    if spec is None or not set(fields) <= set(spec.columns):
+        return None
+    manifest = read_manifest(spec.label)
+    if not manifest or manifest["columns"] != list(spec.columns):
+        return None
+
+    version, rewrite = _stamps(spec)
+    if manifest["rewrite"] != rewrite:
+        return None  # rows were updated or deleted since the build
+    try:
+        data = _open(spec.label, manifest["file"])
+    except (OSError, ValueError):
+        return None  # replaced by a refresh since we read the manifest
+
+    index = [spec.columns.index(f) for f in fields]
+    if not perms.view_all and getattr(model, "OWNER_FIELD", None):
+        if perms.user_id is None:
+            return np.empty((0, len(fields)))
+        data = data[data[:, 1] == perms.user_id]
+    result = data[:, index]
+
+    if manifest["version"] != version:
+        # only inserts since the build: read just those
+        tail = model.objects.visible_to(perms).filter(id__gt=manifest["max_id"])
+        result = np.concatenate([result, numeric_matrix(tail, list(fields))])
+    return result
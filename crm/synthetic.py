@@ -0,0 +1,275 @@
+"""
+Synthetic data for benchmarks (manage.py generate_synthetic_data).
+
+Records are drawn from a pool of people, so most people have several
+health checks / assessments (as in real clinics), and are spread over the
+last `days` days across a handful of users of every role. Columns are
+generated with NumPy and written with bulk_create in batches. The pool's
+Person rows are resolved once up front (crm.people.assign_people) and
+each record just takes its person_id. Dates are scattered, so per-batch
+counter deltas would be one UPDATE per (day, user, bucket): callers
+rebuild the dashboard counters once at the end instead
+(crm.counters.rebuild_counters).
+
+Never run this against a database with real patients in it.
+"""
+from dataclasses import dataclass
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from forms_builder.indexing import index_submissions
+from forms_builder.models import FormDefinition, FormField, FormSubmission
+from .models import DiabetesRiskAssessment, HealthCheck
+from .people import assign_people
+from .scoring import active_rule_set, compiled
+from .utils_diabetes import ages_on
+from .versions import bump
+
+
+SYNTHETIC_USER_PREFIX = "synthetic_"
+SYNTHETIC_FORM_NAME = "Synthetic survey"
+SYNTHETIC_BATCH_SIZE = 5000
+
+FORENAMES = [
+    "Aisha", "Amelia", "Ann", "Ben", "Chloe", "Daniel", "Ella", "Fatima", "George", "Grace",
+    "Harry", "Isla", "Jack", "James", "Leo", "Lily", "Mohammed", "Noah", "Olivia", "Oscar",
+    "Priya", "Ravi", "Sophie", "Thomas", "Zara",
+]
+SURNAMES = [
+    "Ahmed", "Brown", "Clarke", "Davies", "Evans", "Green", "Hall", "Hughes", "Jones", "Khan",
+    "Lewis", "Martin", "Patel", "Roberts", "Singh", "Smith", "Taylor", "Thomas", "Walker", "Wilson",
+    "Wood", "Wright", "Young",
+]
+GPS = [f"Dr {s}" for s in SURNAMES[:12]] + ["Riverside Surgery", "High Street Practice", ""]
+RISKS = ["Low", "Low", "Medium", "High", ""]
+
+
+@dataclass
+class PeoplePool:
+    """Per-person attributes; records pick a row index into these columns."""
+    forename: np.ndarray
+    surname: np.ndarray
+    postcode: np.ndarray
+    gender: np.ndarray
+    ethnicity: np.ndarray
+    date_of_birth: np.ndarray      # datetime64[D]
+    height_cm: np.ndarray
+    weight_kg: np.ndarray
+    systolic: np.ndarray
+    family_history: np.ndarray
+    person_id: list | None = None  # crm.Person ids, see link_people()
+
+    def __len__(self):
+        return len(self.forename)
+
+
+def make_people(rng, n: int) -> PeoplePool:
+    postcodes = np.array([
+        f"{a}{b}{d1} {d2}{c}{e}"
+        for a, b, d1, d2, c, e in zip(
+            rng.choice(list("BLMNS"), n), rng.choice(list("ABCEH"), n), rng.integers(1, 20, n),
+            rng.integers(1, 10, n), rng.choice(list("ABDEFGH"), n), rng.choice(list("JLNPQRST"), n),
+        )
+    ])
+    height = rng.normal(170, 10, n).clip(145, 205).round()
+    return PeoplePool(
+        forename=rng.choice(FORENAMES, n),
+        surname=rng.choice(SURNAMES, n),
+        postcode=postcodes,
+        gender=rng.choice(["F", "M"], n),
+        ethnicity=rng.choice(["WHITE", "OTHER"], n, p=[0.7, 0.3]),
+        date_of_birth=np.datetime64("1940-01-01") + rng.integers(0, 365 * 65, n).astype("timedelta64[D]"),
+        height_cm=height,
+        weight_kg=(rng.normal(27, 5, n).clip(17, 50) * (height / 100) ** 2).round(1),
+        systolic=rng.normal(128, 15, n).clip(90, 200),
+        family_history=rng.choice(["YES", "NO"], n, p=[0.3, 0.7]),
+    )
+
+
+def link_people(people: PeoplePool, chunk_size: int = SYNTHETIC_BATCH_SIZE):
+    """Find or create the Person row of everyone in the pool."""
+    people.person_id = []
+    for start in range(0, len(people), chunk_size):
+        stop = start + chunk_size
+        rows = [
+            SimpleNamespace(forename=f, surname=s, postcode=p)
+            for f, s, p in zip(people.forename[start:stop], people.surname[start:stop], people.postcode[start:stop])
+        ]
+        with transaction.atomic():
+            assign_people(rows)
+        people.person_id.extend(r.person_id for r in rows)
+
+
+def synthetic_users(per_role: int = 2) -> dict[str, list]:
+    """{role: [user, ...]}, created on first use."""
+    User = get_user_model()
+    users = {}
+    for role in User.Role.values:
+        users[role] = []
+        for i in range(per_role):
+            user, created = User.objects.get_or_create(
+                username=f"{SYNTHETIC_USER_PREFIX}{role.lower()}_{i + 1}",
+                defaults={"role": role},
+            )
+            if created:
+                user.set_unusable_password()
+                user.save(update_fields=["password"])
+            users[role].append(user)
+    return users
+
+
+def synthetic_form() -> FormDefinition:
+    """A generic form with one question of every type."""
+    form_def, created = FormDefinition.objects.get_or_create(
+        name=SYNTHETIC_FORM_NAME, defaults={"description": "Generated by generate_synthetic_data."},
+    )
+    if created:
+        questions = [
+            ("visit_reason", "Reason for visit", FormField.CHOICE, "Check-up\nFollow-up\nReferral\nWalk-in"),
+            ("steps_per_day", "Steps per day", FormField.NUMBER, ""),
+            ("sleep_hours", "Hours of sleep", FormField.DECIMAL, ""),
+            ("last_visit", "Last visit", FormField.DATE, ""),
+            ("notes", "Notes", FormField.TEXT, ""),
+        ]
+        for order, (key, label, field_type, choices) in enumerate(questions):
+            FormField.objects.create(form=form_def, key=key, label=label, field_type=field_type,
+                                     choices_text=choices, order=order)
+    return form_def
+
+
+def _timestamps(rng, n: int, days: int) -> list[datetime]:
+    """Aware datetimes spread over the last `days` days, in order."""
+    now = timezone.now()
+    offsets = np.sort(rng.integers(0, days * 86400, n))[::-1]
+    return [now - timedelta(seconds=int(s)) for s in offsets]
+
+
+def _bulk_create_stamped(model, objs, stamp_field: str):
+    """
+    bulk_create() that keeps each object's generated `stamp_field`:
+    auto_now_add overwrites it on insert, so it is written back with
+    bulk_update(), which doesn't apply auto_now_add.
+    """
+    stamps = [getattr(obj, stamp_field) for obj in objs]
+    model.objects.bulk_create(objs, batch_size=500)
+    for obj, stamp in zip(objs, stamps):
+        setattr(obj, stamp_field, stamp)
+    model.objects.bulk_update(objs, [stamp_field], batch_size=500)
+
+
+def _save(model, objs, stamp_field: str):
+    with transaction.atomic():
+        _bulk_create_stamped(model, objs, stamp_field)
+        bump(model)
+
+
+def generate_healthchecks(rng, people: PeoplePool, users: list, n: int, days: int,
+                          batch_size: int = SYNTHETIC_BATCH_SIZE) -> int:
+    for start in range(0, n, batch_size):
+        size = min(batch_size, n - start)
+        who = rng.integers(0, len(people), size)
+        stamps = _timestamps(rng, size, days)
+        check_dates = [timezone.localdate(t) for t in stamps]
+        ages = ages_on(people.date_of_birth[who].tolist(), check_dates)
+        systolic = (people.systolic[who] + rng.normal(0, 8, size)).round().astype(int)
+        bmi = people.weight_kg[who] / (people.height_cm[who] / 100) ** 2 + rng.normal(0, 0.8, size)
+        owners = rng.integers(0, len(users), size)
+        gps = rng.choice(GPS, size)
+        risks = rng.choice(RISKS, size)
+        pulse = rng.normal(72, 10, size).round().astype(int)
+
+        objs = [
+            HealthCheck(
+                forename=people.forename[p], surname=people.surname[p], postcode=people.postcode[p],
+                gender=people.gender[p], ethnicity=people.ethnicity[p].title(),
+                age=int(ages[i]), gp=gps[i],
+                systolic=int(systolic[i]), diastolic=int(systolic[i] * 0.65),
+                pulse=int(pulse[i]),
+                bmi=Decimal(f"{bmi[i]:.2f}"), risk=risks[i],
+                check_date=check_dates[i], created_by=users[owners[i]],
+                created_at=stamps[i], person_id=people.person_id[p],
+            )
+            for i, p in enumerate(who.tolist())
+        ]
+        _save(HealthCheck, objs, "created_at")
+    return n
+
+
+def generate_assessments(rng, people: PeoplePool, users: list, n: int, days: int,
+                         batch_size: int = SYNTHETIC_BATCH_SIZE) -> int:
+    rule_set = active_rule_set()
+    rules = compiled(rule_set)
+    for start in range(0, n, batch_size):
+        size = min(batch_size, n - start)
+        who = rng.integers(0, len(people), size)
+        stamps = _timestamps(rng, size, days)
+        height = people.height_cm[who]
+        weight = (people.weight_kg[who] + rng.normal(0, 1.5, size)).round(1)
+        bmi = (weight / (height / 100) ** 2).round(1)
+        waist = (bmi * 3.3 + rng.normal(0, 5, size)).round()
+        high_bp = np.where(people.systolic[who] > 140, "YES", "NO")
+        dobs = people.date_of_birth[who].tolist()
+        owners = rng.integers(0, len(users), size)
+
+        scores = rules.score_batch(
+            age=ages_on(dobs, [timezone.localdate(t) for t in stamps]),
+            gender=people.gender[who], ethnicity=people.ethnicity[who],
+            family_history=people.family_history[who], high_bp=high_bp,
+            waist_cm=waist, bmi=bmi,
+        )
+        scores = {name: values.tolist() for name, values in scores.items()}
+
+        objs = [
+            DiabetesRiskAssessment(
+                forename=people.forename[p], surname=people.surname[p], postcode=people.postcode[p],
+                gender=people.gender[p], ethnicity=people.ethnicity[p], date_of_birth=dobs[i],
+                gp=GPS[p % len(GPS)],
+                waist_cm=float(waist[i]), height_cm=int(height[i]), weight_kg=float(weight[i]),
+                bmi=float(bmi[i]), family_history=people.family_history[p], high_bp=high_bp[i],
+                rules_version=rule_set, submitted_by=users[owners[i]],
+                submitted_at=stamps[i], person_id=people.person_id[p],
+                **{name: values[i] for name, values in scores.items()},
+            )
+            for i, p in enumerate(who.tolist())
+        ]
+        _save(DiabetesRiskAssessment, objs, "submitted_at")
+    return n
+
+
+def generate_submissions(rng, form_def: FormDefinition, users: list, n: int, days: int,
+                         batch_size: int = SYNTHETIC_BATCH_SIZE) -> int:
+    fields = list(FormField.objects.filter(form=form_def))
+    reasons = next(f for f in fields if f.key == "visit_reason").choices_list()
+    for start in range(0, n, batch_size):
+        size = min(batch_size, n - start)
+        stamps = _timestamps(rng, size, days)
+        reason = rng.integers(0, len(reasons), size)
+        steps = rng.lognormal(8.6, 0.5, size).astype(int)
+        sleep = rng.normal(7, 1.2, size).clip(3, 12).round(1)
+        owners = rng.integers(0, len(users), size)
+
+        objs = [
+            FormSubmission(
+                form=form_def,
+                submitted_by=users[owners[i]],
+                submitted_at=stamps[i],
+                answers={
+                    "visit_reason": reasons[reason[i]][0],
+                    "steps_per_day": int(steps[i]),
+                    "sleep_hours": str(sleep[i]),
+                    "last_visit": (timezone.localdate(stamps[i]) - timedelta(days=int(steps[i] % 400))).isoformat(),
+                    "notes": "" if i % 3 else f"Follow up in {int(steps[i] % 12) + 1} weeks",
+                },
+            )
+            for i in range(size)
+        ]
+        with transaction.atomic():
+            _bulk_create_stamped(FormSubmission, objs, "submitted_at")
+            index_submissions(objs, fields)
+    return n
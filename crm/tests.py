@@ -1,3 +1,1025 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import tracemalloc
+import zipfile
+from datetime import date
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from accounts.permissions import PermissionContext
+from forms_builder.models import FormDefinition, FormField, FormSubmission
+from . import profiling, result_cache, snapshot
+from .columns import table_columns, visible_columns
+from .counters import rebuild_counters, record_created
+from .models import DailyCounter, DiabetesRiskAssessment, HealthCheck, Person, ScoringRuleSet, TableColumnPreference
+from .people import assign_people
+from .pagination import encode_cursor, keyset_page, ordering_for, PAGE_SIZE
+from .search import build_match, fts_supported, fts_table_name, install_fts_indexes, is_ranked, search_queryset
+from .table_registry import TABLES
+from .scoring import DEFAULT, DEFAULT_RULES, risk_level_from_total
+from .utils_diabetes import age_from_dob, ages_on
+from .versions import bump, versions
+from .views_tables import filtered_queryset, filtered_submissions
+
+
+def make_check(user, **kwargs):
+    data = {"forename": "Ann", "surname": "Smith", "postcode": "AB1 2CD", "created_by": user}
+    data.update(kwargs)
+    return HealthCheck.objects.create(**data)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("admin", password="x", role="ADMIN")
+
+    def _walk(self, sort_field, descending, page_size=2):
+        field = HealthCheck._meta.get_field(sort_field)
+        seen, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(
+                HealthCheck.objects.all(), field.attname, descending, cursor,
+                page_size=page_size, field=field,
+            )
+            seen.extend(r.id for r in rows)
+            if not cursor:
+                return seen
+
+    def test_walks_every_row_once_with_nulls_and_ties(self):
+        dates = [date(2024, 1, 1), None, date(2024, 3, 1), date(2024, 1, 1), None, date(2024, 2, 1)]
+        checks = [make_check(self.user, check_date=d) for d in dates]
+
+        for descending in (True, False):
+            ids = self._walk("check_date", descending)
+            self.assertEqual(sorted(ids), sorted(c.id for c in checks))
+            self.assertEqual(len(ids), len(set(ids)))
+
+            # NULL dates always come last
+            self.assertEqual(
+                {c.id for c in checks if c.check_date is None},
+                set(ids[-2:]),
+            )
+
+    def test_id_order_matches_plain_order_by(self):
+        for _ in range(5):
+            make_check(self.user)
+        expected = list(HealthCheck.objects.order_by("-id").values_list("id", flat=True))
+        self.assertEqual(self._walk("id", True), expected)
+
+    def test_tables_page_serves_rows_past_first_page(self):
+        HealthCheck.objects.bulk_create([
+            HealthCheck(forename=f"P{i}", surname="S", created_by=self.user)
+            for i in range(PAGE_SIZE + 5)
+        ])
+        self.client.force_login(self.user)
+
+        first = self.client.get(reverse("tables_page"), {"table": "healthchecks"})
+        next_query = first.context["next_query"]
+        self.assertTrue(next_query)
+
+        second = self.client.get(f"{reverse('tables_page')}?{next_query}", HTTP_HX_REQUEST="true")
+        self.assertEqual(len(second.context["rows"]), 5)
+        self.assertEqual(second.context["next_query"], "")
+        self.assertTemplateUsed(second, "crm/partials/table_tbody.html")
+
+
+@skipUnless(fts_supported(connection), "SQLite without FTS5")
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("admin", password="x", role="ADMIN")
+        self.cfg = TABLES["healthchecks"]
+
+    def _search(self, q):
+        return set(search_queryset(self.cfg, HealthCheck.objects.all(), q).values_list("id", flat=True))
+
+    def test_build_match_quotes_words_as_prefixes(self):
+        self.assertEqual(build_match('ann "OR smi*'), '"ann"* "OR"* "smi"*')
+        self.assertIsNone(build_match("  --  "))
+
+    def test_index_follows_insert_update_delete(self):
+        ann = make_check(self.user, forename="Annabel", surname="Jones", gp="Riverside")
+        bob = make_check(self.user, forename="Bob", surname="Annan")
+
+        self.assertEqual(self._search("ann"), {ann.id, bob.id})
+        self.assertEqual(self._search("ann riv"), {ann.id})
+
+        HealthCheck.objects.filter(pk=ann.pk).update(gp="Hilltop")
+        self.assertEqual(self._search("riv"), set())
+        self.assertEqual(self._search("hill"), {ann.id})
+
+        bob.delete()
+        self.assertEqual(self._search("ann"), {ann.id})
+
+    def test_update_trigger_only_fires_for_indexed_columns(self):
+        name = fts_table_name(self.cfg)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = %s", [f"{name}_au"])
+            self.assertIn("AFTER UPDATE OF", cursor.fetchone()[0])
+
+            # an index left with the old catch-all trigger is rebuilt
+            cursor.execute(f'DROP TRIGGER "{name}_au"')
+            cursor.execute(
+                f'CREATE TRIGGER "{name}_au" AFTER UPDATE ON "{self.cfg.model._meta.db_table}" BEGIN SELECT 1; END'
+            )
+        self.assertIn(name, install_fts_indexes())
+        self.assertNotIn(name, install_fts_indexes())
+
+    def test_ranked_results_prefer_more_matching_columns(self):
+        weak = make_check(self.user, forename="Kim", surname="Other", gp="Kim Lane")
+        strong = make_check(self.user, forename="Kim", surname="Kim", gp="Kim Lane")
+        qs = search_queryset(self.cfg, HealthCheck.objects.all(), "kim", ranked=True)
+        ordered = list(qs.order_by("search_rank").values_list("id", flat=True))
+        self.assertEqual(ordered, [strong.id, weak.id])
+
+
+class IcontainsSearchFallbackTests(TestCase):
+    """Backends without FTS5: search_queryset() ORs `__icontains` over search_fields."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("admin", password="x", role="ADMIN")
+        self.cfg = TABLES["healthchecks"]
+        patcher = mock.patch("crm.search._fts_ready", return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_substring_match_in_any_search_field(self):
+        ann = make_check(self.user, forename="Annabel", surname="Jones", gp="Riverside")
+        bob = make_check(self.user, forename="Bob", surname="Hannan", gp="Hilltop")
+        make_check(self.user, forename="Cy", surname="Other", gp="Elm")
+
+        def search(q):
+            return set(search_queryset(self.cfg, HealthCheck.objects.all(), q).values_list("id", flat=True))
+
+        self.assertEqual(search("NNA"), {ann.id, bob.id})   # mid-word, case-insensitive
+        self.assertEqual(search("verS"), {ann.id})
+        self.assertEqual(search("nobody"), set())
+        self.assertFalse(is_ranked(self.cfg, "nna"))
+
+
+class BmiImprovementTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("admin", password="x", role="ADMIN")
+        self.client.force_login(self.user)
+
+    def fetch(self):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(reverse("graphs_data"), {"mode": "bmi_improvement"})
+        return res.json(), len(ctx.captured_queries)
+
+    def add_person(self, forename, bmis, postcode="AB1"):
+        for bmi in bmis:
+            make_check(self.user, forename=forename, postcode=postcode, bmi=bmi)
+
+    def test_first_and_last_bmi_per_person(self):
+        self.add_person("Zed", [Decimal("30.00"), Decimal("29.00"), Decimal("27.50")])
+        self.add_person("Amy", [Decimal("22.00"), None, Decimal("23.25"), Decimal("24.00")])
+        self.add_person("Bob", [Decimal("25.00"), Decimal("24.00")])            # < 3 checks
+        self.add_person("Cal", [None, Decimal("31.00"), Decimal("30.00")])      # first BMI missing
+
+        data, _ = self.fetch()
+        self.assertEqual(data, {
+            "ok": True,
+            "mode": "bmi_improvement",
+            "series": [{"label": "BMI change (last - first)", "points": [
+                {"person": "Amy Smith (AB1)", "delta": 2.0, "count": 4},
+                {"person": "Zed Smith (AB1)", "delta": -2.5, "count": 3},
+            ]}],
+            "unlinked": 0,
+        })
+
+    def test_checks_without_a_person_are_counted(self):
+        self.add_person("Zed", [Decimal("30.00"), Decimal("29.00"), Decimal("27.50")])
+        HealthCheck.objects.filter(pk=make_check(self.user, forename="Amy").pk).update(person=None)
+
+        data, _ = self.fetch()
+        self.assertEqual(len(data["series"][0]["points"]), 1)
+        self.assertEqual(data["unlinked"], 1)
+
+    def test_query_count_does_not_grow_with_people(self):
+        for i in range(2):
+            self.add_person(f"P{i}", [Decimal("30"), Decimal("29"), Decimal("28")])
+        _, few = self.fetch()
+
+        for i in range(2, 30):
+            self.add_person(f"P{i}", [Decimal("30"), Decimal("29"), Decimal("28")])
+        data, many = self.fetch()
+
+        self.assertEqual(len(data["series"][0]["points"]), 30)
+        self.assertEqual(few, many)
+
+
+class CorrelationSamplingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("admin", password="x", role="ADMIN")
+        self.client.force_login(self.user)
+        HealthCheck.objects.bulk_create([
+            HealthCheck(forename="P", surname="S", created_by=self.user,
+                        systolic=100 + i % 40, pulse=60 + i % 7, risk="n/a" if i == 0 else "")
+            for i in range(300)
+        ])
+
+    def get(self, **params):
+        return self.client.get(reverse("graphs_data"), {"mode": "correlation", **params}).json()
+
+    def test_reservoir_sample_respects_budget(self):
+        data = self.get(x="systolic", y="pulse", sample="reservoir", budget=50)
+        self.assertEqual(data["total"], 300)
+        self.assertEqual(len(data["series"][0]["points"]), 50)
+
+        # small tables are returned whole in auto mode
+        data = self.get(x="systolic", y="pulse")
+        self.assertEqual((data["sample"], len(data["series"][0]["points"])), ("none", 300))
+
+    def test_grid_counts_add_up(self):
+        data = self.get(x="systolic", y="pulse", sample="grid", bins=10)
+        points = data["series"][0]["points"]
+        self.assertLessEqual(len(points), 100)
+        self.assertEqual(sum(p["count"] for p in points), 300)
+
+    def test_unparseable_values_are_skipped(self):
+        data = self.get(x="systolic", y="risk", sample="none")
+        self.assertEqual(data["total"], 0)
+        self.assertEqual(self.get(x="systolic", y="pulse", sample="bogus"), {"ok": False, "error": "Invalid sample"})
+
+
+class PersonIdentityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("admin", password="x", role="ADMIN")
+
+    def test_checks_are_linked_to_normalised_person(self):
+        a = make_check(self.user, forename="Ann", surname="Smith", postcode="AB1 2CD")
+        b = make_check(self.user, forename=" ann ", surname="SMITH", postcode="ab12cd")
+        c = make_check(self.user, forename="Ann", surname="Smith", postcode="ZZ1")
+
+        self.assertEqual(a.person_id, b.person_id)
+        self.assertNotEqual(a.person_id, c.person_id)
+        self.assertEqual(str(a.person), "Ann Smith (AB1 2CD)")
+
+        # editing identity fields moves the check to another person
+        b.postcode = "ZZ1"
+        b.save()
+        self.assertEqual(b.person_id, c.person_id)
+
+    def test_bulk_assignment_reuses_existing_people(self):
+        existing = make_check(self.user, forename="Kim", surname="Lee").person
+        objs = assign_people([
+            HealthCheck(forename="KIM", surname="lee", postcode="AB1 2CD", created_by=self.user),
+            HealthCheck(forename="New", surname="Person", created_by=self.user),
+            HealthCheck(forename="new", surname="person", created_by=self.user),
+        ])
+        self.assertEqual(objs[0].person_id, existing.id)
+        self.assertEqual(objs[1].person_id, objs[2].person_id)
+        self.assertEqual(Person.objects.count(), 2)
+
+    def test_progression_by_person_id(self):
+        first = make_check(self.user, systolic=120)
+        make_check(self.user, forename="ANN", systolic=130)
+        make_check(self.user, forename="Other", systolic=200)
+        self.client.force_login(self.user)
+
+        data = self.client.get(reverse("graphs_data"), {
+            "mode": "progression", "metric": "systolic", "person": first.person_id,
+        }).json()
+        self.assertEqual(data["series"][0]["data"], [120.0, 130.0])
+
+
+class PersonSearchTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user("admin", password="x", role="ADMIN")
+        self.staff = User.objects.create_user("staff", password="x", role="STAFF")
+        for i in range(7):
+            make_check(self.admin, forename=f"Ann{i}", surname="Smith", postcode="AB1 2CD")
+        make_check(self.staff, forename="Annie", surname="Jones", postcode="ZZ9 9ZZ")
+
+    def search(self, user, **params):
+        self.client.force_login(user)
+        return self.client.get(reverse("graphs_people"), params).json()
+
+    def labels(self, data):
+        return [r["label"] for r in data["results"]]
+
+    def test_min_length_and_prefix_words(self):
+        self.assertEqual(self.search(self.admin, q="a")["results"], [])
+        self.assertEqual(self.labels(self.search(self.admin, q="ann jon")), ["Annie Jones (ZZ9 9ZZ)"])
+        self.assertEqual(len(self.search(self.admin, q="zz9 9z")["results"]), 1)
+
+    def test_cursor_pages_cover_every_match(self):
+        data = self.search(self.admin, q="ann", limit=3)
+        seen = self.labels(data)
+        while data["next_cursor"]:
+            data = self.search(self.admin, q="ann", limit=3, cursor=data["next_cursor"])
+            seen += self.labels(data)
+        self.assertEqual(len(seen), 8)
+        self.assertEqual(len(set(seen)), 8)
+
+    def test_staff_only_find_their_own_people(self):
+        self.assertEqual(self.labels(self.search(self.staff, q="ann")), ["Annie Jones (ZZ9 9ZZ)"])
+
+
+class DashboardCounterTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user("admin", password="x", role="ADMIN")
+        self.staff = User.objects.create_user("staff", password="x", role="STAFF")
+
+    def counters(self):
+        return {
+            (c.metric, c.owner_id, c.bucket): c.count
+            for c in DailyCounter.objects.exclude(count=0)
+        }
+
+    def test_signals_track_create_update_delete(self):
+        a = make_check(self.staff, gp="Dr Who")
+        make_check(self.admin, gp="Dr Who")
+        a.gp = "Dr No"
+        a.save()
+        make_check(self.admin, gp="").delete()
+
+        counts = self.counters()
+        self.assertEqual(counts[("healthchecks", 0, "")], 2)
+        self.assertEqual(counts[("healthchecks", self.staff.id, "")], 1)
+        self.assertEqual(counts[("healthchecks_by_gp", 0, "Dr No")], 1)
+        self.assertEqual(counts[("healthchecks_by_gp", 0, "Dr Who")], 1)
+        self.assertNotIn(("healthchecks_by_gp", 0, "Unknown"), counts)
+
+        # the incrementally maintained rows agree with a full rebuild
+        rebuild_counters()
+        self.assertEqual(self.counters(), counts)
+
+    def test_bulk_create_path_and_dashboard_scope(self):
+        objs = HealthCheck.objects.bulk_create([
+            HealthCheck(forename="A", surname="B", gp="Dr Who", created_by=self.staff, created_at=timezone.now()),
+            HealthCheck(forename="C", surname="D", gp="Dr Who", created_by=self.admin, created_at=timezone.now()),
+        ])
+        record_created(objs)
+
+        self.client.force_login(self.staff)
+        with self.assertNumQueries(6):  # session, user, 4 counter reads
+            res = self.client.get(reverse("dashboard"))
+        self.assertEqual(res.context["total_health_checks"], 1)
+        self.assertEqual(res.context["top_gps"], [("Dr Who", 1)])
+
+        self.client.force_login(self.admin)
+        res = self.client.get(reverse("dashboard"))
+        self.assertEqual(res.context["health_checks_this_month"], 2)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user("admin", password="x", role="ADMIN")
+        self.staff = User.objects.create_user("staff", password="x", role="STAFF")
+
+    def export(self, user, **params):
+        self.client.force_login(user)
+        res = self.client.get(reverse("tables_export"), params)
+        self.assertEqual(res.status_code, 200)
+        return b"".join(res.streaming_content)
+
+    def test_csv_applies_visibility_search_and_sort(self):
+        make_check(self.staff, surname="Zed", gp="=HYPERLINK()")
+        make_check(self.staff, surname="Able")
+        make_check(self.admin, surname="Admin")
+
+        body = self.export(self.staff, table="healthchecks", sort="surname").decode("utf-8-sig")
+        rows = list(csv.reader(io.StringIO(body)))
+        surname = rows[0].index("Surname")
+
+        self.assertEqual([r[surname] for r in rows[1:]], ["Able", "Zed"])
+        self.assertEqual(rows[2][rows[0].index("Created By")], "staff")
+        self.assertIn("'=HYPERLINK()", rows[2])
+
+        body = self.export(self.admin, table="healthchecks", q="adm").decode("utf-8-sig")
+        self.assertEqual(len(body.strip().splitlines()), 2)
+
+    def test_xlsx_flattens_form_answers(self):
+        form = FormDefinition.objects.create(name="Coffee", created_by=self.admin)
+        FormField.objects.create(form=form, key="name", label="Name", order=0)
+        FormField.objects.create(form=form, key="spend", label="Spend", field_type=FormField.DECIMAL, order=1)
+        FormSubmission.objects.create(form=form, submitted_by=self.admin, answers={"name": "Ada & co", "spend": "4.50"})
+
+        body = self.export(self.admin, table=f"form:{form.id}", format="xlsx")
+        with zipfile.ZipFile(io.BytesIO(body)) as zf:
+            self.assertIsNone(zf.testzip())
+            sheet = zf.read("xl/worksheets/sheet1.xml").decode()
+
+        self.assertIn("<t xml:space=\"preserve\">Spend</t>", sheet)
+        self.assertIn("Ada &amp; co", sheet)
+        self.assertIn('<c r="C2"><v>4.500000</v></c>', sheet)
+
+
+class ScoringTests(TestCase):
+    def test_v1_rules_match_the_old_thresholds(self):
+        bands = DEFAULT.bands
+        self.assertEqual([bands["waist_cm"](w) for w in (89.999, 90, 99.89, 99.9, 109.9)], [0, 4, 4, 6, 9])
+        self.assertEqual([bands["bmi"](b) for b in (24.9, 25, 29.9, 34.89, 34.9)], [0, 3, 5, 5, 8])
+        self.assertEqual([bands["age"](a) for a in (49, 50, 59, 69, 70)], [0, 5, 5, 9, 13])
+        self.assertEqual([risk_level_from_total(t) for t in (6, 7, 15, 24, 25)],
+                         ["Low", "Increased", "Increased", "Moderate", "High"])
+
+    def test_batch_matches_scalar_lookups(self):
+        waist = np.round(np.arange(80, 120, 0.05), 2).tolist() + [89.999, 99.9, 99.89999, 109.9]
+        bmi = np.round(np.arange(18, 40, 0.05), 2).tolist() + [24.999, 29.9, 34.9, 34.90001]
+        ages = list(range(0, 100))
+
+        for name, values in (("waist_cm", waist), ("bmi", bmi), ("age", ages)):
+            band = DEFAULT.bands[name]
+            self.assertEqual(band.batch(values).tolist(), [band(v) for v in values], name)
+
+        dobs = [date(1960, 2, 29), date(1975, 12, 31), date(2000, 1, 1), date(1949, 6, 15)]
+        on = [date(2024, 2, 28), date(2024, 12, 31), date(2024, 1, 1), date(2024, 6, 14)]
+        self.assertEqual(ages_on(dobs, on).tolist(), [age_from_dob(d, o) for d, o in zip(dobs, on)])
+
+    def test_both_entry_points_score_with_the_active_version(self):
+        user = User.objects.create_user("admin", password="x", role="ADMIN")
+        rules = json.loads(json.dumps(DEFAULT_RULES))
+        rules["bands"]["waist_cm"]["points"] = [0, 1, 2, 3]
+        v2 = ScoringRuleSet.objects.create(version=2, rules=rules, is_active=True)
+
+        data = {
+            "forename": "Ann", "surname": "Smith", "gender": "F", "ethnicity": "WHITE",
+            "date_of_birth": "1990-01-01", "waist_cm": "100", "height_cm": "170", "weight_kg": "60",
+            "family_history": "NO", "high_bp": "NO",
+        }
+        form_def = FormDefinition.objects.create(name="Diabetes", created_by=user)
+        self.client.force_login(user)
+        self.client.post(reverse("diabetes_risk_create"), data)
+        self.client.post(reverse("diabetes_risk_form", args=[form_def.pk]), data)
+
+        saved = list(DiabetesRiskAssessment.objects.values_list("rules_version", "waist_score", "bmi", "total_score"))
+        self.assertEqual(saved, [(v2.pk, 2, 20.8, 2)] * 2)
+
+    def test_rescore_command_updates_stale_rows(self):
+        user = User.objects.create_user("admin", password="x", role="ADMIN")
+        row = DiabetesRiskAssessment.objects.create(
+            forename="Ann", surname="Smith", gender="M", ethnicity="OTHER",
+            date_of_birth=date(1950, 1, 1), waist_cm=100, height_cm=170, weight_kg=80, bmi=27.7,
+            family_history="YES", high_bp="NO",
+            age_score=0, gender_score=0, ethnicity_score=0, family_history_score=0,
+            waist_score=0, bmi_score=0, bp_score=0, total_score=0,
+            submitted_by=user,
+        )
+        call_command("rescore_diabetes", stdout=io.StringIO())
+        row.refresh_from_db()
+
+        age_pts = DEFAULT.bands["age"](age_from_dob(row.date_of_birth, timezone.localdate(row.submitted_at)))
+        self.assertEqual(row.waist_score, 6)
+        self.assertEqual(row.bmi_score, 3)
+        self.assertEqual(row.total_score, age_pts + 1 + 6 + 5 + 6 + 3)
+        self.assertEqual(row.rules_version.version, 1)
+        self.assertEqual(
+            DailyCounter.objects.get(metric="diabetes_by_band", owner_id=0).bucket,
+            risk_level_from_total(row.total_score),
+        )
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("staff", password="x", role="STAFF")
+
+    def test_command_imports_valid_rows_and_reports_bad_ones(self):
+        rows = "Forename,Surname,Postcode,Age,GP\nAnn,Smith,AB1 2CD,40,Dr Who\nBob,Jones,,abc,\n,,,,\nann,SMITH,ab12cd,51,\n"
+        path = self.tmp_csv(rows)
+        err = io.StringIO()
+        call_command("import_records", "healthchecks", path, user="staff", batch_size=2, stdout=io.StringIO(), stderr=err)
+
+        self.assertEqual(list(HealthCheck.objects.order_by("id").values_list("forename", "age")), [("Ann", 40), ("ann", 51)])
+        self.assertIn("line 3: age:", err.getvalue())
+        people = set(HealthCheck.objects.values_list("person", flat=True))
+        self.assertEqual(len(people), 1)  # same person once normalised
+        self.assertNotIn(None, people)
+        self.assertEqual(DailyCounter.objects.get(metric="healthchecks", owner_id=self.user.id).count, 2)
+
+    def tmp_csv(self, text):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8") as f:
+            f.write(text)
+        self.addCleanup(os.unlink, f.name)
+        return f.name
+
+    def test_upload_scores_like_the_single_record_form(self):
+        data = {
+            "forename": "Ann", "surname": "Smith", "gender": "M", "ethnicity": "OTHER",
+            "date_of_birth": "1955-03-01", "waist_cm": "104", "height_cm": "165", "weight_kg": "88",
+            "family_history": "YES", "high_bp": "YES",
+        }
+        self.client.force_login(User.objects.create_user("manager", password="x", role="MANAGER"))
+        self.client.post(reverse("diabetes_risk_create"), data)
+
+        body = ",".join(data) + "\n" + ",".join(data.values()) + "\n"
+        upload = SimpleUploadedFile("events.csv", body.encode("utf-8-sig"), content_type="text/csv")
+        res = self.client.post(reverse("records_import"), {"kind": "diabetes", "file": upload})
+        self.assertEqual(res.context["result"].created, 1)
+
+        fields = ["bmi", "total_score", "age_score", "waist_score", "rules_version", "person"]
+        single, imported = DiabetesRiskAssessment.objects.order_by("id").values_list(*fields)
+        self.assertEqual(single, imported)
+
+    def test_unreadable_file_reports_rows_saved_before_it(self):
+        # more than one 8 KB decode block of good rows before the bad byte
+        body = "Forename,Surname\n" + "".join(f"P{i:04},Smith\n" for i in range(1500)) + "Bad,\xff\n"
+        self.client.force_login(User.objects.create_user("manager", password="x", role="MANAGER"))
+        upload = SimpleUploadedFile("checks.csv", body.encode("latin-1"), content_type="text/csv")
+
+        res = self.client.post(reverse("records_import"), {"kind": "healthchecks", "file": upload})
+        result = res.context["result"]
+        self.assertEqual(result.stop_reason, "not valid UTF-8")
+        self.assertGreater(result.created, 0)
+        self.assertEqual(result.stopped_at, result.created + 2)  # header + rows read
+        self.assertEqual(HealthCheck.objects.count(), result.created)
+        self.assertContains(res, "could not be read from line")
+
+    def test_upload_needs_add_records_permission(self):
+        self.client.force_login(self.user)  # staff
+        self.assertEqual(self.client.get(reverse("records_import")).status_code, 404)
+        self.assertNotContains(self.client.get(reverse("tables_page")), reverse("records_import"))
+
+        self.client.force_login(User.objects.create_user("manager", password="x", role="MANAGER"))
+        self.assertEqual(self.client.get(reverse("records_import")).status_code, 200)
+        self.assertContains(self.client.get(reverse("tables_page")), reverse("records_import"))
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        profiling.reset()
+        self.addCleanup(profiling.reset)
+        self.admin = User.objects.create_user("admin", password="x", role="ADMIN")
+
+    def test_off_by_default(self):
+        self.client.force_login(self.admin)
+        res = self.client.get(reverse("dashboard"))
+        self.assertNotIn("Server-Timing", res)
+        self.assertEqual(profiling.report(), [])
+
+    @override_settings(CRM_PROFILING=True)
+    def test_collects_per_view_numbers_and_repeated_queries(self):
+        self.client.force_login(self.admin)
+        for _ in range(2):
+            res = self.client.get(reverse("dashboard"))
+        self.assertIn("db;dur=", res["Server-Timing"])
+
+        row = next(r for r in profiling.report() if r["view"] == "dashboard")
+        self.assertEqual(row["requests"], 2)
+        self.assertGreater(row["avg_queries"], 0)
+        self.assertGreater(row["avg_template_ms"], 0)
+
+        data = self.client.get(reverse("profiling_report"), {"format": "json"}).json()
+        self.assertTrue(data["enabled"])
+        self.assertIn("dashboard", [r["view"] for r in data["views"]])
+
+    @override_settings(CRM_PROFILING=True, CRM_PROFILING_MEMORY=True)
+    def test_peak_memory_only_from_requests_that_ran_alone(self):
+        if not tracemalloc.is_tracing():
+            self.addCleanup(tracemalloc.stop)
+        self.client.force_login(self.admin)
+        other = profiling._enter()          # another request in flight
+        self.client.get(reverse("dashboard"))
+        profiling._leave(other)
+        row = next(r for r in profiling.report() if r["view"] == "dashboard")
+        self.assertIsNone(row["peak_memory_kb"])
+
+        self.client.get(reverse("dashboard"))
+        row = next(r for r in profiling.report() if r["view"] == "dashboard")
+        self.assertEqual((row["requests"], row["memory_requests"]), (2, 1))
+        self.assertGreater(row["peak_memory_kb"], 0)
+
+    def test_fingerprint_collapses_in_lists(self):
+        self.assertEqual(
+            profiling.fingerprint('SELECT 1 FROM t WHERE id IN (%s, %s,%s)'),
+            profiling.fingerprint('SELECT 1  FROM t WHERE id IN (%s, %s)'),
+        )
+
+    def test_report_is_staff_only(self):
+        self.client.force_login(User.objects.create_user("staff", password="x", role="STAFF"))
+        self.assertEqual(self.client.get(reverse("profiling_report")).status_code, 404)
+
+
+class BenchmarkTests(TestCase):
+    def test_synthetic_data_then_benchmark_and_compare(self):
+        call_command("generate_synthetic_data", healthchecks=120, assessments=40, submissions=30,
+                     batch_size=50, stdout=io.StringIO())
+
+        self.assertEqual(HealthCheck.objects.count(), 120)
+        self.assertFalse(HealthCheck.objects.filter(person=None).exists())
+        self.assertLess(Person.objects.count(), 160)  # repeat visits
+        self.assertEqual(DailyCounter.objects.filter(metric="healthchecks", owner_id=0).aggregate(n=Sum("count"))["n"], 120)
+        self.assertEqual(FormSubmission.objects.count(), 30)
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "bench.json")
+        options = {"iterations": 2, "warmup": 0, "only": ["dashboard", "form_results"], "stdout": io.StringIO()}
+        call_command("run_benchmarks", output=path, **options)
+        with open(path) as f:
+            report = json.load(f)
+        self.assertEqual(report["meta"]["rows"]["healthchecks"], 120)
+        self.assertEqual(set(report["results"]), {"dashboard", "form_results"})
+        self.assertGreater(report["results"]["form_results"]["queries"], 0)
+
+        out = io.StringIO()
+        call_command("run_benchmarks", compare=path, **dict(options, stdout=out))
+        self.assertIn("p50 before", out.getvalue())
+
+
+@skipUnless(settings.SQLITE_TUNING, "CRM_SQLITE_TUNING=0")
+class SqliteProfileTests(TestCase):
+    def test_connections_get_the_sqlite_profile(self):
+        self.assertEqual(connection.settings_dict["CONN_MAX_AGE"], 600)
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+        with connection.cursor() as c:
+            c.execute("PRAGMA busy_timeout")
+            self.assertEqual(c.fetchone()[0], 5000)
+            c.execute("PRAGMA synchronous")
+            self.assertEqual(c.fetchone()[0], 1)  # NORMAL
+
+
+class QueryPlanTests(TestCase):
+    """The hot Tables / graphs / results queries are index searches, never full table scans."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user("staff", password="x", role="STAFF")
+        self.admin = User.objects.create_user("admin", password="x", role="ADMIN")
+        self.form_def = FormDefinition.objects.create(name="Survey")
+
+    def request(self, user, **params):
+        request = RequestFactory().get("/", params)
+        request.user = user
+        return request
+
+    TABLES_CHECKED = (HealthCheck._meta.db_table, FormSubmission._meta.db_table)
+
+    def assertNoFullScan(self, qs):
+        """
+        No SCAN of a big table, except an ordered walk (rowid or index, no
+        temp B-tree sort) that a LIMIT cuts short.
+        """
+        self.assertNoFullScanSql(*qs.query.sql_with_params())
+
+    def assertNoFullScanSql(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = "\n".join(row[-1] for row in cursor.fetchall())
+        limited = " LIMIT " in sql and "USE TEMP B-TREE" not in plan
+        for table in self.TABLES_CHECKED:
+            if re.search(rf"(?m)^SCAN {table}\b", plan) and not limited:
+                self.fail(f"full scan of {table}:\n{plan}\n{sql}")
+
+    def assertPageTwoSeeks(self, qs, sort, cursor_value, descending=True):
+        """keyset_page() past a cursor runs only index SEARCHes, never walks to the cursor."""
+        field = qs.model._meta.get_field(sort)
+        with CaptureQueriesContext(connection) as ctx:
+            keyset_page(qs, field.attname, descending, encode_cursor(cursor_value, 1000), field=field)
+        self.assertTrue(ctx.captured_queries)
+        for query in ctx.captured_queries:
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plan = "\n".join(row[-1] for row in cursor.fetchall())
+            self.assertRegex(plan, rf"SEARCH {qs.model._meta.db_table} USING (COVERING )?INDEX", msg=plan)
+            self.assertNotRegex(plan, r"(?m)^SCAN ", msg=plan)
+
+    def test_health_check_tables_queries(self):
+        cfg = TABLES["healthchecks"]
+        newest = ordering_for("id", True)
+        self.assertNoFullScan(filtered_queryset(self.request(self.staff), cfg).order_by(*newest)[:201])
+        self.assertNoFullScan(filtered_queryset(self.request(self.staff, date="30d"), cfg).order_by(*newest)[:201])
+        for sort in ("check_date", "created_at", "surname", "forename", "postcode"):
+            qs = filtered_queryset(self.request(self.admin), cfg).order_by(*ordering_for(sort, True))[:201]
+            self.assertNoFullScan(qs)
+
+    def test_health_check_tables_page_two_seeks(self):
+        qs = filtered_queryset(self.request(self.admin), TABLES["healthchecks"])
+        cursors = {
+            "check_date": date(2024, 5, 1),
+            "created_at": timezone.now(),
+            "surname": "Smith",
+            "forename": "Ann",
+            "postcode": "AB1 2CD",
+        }
+        for sort, value in cursors.items():
+            for descending in (True, False):
+                with self.subTest(sort=sort, descending=descending):
+                    self.assertPageTwoSeeks(qs, sort, value, descending)
+                    if HealthCheck._meta.get_field(sort).null:
+                        self.assertPageTwoSeeks(qs, sort, None, descending)  # inside the NULL block
+
+    def test_person_progression_query(self):
+        self.assertNoFullScan(HealthCheck.objects.filter(person_id=1).order_by("created_at", "id"))
+
+    def test_form_results_queries(self):
+        newest = ordering_for("id", True)
+        for user, params in [(self.admin, {}), (self.staff, {}), (self.staff, {"date": "30d"})]:
+            subs = filtered_submissions(self.request(user, **params), self.form_def, [])
+            self.assertNoFullScan(subs.order_by(*newest)[:201])
+
+
+class ColumnProjectionTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user("staff", password="x", role="STAFF")
+        self.other = User.objects.create_user("other", password="x", role="STAFF")
+        self.mine = make_check(self.staff, surname="Mine", bmi=Decimal("24.5"))
+        make_check(self.other, surname="Theirs")
+        self.client.force_login(self.staff)
+
+    def test_chosen_columns_are_saved_and_fetched_alone(self):
+        self.client.post(reverse("table_columns", args=["healthchecks"]), {"columns": ["bmi", "surname", "nope"]})
+        cfg = TABLES["healthchecks"]
+        # Stored in model field order, unknown names dropped
+        self.assertEqual([f.name for f in visible_columns(self.staff, cfg)], ["surname", "bmi"])
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("tables_page"), {"table": "healthchecks"})
+        page_sql = next(q["sql"] for q in ctx.captured_queries if 'FROM "crm_healthcheck"' in q["sql"])
+        self.assertNotIn('"postcode"', page_sql.split(" FROM ")[0])
+
+        self.assertEqual(response.context["column_keys"], ["surname", "bmi"])
+        self.assertEqual(response.context["rows"], [{"id": self.mine.id, "cells": ["Mine", Decimal("24.5")], "can_manage": True}])
+        self.assertContains(response, "<td>Mine</td>", html=True)
+
+    def test_choosing_every_column_resets_to_default(self):
+        cfg = TABLES["healthchecks"]
+        url = reverse("table_columns", args=["healthchecks"])
+        self.client.post(url, {"columns": ["surname"]})
+        self.client.post(url, {"columns": []})
+        self.assertEqual(visible_columns(self.staff, cfg), table_columns(cfg))
+        self.assertFalse(TableColumnPreference.objects.exists())
+
+    def test_update_needs_post_and_table_access(self):
+        url = reverse("table_columns", args=["healthchecks"])
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+        volunteer = User.objects.create_user("volunteer", password="x", role="VOLUNTEER")
+        self.client.force_login(volunteer)
+        self.assertEqual(self.client.post(url, {"columns": ["surname"]}).status_code, 404)
+        self.assertFalse(TableColumnPreference.objects.exists())
+
+    def test_foreign_keys_render_as_text(self):
+        self.client.post(reverse("table_columns", args=["healthchecks"]), {"columns": ["created_by"]})
+        response = self.client.get(reverse("tables_page"), {"table": "healthchecks"})
+        self.assertEqual(response.context["rows"][0]["cells"], [str(self.staff)])
+
+
+class GraphsResultCacheTests(TestCase):
+    def setUp(self):
+        result_cache.reset()
+        self.addCleanup(result_cache.reset)
+        self.staff = User.objects.create_user("staff", password="x", role="STAFF")
+        self.admin = User.objects.create_user("admin", password="x", role="ADMIN")
+        make_check(self.staff, systolic=120, bmi=Decimal("25"))
+        make_check(self.admin, systolic=140, bmi=Decimal("30"))
+
+    def fetch(self, user):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(
+                reverse("graphs_data"), {"mode": "correlation", "x": "systolic", "y": "bmi"},
+            ).json()
+        touched = any(HealthCheck._meta.db_table in q["sql"] for q in ctx.captured_queries)
+        return data, touched
+
+    def test_repeat_is_served_from_cache_until_data_changes(self):
+        first, touched = self.fetch(self.admin)
+        self.assertTrue(touched)
+        again, touched = self.fetch(self.admin)
+        self.assertEqual(again, first)
+        self.assertFalse(touched)
+
+        make_check(self.staff, systolic=160, bmi=Decimal("35"))
+        changed, touched = self.fetch(self.admin)
+        self.assertTrue(touched)
+        self.assertEqual(changed["total"], 3)
+
+    def test_scopes_are_not_shared(self):
+        self.assertEqual(self.fetch(self.admin)[0]["total"], 2)
+        self.assertEqual(self.fetch(self.staff)[0]["total"], 1)
+
+    def test_versions_only_grow(self):
+        before = versions(HealthCheck)["crm.healthcheck"]
+        bump(HealthCheck)
+        self.assertGreater(versions(HealthCheck)["crm.healthcheck"], before)
+
+    def test_lru_keeps_within_byte_budget(self):
+        cache = result_cache.LRUBytesCache(max_bytes=10)
+        cache.set("a", b"1234")
+        cache.set("b", b"1234")
+        cache.get("a")              # b is now least recently used
+        cache.set("c", b"1234")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c"), cache.size), (b"1234", b"1234", 8))
+        cache.set("big", b"x" * 11)
+        self.assertIsNone(cache.get("big"))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        result_cache.reset()
+        self.addCleanup(result_cache.reset)
+        self.staff = User.objects.create_user("staff", password="x", role="STAFF")
+        self.client.force_login(self.staff)
+        make_check(self.staff)
+        self.form_def = FormDefinition.objects.create(name="Survey")
+
+    def get(self, url, params, etag=None):
+        headers = {"HX-Request": "true"}
+        if etag:
+            headers["If-None-Match"] = etag
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params, headers=headers)
+        return response, ctx.captured_queries
+
+    def assertRevalidates(self, url, params, change):
+        self.client.get(reverse("tables_page"))  # full page first: sets the CSRF cookie
+        first, _ = self.get(url, params)
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+
+        again, queries = self.get(url, params, etag)
+        self.assertEqual(again.status_code, 304)
+        self.assertFalse([q for q in queries if 'FROM "crm_healthcheck"' in q["sql"]])
+
+        change()
+        after, _ = self.get(url, params, etag)
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after["ETag"], etag)
+
+    def test_table_fragment(self):
+        self.assertRevalidates(
+            reverse("tables_page"), {"table": "healthchecks"}, lambda: make_check(self.staff, surname="New"),
+        )
+
+    def test_form_table_fragment(self):
+        self.assertRevalidates(
+            reverse("tables_page"), {"table": f"form:{self.form_def.id}"},
+            lambda: FormSubmission.objects.create(form=self.form_def, submitted_by=self.staff, answers={}),
+        )
+
+    def test_graphs_data(self):
+        self.assertRevalidates(
+            reverse("graphs_data"), {"mode": "bmi_improvement"}, lambda: make_check(self.staff, surname="New"),
+        )
+
+    def test_full_page_is_always_rendered(self):
+        response = self.client.get(reverse("tables_page"), {"table": "healthchecks"})
+        self.assertFalse(response.has_header("ETag"))
+        self.assertIn("HX-Request", response["Vary"])
+
+
+class GraphsSummaryTests(TestCase):
+    def setUp(self):
+        result_cache.reset()
+        self.addCleanup(result_cache.reset)
+        self.user = User.objects.create_user("admin", password="x", role="ADMIN")
+        self.client.force_login(self.user)
+
+    def test_matrix_and_stats_from_one_fetch(self):
+        rows = [(120, 80, 25), (130, 85, 27), (140, 95, 26), (150, 90, None), (None, 70, 30)]
+        for systolic, diastolic, bmi in rows:
+            make_check(self.user, systolic=systolic, diastolic=diastolic, bmi=bmi, risk="high")
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(reverse("graphs_summary")).json()
+        self.assertEqual(len([q for q in ctx.captured_queries if 'FROM "crm_healthcheck"' in q["sql"]]), 1)
+
+        i = {key: n for n, key in enumerate(data["fields"])}
+        pearson, spearman, stats = data["pearson"], data["spearman"], data["summary"]
+        both = [r for r in rows if r[0] is not None]
+        expected = np.corrcoef([r[0] for r in both], [r[1] for r in both])[0, 1]
+        self.assertAlmostEqual(pearson[i["systolic"]][i["diastolic"]], expected)
+        self.assertAlmostEqual(spearman[i["systolic"]][i["diastolic"]], 0.8)
+        self.assertEqual(pearson[i["bmi"]][i["systolic"]], pearson[i["systolic"]][i["bmi"]])
+        self.assertIsNone(pearson[i["risk"]][i["bmi"]])    # free text: no numbers at all
+
+        self.assertEqual(stats["nulls"][i["systolic"]], 1)
+        self.assertEqual(stats["nulls"][i["risk"]], 5)
+        self.assertAlmostEqual(stats["mean"][i["systolic"]], 135)
+        self.assertAlmostEqual(stats["percentiles"]["50"][i["diastolic"]], 85)
+        self.assertAlmostEqual(stats["std"][i["bmi"]], np.std([25, 27, 26, 30], ddof=1))
+
+
+class HistogramTests(TestCase):
+    def setUp(self):
+        result_cache.reset()
+        self.addCleanup(result_cache.reset)
+        self.staff = User.objects.create_user("staff", password="x", role="STAFF")
+        self.client.force_login(self.staff)
+
+    def fetch(self, **params):
+        return self.client.get(reverse("graphs_data"), {"mode": "histogram", **params}).json()
+
+    def test_grouped_counts_share_edges(self):
+        for gender, bmi in [("F", "20"), ("F", "22"), ("M", "30"), ("M", None), ("", "25")]:
+            make_check(self.staff, gender=gender, bmi=bmi and Decimal(bmi))
+        make_check(User.objects.create_user("other", password="x", role="STAFF"), bmi=Decimal("40"))
+
+        data = self.fetch(field="bmi", group="gender", bins=5)
+        self.assertEqual(data["edges"], [20.0, 22.0, 24.0, 26.0, 28.0, 30.0])
+        self.assertEqual((data["total"], data["nulls"]), (4, 1))     # other staff's check not visible
+        by_label = {s["label"]: s for s in data["series"]}
+        self.assertEqual(by_label["F"]["counts"], [1, 1, 0, 0, 0])
+        self.assertEqual(by_label["M"]["counts"], [0, 0, 0, 0, 1])
+        self.assertEqual(by_label["Unknown"]["counts"], [0, 0, 1, 0, 0])
+        self.assertEqual(by_label["F"]["quantiles"]["50"], 21.0)
+
+    def test_integer_scores_get_one_bin_per_value(self):
+        for score in (3, 4, 4, 7):
+            DiabetesRiskAssessment.objects.create(
+                forename="Ann", surname="Smith", gender="F", ethnicity="WHITE",
+                date_of_birth=date(1970, 1, 1), waist_cm=90, height_cm=170, weight_kg=70, bmi=24.2,
+                family_history="NO", high_bp="NO", age_score=0, gender_score=0, ethnicity_score=0,
+                family_history_score=0, waist_score=0, bmi_score=0, bp_score=0, total_score=score,
+                submitted_by=self.staff,
+            )
+        data = self.fetch(field="diabetes_score")
+        self.assertEqual(data["edges"], [2.5, 3.5, 4.5, 5.5, 6.5, 7.5])
+        [series] = data["series"]
+        self.assertEqual((series["label"], series["n"], series["counts"], series["mean"]), ("All", 4, [1, 2, 0, 0, 1], 4.5))
+        self.assertEqual((series["quantiles"]["25"], series["quantiles"]["50"]), (3.75, 4.0))
+
+    def test_assessments_are_visible_to_staff_and_managers_alike(self):
+        other = User.objects.create_user("other", password="x", role="STAFF")
+        for owner, score in ((self.staff, 3), (other, 9)):
+            DiabetesRiskAssessment.objects.create(
+                forename="Ann", surname="Smith", gender="F", ethnicity="WHITE",
+                date_of_birth=date(1970, 1, 1), waist_cm=90, height_cm=170, weight_kg=70, bmi=24.2,
+                family_history="NO", high_bp="NO", age_score=0, gender_score=0, ethnicity_score=0,
+                family_history_score=0, waist_score=0, bmi_score=0, bp_score=0, total_score=score,
+                submitted_by=owner,
+            )
+        manager = User.objects.create_user("manager", password="x", role="MANAGER")
+
+        for user in (self.staff, manager):
+            self.client.force_login(user)
+            for group in ("", "gender"):
+                data = self.fetch(field="diabetes_score", group=group)
+                self.assertEqual(data["total"], 2, (user.role, group))
+
+    def test_rejects_unknown_field_and_group(self):
+        self.assertEqual(self.client.get(reverse("graphs_data"), {"mode": "histogram", "field": "risk"}).status_code, 400)
+        self.assertEqual(
+            self.client.get(reverse("graphs_data"), {"mode": "distribution", "field": "bmi", "group": "postcode"}).status_code,
+            400,
+        )
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.enterContext(override_settings(CRM_SNAPSHOT_DIR=tmp.name))
+        result_cache.reset()
+        self.addCleanup(result_cache.reset)
+
+        self.staff = User.objects.create_user("staff", password="x", role="STAFF")
+        self.admin = User.objects.create_user("admin", password="x", role="ADMIN")
+        self.checks = [
+            make_check(self.staff, systolic=120, bmi=Decimal("25.5")),
+            make_check(self.admin, systolic=140, bmi=None, risk="7.5"),
+        ]
+        self.spec = snapshot.SNAPSHOTS["crm.healthcheck"]
+
+    def matrix(self, user):
+        return snapshot.snapshot_matrix(HealthCheck, ["systolic", "bmi", "risk"], PermissionContext.for_user(user))
+
+    def test_reads_mapped_rows_without_touching_the_table(self):
+        self.assertIsNone(self.matrix(self.admin))      # nothing built yet
+        self.assertEqual(snapshot.refresh(self.spec)["action"], "rebuilt")
+
+        np.testing.assert_array_equal(self.matrix(self.admin), [[120, 25.5, np.nan], [140, np.nan, 7.5]])
+        np.testing.assert_array_equal(self.matrix(self.staff), [[120, 25.5, np.nan]])
+
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(reverse("graphs_summary")).json()
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "crm_healthcheck"' in q["sql"]])
+        self.assertEqual(data["summary"]["count"][data["fields"].index("systolic")], 2)
+
+    def test_inserts_are_appended_and_rewrites_rebuild(self):
+        snapshot.refresh(self.spec)
+        make_check(self.staff, systolic=160)
+        # not refreshed yet: the new row comes from the database
+        self.assertEqual(self.matrix(self.admin)[:, 0].tolist(), [120, 140, 160])
+        self.assertEqual(snapshot.refresh(self.spec), {"action": "appended", "rows": 3, "added": 1})
+        self.assertEqual(snapshot.refresh(self.spec)["action"], "up to date")
+
+        self.checks[0].systolic = 100
+        self.checks[0].save()
+        self.assertIsNone(self.matrix(self.admin))      # edited rows: never serve the old values
+        self.assertEqual(snapshot.refresh(self.spec)["action"], "rebuilt")
+        self.assertEqual(self.matrix(self.admin)[:, 0].tolist(), [100, 140, 160])
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command("refresh_snapshot", stdout=out)
+        self.assertIn("crm.healthcheck: rebuilt, 2 rows", out.getvalue())
+        self.assertIn("crm.diabetesriskassessment: rebuilt, 0 rows", out.getvalue())
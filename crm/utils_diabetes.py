@@ -1,60 +1,22 @@
 from datetime import date
 
+import numpy as np
+
 def calculate_bmi(height_cm: int, weight_kg: float) -> float:
     h_m = height_cm / 100
     return round(weight_kg / (h_m ** 2), 1)
 
 
-def waist_score(waist_cm: float) -> str:
-    if waist_cm < 90:
-        return 0
-    if waist_cm < 99.9:
-        return 4
-    if waist_cm < 109.9:
-        return 6
-    else:
-        return 9
-
-
-def bmi_score(bmi: float) -> int:
-    if bmi < 25:
-        return 0
-    if bmi < 29.9:
-        return 3
-    if bmi < 34.9:
-        return 5
-    else:
-        return 8
-
-
-
-
-def risk_level_from_total(total: int) -> str:
-    if total <= 6:
-        return "Low"
-    if total <= 15:
-        return "Increased"
-    if total <= 24:
-        return "Moderate"
-    return "High"
-
-
-
-def age_from_dob(dob: date) -> int:
-    today = date.today()
+def age_from_dob(dob: date, on: date | None = None) -> int:
+    today = on or date.today()
     return today.year - dob.year - (
         (today.month, today.day) < (dob.month, dob.day)
     )
 
 
 
-def age_score(age: int) -> int:
-    if age <= 49:
-        return 0
-    elif age <= 59:
-        return 5
-    elif age <= 69:
-        return 9
-    else:
-        return 13
-
+def ages_on(dobs, on_dates) -> np.ndarray:
+    """Whole years between each date of birth and the matching `on` date."""
+    dob = np.array([(d.year, d.month * 100 + d.day) for d in dobs], dtype=np.int64).reshape(-1, 2)
+    on = np.array([(d.year, d.month * 100 + d.day) for d in on_dates], dtype=np.int64).reshape(-1, 2)
+    return on[:, 0] - dob[:, 0] - (on[:, 1] < dob[:, 1])
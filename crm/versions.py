@@ -0,0 +1,60 @@
+"""
+Data versions: a stamp per table that changes whenever its rows change.
+
+Cached results (crm.result_cache) and validators put the current stamps
+in their keys, so a write makes every older entry unreachable instead of
+having to find and delete it. Signals (crm.signals) bump the stamps on
+save/delete; bulk_create()/bulk_update() paths call bump() themselves.
+
+A stamp is max(old + 1, now in ns): it only grows, and never comes back
+after a rolled-back transaction or a restored backup.
+
+Each model also has a second stamp, rewrite_key(model), that moves only
+when existing rows are updated or deleted. While it holds still, every
+change since then was an insert, which is all an append-only copy of the
+table (crm.snapshot) needs to know.
+"""
+import time
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .models import DataVersion
+
+
+def version_key(model_or_key) -> str:
+    if isinstance(model_or_key, str):
+        return model_or_key
+    return model_or_key._meta.label_lower
+
+
+def rewrite_key(model) -> str:
+    return f"{version_key(model)}:rewrite"
+
+
+def bump(*models_or_keys):
+    """Give each model (or explicit key, e.g. "forms_builder.formsubmission:3") a new stamp."""
+    for key in sorted({version_key(m) for m in models_or_keys}):
+        stamp = time.time_ns()
+        rows = DataVersion.objects.filter(key=key)
+        if rows.update(version=Greatest(F("version") + 1, Value(stamp))):
+            continue
+        try:
+            with transaction.atomic():
+                DataVersion.objects.create(key=key, version=stamp)
+        except IntegrityError:
+            # created by a concurrent request between our UPDATE and INSERT
+            rows.update(version=Greatest(F("version") + 1, Value(stamp)))
+
+
+def versions(*models_or_keys) -> dict[str, int]:
+    """{key: stamp} in one query; never-written tables are 0."""
+    keys = [version_key(m) for m in models_or_keys]
+    found = dict(DataVersion.objects.filter(key__in=keys).values_list("key", "version"))
+    return {key: found.get(key, 0) for key in keys}
+
+
+def version_tag(*models_or_keys) -> str:
+    """The stamps as one short string, for cache keys and ETags."""
+    return ".".join(f"{v:x}" for v in versions(*models_or_keys).values())
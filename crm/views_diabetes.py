@@ -5,7 +5,23 @@ from forms_builder.models import FormDefinition, FormField
 from .forms import DiabetesRiskForm
 from .models import DiabetesRiskAssessment
 
-from .utils_diabetes import calculate_bmi, bmi_score, waist_score, age_score
+from .scoring import apply_scores, risk_level_from_total
+
+
+def save_assessment(form, user) -> DiabetesRiskAssessment:
+    """Score a valid DiabetesRiskForm with the active rule set and save it."""
+    obj = apply_scores(form.to_assessment(user))
+    obj.save()
+    return obj
+
+
+def render_result(request, obj):
+    return render(request, "crm/diabetes_result.html", {
+        "total": obj.total_score,
+        "bmi": obj.bmi,
+        "waist_score": obj.waist_score,
+        "risk_level": risk_level_from_total(obj.total_score),
+    })
 
 
 @login_required
@@ -23,52 +39,8 @@ def diabetes_risk_form(request, pk: int):
     form.order_fields([k for k in ordered_keys if k in form.fields])
 
     if request.method == "POST" and form.is_valid():
-        cd = form.cleaned_data
-
-        # --- Calculations ---
-        bmi = calculate_bmi(cd["height"], cd["weight"])
-        age_pts = age_score(cd["age"])
-        gender_pts = {"F": 0, "M": 1}[cd["gender"]]
-        eth_pts = {"WHITE": 0, "OTHER": 6}[cd["ethnicity"]]
-        fam_pts = {"YES": 5, "NO": 0}[cd["family"]]
-
-        waist_pts = waist_score(cd["waist"])
-        bmi_pts = bmi_score(bmi)
-
-        # If you add BP later, set bp_pts properly
-        bp_pts = 0
-
-        total = age_pts + gender_pts + eth_pts + fam_pts + waist_pts + bmi_pts + bp_pts
-
-        # --- Save (NO risk_level) ---
-        DiabetesRiskAssessment.objects.create(
-            submitted_by=request.user,
-
-            age_score=age_pts,
-            gender_score=gender_pts,
-            ethnicity_score=eth_pts,
-            family_history_score=fam_pts,
-            waist_score=waist_pts,
-            bmi_score=bmi_pts,
-            bp_score=bp_pts,
-            total_score=total,
-
-            # If your model has raw values, store them too:
-            # age=cd["age"],
-            # gender=cd["gender"],
-            # ethnicity=cd["ethnicity"],
-            # waist_cm=cd["waist"],
-            # height_cm=cd["height"],
-            # weight_kg=cd["weight"],
-            # bmi=bmi,
-            # family_history=cd["family"],
-        )
-
-        return render(request, "crm/diabetes_result.html", {
-            "total": total,
-            "bmi": bmi,
-            "waist_score": waist_pts,
-        })
+        obj = save_assessment(form, request.user)
+        return render_result(request, obj)
 
     return render(request, "crm/diabetes_form.html", {
         "form": form,
@@ -1,13 +1,26 @@
 from datetime import date
+from itertools import groupby
+from operator import itemgetter
 from typing import Any, Dict, List, Optional
 
+import numpy as np
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, Http404
+from django.http import HttpResponse, JsonResponse, Http404
 from django.shortcuts import render
-from django.db.models import Count
-
-from accounts.utils import can_view_all, can_access_tables
-from crm.models import HealthCheck
+from django.db.models import Exists, OuterRef, Q
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from accounts.permissions import permissions
+from crm.analytics import (
+    column_summary, histogram, nan_to_none, numeric_matrix, numeric_with_groups, pearson_matrix, spearman_matrix,
+)
+from crm.models import DiabetesRiskAssessment, HealthCheck, Person
+from crm.people import identity_key, normalise_name, normalise_postcode
+from crm.pagination import keyset_page
+from crm.snapshot import snapshot_matrix
+from crm.result_cache import digest, result_cache
+from crm.versions import version_tag
 
 
 NUMERIC_FIELDS = [
@@ -19,6 +32,42 @@ NUMERIC_FIELDS = [
     ("risk", "Risk"),
 ]
 
+# Correlation downsampling (?sample=auto|none|reservoir|grid)
+SAMPLE_MODES = {"auto", "none", "reservoir", "grid"}
+SAMPLE_BUDGET = 5000        # max points returned by reservoir/auto
+MAX_SAMPLE_BUDGET = 50000
+GRID_BINS = 50              # grid is GRID_BINS x GRID_BINS cells
+MAX_GRID_BINS = 200
+
+# Distribution mode (?mode=histogram&field=<key>&group=<key>&bins=N)
+DISTRIBUTION_FIELDS = {
+    # key: (model, field, label)
+    "systolic": (HealthCheck, "systolic", "Systolic"),
+    "diastolic": (HealthCheck, "diastolic", "Diastolic"),
+    "pulse": (HealthCheck, "pulse", "Pulse"),
+    "bmi": (HealthCheck, "bmi", "BMI"),
+    "age": (HealthCheck, "age", "Age"),
+    "diabetes_score": (DiabetesRiskAssessment, "total_score", "Diabetes risk score"),
+    "diabetes_bmi": (DiabetesRiskAssessment, "bmi", "BMI (diabetes assessments)"),
+}
+DISTRIBUTION_GROUPS = [
+    ("", "No grouping"),
+    ("gender", "Gender"),
+    ("ethnicity", "Ethnicity"),
+    ("gp", "GP"),
+]
+HISTOGRAM_BINS = 20
+MAX_HISTOGRAM_BINS = 200
+
+# Tables graphs_data reads; a write to any of them invalidates its cached results
+GRAPH_SOURCES = (HealthCheck, Person, DiabetesRiskAssessment)
+SUMMARY_SOURCES = (HealthCheck,)
+
+# Person picker type-ahead (graphs_people)
+PERSON_SEARCH_MIN_CHARS = 2
+PERSON_SEARCH_LIMIT = 20
+PERSON_SEARCH_MAX_LIMIT = 50
+
 PERSON_FIELDS = [
     ("forename", "Forename"),
     ("surname", "Surname"),
@@ -26,65 +75,296 @@ PERSON_FIELDS = [
 ]
 
 
-def _base_qs(user):
-    qs = HealthCheck.objects.all()
-
+def _base_qs(request):
     # Staff see only their records; Manager/Admin see all
-    if not can_view_all(user):
-        # if your model doesn't have created_by, remove this
-        if hasattr(HealthCheck, "created_by_id"):
-            qs = qs.filter(created_by=user)
+    return HealthCheck.objects.visible_to(permissions(request))
 
-    return qs
 
+def _int_param(request, name: str, default: int, lo: int, hi: int) -> int:
+    try:
+        value = int(request.GET.get(name, default))
+    except (TypeError, ValueError):
+        return default
+    return max(lo, min(hi, value))
 
-@login_required
-def graphs_page(request):
-    if not can_access_tables(request.user):
-        raise Http404()
 
-    qs = _base_qs(request.user)
+def _numeric_columns(request, model, fields, qs=None):
+    """
+    `fields` of every row the user may see, as an (n, len(fields)) float
+    array: from the memory-mapped snapshot (crm.snapshot) when it is
+    usable, else one values_list() fetch of `qs` (default: visible rows).
+    """
+    perms = permissions(request)
+    X = snapshot_matrix(model, fields, perms)
+    if X is None:
+        X = numeric_matrix(qs if qs is not None else model.objects.visible_to(perms), fields)
+    return X
+
 
-    # Build person list (simple: unique combinations)
-    # If you have a Patient model later, swap this out for patient ids.
-    people = (
-        qs.values("forename", "surname", "postcode")
-        .order_by("forename", "surname", "postcode")
-        .distinct()
+def _numeric_pairs(request, qs, x: str, y: str):
+    """
+    All (x, y) pairs where both values are numeric, as two float arrays.
+    NULLs are dropped in SQL (or the snapshot holds them as NaN) and
+    anything that still doesn't parse (e.g. free-text risk) is dropped here.
+    """
+    pairs = _numeric_columns(
+        request, HealthCheck, [x, y], qs.filter(**{f"{x}__isnull": False, f"{y}__isnull": False}),
+    )
+    pairs = pairs[np.isfinite(pairs).all(axis=1)]
+    return pairs[:, 0], pairs[:, 1]
+
+
+def _grid_bins(xs, ys, bins: int) -> list[dict]:
+    """
+    Bin points into a bins x bins grid; one point per non-empty cell at the
+    cell centre, with how many checks fell in it.
+    """
+    if len(xs) == 0:
+        return []
+
+    counts, x_edges, y_edges = np.histogram2d(xs, ys, bins=bins)
+    x_centres = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centres = (y_edges[:-1] + y_edges[1:]) / 2
+
+    ix, iy = np.nonzero(counts)
+    return [
+        {"x": cx, "y": cy, "count": int(c)}
+        for cx, cy, c in zip(x_centres[ix].tolist(), y_centres[iy].tolist(), counts[ix, iy].tolist())
+    ]
+
+
+def _person_checks(qs, person_key: str):
+    """
+    Checks for one person. `person_key` is a Person id; the old
+    "forename|||surname|||postcode" keys are still accepted.
+    Returns None if the key is malformed.
+    """
+    if person_key.isdigit():
+        return qs.filter(person_id=int(person_key))
+
+    parts = person_key.split("|||")
+    if len(parts) != 3:
+        return None
+
+    sn, fn, pc = identity_key(*parts)
+    person_id = (
+        Person.objects.filter(surname_norm=sn, forename_norm=fn, postcode_norm=pc)
+        .values_list("id", flat=True)
+        .first()
     )
+    return qs.filter(person_id=person_id) if person_id else qs.none()
 
-    people_choices = []
-    for p in people:
-        label = f"{p.get('forename','') or ''} {p.get('surname','') or ''} ({p.get('postcode','') or ''})".strip()
-        key = f"{p.get('forename','') or ''}|||{p.get('surname','') or ''}|||{p.get('postcode','') or ''}"
-        people_choices.append((key, label))
 
+def _bmi_deltas(qs, min_checks: int = 3):
+    """
+    BMI change (last - first, negative = improvement) for every person with
+    at least `min_checks` checks, and the number of checks left out because
+    they aren't linked to a person (`manage.py backfill_people` links them).
+
+    One ordered values_list() pass: rows arrive grouped by person and in
+    check order, so first/last/count fall out of a single scan with no
+    per-person queries and no model instances.
+    """
+    order = ["person__forename", "person__surname", "person__postcode", "person_id"]
+    order += ["created_at", "id"] if hasattr(HealthCheck, "created_at") else ["id"]
+
+    rows = (
+        qs.order_by(*order)
+        .values_list("person_id", "person__forename", "person__surname", "person__postcode", "bmi")
+        .iterator(chunk_size=2000)
+    )
+
+    deltas = []
+    unlinked = 0
+    for (person_id, fn, sn, pc), checks in groupby(rows, key=itemgetter(0, 1, 2, 3)):
+        if person_id is None:
+            unlinked += sum(1 for _ in checks)
+            continue
+        first = last = None
+        n = 0
+        for i, check in enumerate(checks):
+            if i == 0:
+                first = check[4]
+            last = check[4]
+            n += 1
+
+        if n < min_checks or first is None or last is None:
+            continue
+
+        try:
+            delta = float(last) - float(first)
+        except (TypeError, ValueError):
+            continue
+
+        deltas.append({
+            "person": f"{fn} {sn} ({pc})",
+            "delta": delta,
+            "count": n,
+        })
+    return deltas, unlinked
+
+
+@login_required
+def graphs_page(request):
+    if not permissions(request).access_tables:
+        raise Http404()
+
+    # The person picker is filled by graphs_people as the user types,
+    # so this page costs the same however many patients there are.
     return render(request, "crm/graphs.html", {
         "numeric_fields": NUMERIC_FIELDS,
-        "people_choices": people_choices,
+        "distribution_fields": [(key, label) for key, (_, _, label) in DISTRIBUTION_FIELDS.items()],
+        "distribution_groups": DISTRIBUTION_GROUPS,
+        "person_search_min_chars": PERSON_SEARCH_MIN_CHARS,
+    })
+
+
+def _prefix_range(column: str, prefix: str) -> dict:
+    # >= / < instead of LIKE so SQLite can use the index on `column`
+    return {f"{column}__gte": prefix, f"{column}__lt": prefix + "\U0010ffff"}
+
+
+@login_required
+def graphs_people(request):
+    """
+    Type-ahead lookup for the graphs person picker.
+      ?q=<text>&limit=N&cursor=<next_cursor from the previous page>
+    Every word of q must be a prefix of the forename, surname or postcode
+    (or q as a whole a prefix of the postcode). Only people with at least
+    one check visible to the user are returned, ordered by surname.
+    """
+    if not permissions(request).access_tables:
+        raise Http404()
+
+    q = " ".join((request.GET.get("q") or "").split())
+    if len(q) < PERSON_SEARCH_MIN_CHARS:
+        return JsonResponse({"ok": True, "results": [], "next_cursor": None})
+
+    limit = _int_param(request, "limit", PERSON_SEARCH_LIMIT, 1, PERSON_SEARCH_MAX_LIMIT)
+
+    words = Q()
+    for word in q.split(" "):
+        name = normalise_name(word)
+        words &= (
+            Q(**_prefix_range("surname_norm", name))
+            | Q(**_prefix_range("forename_norm", name))
+            | Q(**_prefix_range("postcode_norm", normalise_postcode(word)))
+        )
+    whole_postcode = Q(**_prefix_range("postcode_norm", normalise_postcode(q)))
+
+    visible = _base_qs(request).filter(person=OuterRef("pk"))
+    people = Person.objects.filter(words | whole_postcode).filter(Exists(visible))
+
+    page, next_cursor = keyset_page(
+        people, "surname_norm", False, request.GET.get("cursor"),
+        page_size=limit, field=Person._meta.get_field("surname_norm"),
+    )
+
+    return JsonResponse({
+        "ok": True,
+        "results": [{"id": p.id, "label": str(p)} for p in page],
+        "next_cursor": next_cursor,
     })
 
 
+def _versioned_etag(name: str, sources):
+    """
+    etag_func for condition(): request parameters + visibility scope + data
+    versions of `sources`. Also keys the cached response (_cached). Costs
+    one small query, once per request, before any chart query.
+    """
+    attr = f"_{name}_etag"
+
+    def etag(request):
+        perms = permissions(request)
+        if not perms.access_tables:
+            return None
+        if not hasattr(request, attr):
+            setattr(request, attr, digest(
+                name,
+                sorted(request.GET.lists()),
+                "all" if perms.view_all else perms.user_id,
+                version_tag(*sources),
+            ))
+        return getattr(request, attr)
+
+    return etag
+
+
+def _cached(request, name: str, etag_func, build):
+    """build(request) through crm.result_cache; only successful responses are stored."""
+    key = f"crm:{name}:{etag_func(request)}"
+    cache = result_cache()
+    body = cache.get(key)
+    if body is not None:
+        return HttpResponse(body, content_type="application/json")
+
+    response = build(request)
+    if response.status_code == 200:
+        cache.set(key, response.content)
+    return response
+
+
+_graphs_etag = _versioned_etag("graphs_data", GRAPH_SOURCES)
+_summary_etag = _versioned_etag("graphs_summary", SUMMARY_SOURCES)
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_graphs_etag)
 def graphs_data(request):
     """
     Returns JSON for chart rendering.
     mode:
-      - correlation: scatter X vs Y
+      - correlation: scatter X vs Y, downsampled to a point budget
+        (sample=auto|none|reservoir, budget=N) or grid-binned with counts
+        (sample=grid, bins=N)
       - progression: line chart for one person over time (metric vs date/index)
       - bmi_improvement: BMI change distribution for people with >=3 checks
+      - histogram (or distribution): bucketed counts and quantiles of one
+        field (DISTRIBUTION_FIELDS), optionally per gender/ethnicity/GP
+
+    Successful responses are cached (crm.result_cache) per parameters,
+    visibility scope and data version of the tables they read; a client
+    sending the same ETag back gets 304 Not Modified.
     """
-    if not can_access_tables(request.user):
+    if not permissions(request).access_tables:
         raise Http404()
+    return _cached(request, "graphs_data", _graphs_etag, _graphs_response)
 
-    mode = request.GET.get("mode", "correlation").strip()
-    qs = _base_qs(request.user)
 
-    def parse_person_key(k: str):
-        parts = (k or "").split("|||")
-        if len(parts) != 3:
-            return None
-        return parts[0], parts[1], parts[2]
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_summary_etag)
+def graphs_summary(request):
+    """
+    Overview of every NUMERIC_FIELDS column from one fetch: Pearson and
+    Spearman correlation matrices (pairwise-complete), plus count, nulls,
+    mean, std, min/max and percentiles per field. Cached and
+    ETag-validated per data version, like graphs_data.
+    """
+    if not permissions(request).access_tables:
+        raise Http404()
+    return _cached(request, "graphs_summary", _summary_etag, _summary_response)
+
+
+def _summary_response(request):
+    keys = [key for key, _ in NUMERIC_FIELDS]
+    X = _numeric_columns(request, HealthCheck, keys)
+    return JsonResponse({
+        "ok": True,
+        "fields": keys,
+        "labels": [label for _, label in NUMERIC_FIELDS],
+        "rows": len(X),
+        "pearson": nan_to_none(pearson_matrix(X)),
+        "spearman": nan_to_none(spearman_matrix(X)),
+        "summary": column_summary(X),
+    })
+
+
+def _graphs_response(request):
+    mode = request.GET.get("mode", "correlation").strip()
+    qs = _base_qs(request)
 
     if mode == "correlation":
         x = request.GET.get("x")
@@ -94,21 +374,34 @@ def graphs_data(request):
         if x not in allowed or y not in allowed:
             return JsonResponse({"ok": False, "error": "Invalid x/y"}, status=400)
 
-        # Pull points (ignore nulls)
-        rows = qs.values(x, y)
-        points = []
-        for r in rows:
-            xv, yv = r.get(x), r.get(y)
-            if xv is None or yv is None:
-                continue
-            try:
-                points.append({"x": float(xv), "y": float(yv)})
-            except (TypeError, ValueError):
-                continue
+        sample = request.GET.get("sample", "auto")
+        if sample not in SAMPLE_MODES:
+            return JsonResponse({"ok": False, "error": "Invalid sample"}, status=400)
+
+        budget = _int_param(request, "budget", SAMPLE_BUDGET, 1, MAX_SAMPLE_BUDGET)
+        bins = _int_param(request, "bins", GRID_BINS, 1, MAX_GRID_BINS)
+        seed = _int_param(request, "seed", 0, 0, 2**32 - 1)
+
+        xs, ys = _numeric_pairs(request, qs, x, y)
+        total = len(xs)
+
+        if sample == "auto":
+            sample = "reservoir" if total > budget else "none"
+
+        if sample == "grid":
+            points = _grid_bins(xs, ys, bins)
+        else:
+            if sample == "reservoir" and total > budget:
+                keep = np.random.default_rng(seed).choice(total, size=budget, replace=False)
+                keep.sort()  # keep database order
+                xs, ys = xs[keep], ys[keep]
+            points = [{"x": xv, "y": yv} for xv, yv in zip(xs.tolist(), ys.tolist())]
 
         return JsonResponse({
             "ok": True,
             "mode": "correlation",
+            "sample": sample,
+            "total": total,
             "series": [{"label": f"{y} vs {x}", "points": points}],
         })
 
@@ -120,12 +413,9 @@ def graphs_data(request):
         if metric not in allowed:
             return JsonResponse({"ok": False, "error": "Invalid metric"}, status=400)
 
-        parsed = parse_person_key(person_key or "")
-        if not parsed:
+        person_qs = _person_checks(qs, person_key or "")
+        if person_qs is None:
             return JsonResponse({"ok": False, "error": "Invalid person"}, status=400)
-        fn, sn, pc = parsed
-
-        person_qs = qs.filter(forename=fn, surname=sn, postcode=pc)
 
         # Prefer created_at if you have it; else fall back to id
         if hasattr(HealthCheck, "created_at"):
@@ -159,49 +449,48 @@ def graphs_data(request):
         })
 
     if mode == "bmi_improvement":
-        # People with >=3 checks
-        # We'll define person by (forename, surname, postcode).
-        # BMI improvement = last_bmi - first_bmi (negative = improvement if BMI drops).
-        people = (
-            qs.values("forename", "surname", "postcode")
-            .annotate(n=Count("id"))
-            .filter(n__gte=3)
-        )
-
-        deltas = []
-        for p in people:
-            fn, sn, pc = p["forename"], p["surname"], p["postcode"]
-            person_qs = qs.filter(forename=fn, surname=sn, postcode=pc)
-
-            if hasattr(HealthCheck, "created_at"):
-                person_qs = person_qs.order_by("created_at", "id")
-            else:
-                person_qs = person_qs.order_by("id")
-
-            checks = list(person_qs)
-            if len(checks) < 3:
-                continue
-
-            first = getattr(checks[0], "bmi", None)
-            last = getattr(checks[-1], "bmi", None)
-            if first is None or last is None:
-                continue
-
-            try:
-                delta = float(last) - float(first)
-            except (TypeError, ValueError):
-                continue
-
-            deltas.append({
-                "person": f"{fn} {sn} ({pc})",
-                "delta": delta,
-                "count": len(checks),
-            })
-
+        points, unlinked = _bmi_deltas(qs)
         return JsonResponse({
             "ok": True,
             "mode": "bmi_improvement",
-            "series": [{"label": "BMI change (last - first)", "points": deltas}],
+            "series": [{"label": "BMI change (last - first)", "points": points}],
+            "unlinked": unlinked,
         })
 
+    if mode in ("histogram", "distribution"):
+        return _histogram_response(request)
+
     return JsonResponse({"ok": False, "error": "Unknown mode"}, status=400)
+
+
+def _histogram_response(request):
+    """
+    One values_list() fetch of the field and group column (ungrouped: the
+    snapshot, if usable), then shared bin edges, per-group counts and
+    quantiles in NumPy (crm.analytics.histogram).
+    Returns arrays, not per-row points.
+    """
+    key = request.GET.get("field")
+    group = request.GET.get("group", "")
+    if key not in DISTRIBUTION_FIELDS:
+        return JsonResponse({"ok": False, "error": "Invalid field"}, status=400)
+    if group not in {g for g, _ in DISTRIBUTION_GROUPS}:
+        return JsonResponse({"ok": False, "error": "Invalid group"}, status=400)
+    bins = _int_param(request, "bins", HISTOGRAM_BINS, 1, MAX_HISTOGRAM_BINS)
+
+    model, field, label = DISTRIBUTION_FIELDS[key]
+    qs = model.objects.visible_to(permissions(request))
+    if group:
+        values, groups = numeric_with_groups(qs, field, group)
+    else:
+        values, groups = _numeric_columns(request, model, [field], qs)[:, 0], None
+
+    integer = model._meta.get_field(field).get_internal_type().endswith("IntegerField")
+    return JsonResponse({
+        "ok": True,
+        "mode": "histogram",
+        "field": key,
+        "label": label,
+        "group": group,
+        **histogram(values, groups, bins=bins, integer=integer),
+    })
@@ -0,0 +1,37 @@
+import io
+
+from django.contrib.auth.decorators import login_required
+from django.http import Http404
+from django.shortcuts import render
+
+from accounts.permissions import permissions
+from .forms import RecordImportForm
+from .importing import import_csv
+
+
+@login_required
+def records_import(request):
+    """Upload a CSV of health checks / diabetes assessments (see crm.importing)."""
+    if not permissions(request).add_records:
+        raise Http404()
+
+    result = None
+    form = RecordImportForm(request.POST or None, request.FILES or None)
+
+    if request.method == "POST" and form.is_valid():
+        upload = form.cleaned_data["file"]
+        # Stream the upload (temp file for big ones) instead of reading it all
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        try:
+            result = import_csv(
+                stream, form.cleaned_data["kind"], request.user,
+                dry_run=form.cleaned_data["dry_run"],
+            )
+        finally:
+            stream.detach()
+
+    return render(request, "crm/import.html", {
+        "form": form,
+        "result": result,
+        "dry_run": form.is_bound and form.cleaned_data.get("dry_run"),
+    })
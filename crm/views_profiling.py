@@ -0,0 +1,26 @@
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+from django.shortcuts import redirect, render
+
+from accounts.utils import is_admin
+from . import profiling
+
+
+@login_required
+def profiling_report(request):
+    """Per-view numbers collected by crm.profiling; ?format=json for a dump, POST to reset."""
+    if not (request.user.is_staff or is_admin(request.user)):
+        raise Http404()
+
+    if request.method == "POST":
+        profiling.reset()
+        return redirect("profiling_report")
+
+    rows = profiling.report()
+    if request.GET.get("format") == "json":
+        return JsonResponse({"enabled": profiling.profiling_enabled(), "views": rows})
+
+    return render(request, "crm/profiling.html", {
+        "enabled": profiling.profiling_enabled(),
+        "rows": rows,
+    })
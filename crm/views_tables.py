@@ -3,20 +3,78 @@ from django.http import Http404
 from django.urls import reverse
 from .table_registry import TABLES
 from django.shortcuts import render, redirect, get_object_or_404
-from accounts.utils import can_view_all, can_add_records, can_manage_record
+from accounts.permissions import permissions
 from django.template.loader import render_to_string
-from django.http import HttpResponse
-from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.contrib.auth import get_user_model
+from django.utils.text import slugify
 from django.utils import timezone
-from datetime import timedelta, date
+from datetime import datetime, time, timedelta, date
 from django.db import models
-from accounts.utils import can_access_tables
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+from django.views.decorators.vary import vary_on_headers
 from types import SimpleNamespace
 from forms_builder.models import FormDefinition, FormField, FormSubmission
+from forms_builder.indexing import (
+    search_submissions, parse_answer_filters, filter_submissions, annotate_sort_value, typed_answer,
+)
+from .columns import instance_cells, projection, save_visible_columns, table_columns, visible_columns
+from .export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS
+from .models import Person
+from .pagination import keyset_page, ordering_for, parse_sort
+from .result_cache import digest
+from .search import search_queryset, is_ranked
+from .versions import version_tag
+
+def _tables_etag(request):
+    """
+    Validator for HTMX reloads of the rows (table_tbody.html), computed
+    before any row query: model tables use their data versions, form
+    tables the schema version plus max(id)/count of the visible
+    submissions. Full page loads are always rendered (None).
+    """
+    if request.headers.get("HX-Request") != "true":
+        return None
+    perms = permissions(request)
+    if not perms.access_tables:
+        return None
+
+    table_key = request.GET.get("table") or next(iter(TABLES), None)
+    if str(table_key).startswith("form:"):
+        form_id = table_key.partition(":")[2]
+        if not form_id.isdigit():
+            return None
+        schema = FormDefinition.objects.filter(pk=form_id).values_list("schema_version", flat=True).first()
+        if schema is None:
+            return None
+        state = (
+            schema,
+            FormSubmission.objects.filter(form_id=form_id).visible_to(perms)
+            .aggregate(last=models.Max("id"), n=models.Count("id")),
+        )
+    elif table_key in TABLES:
+        cfg = TABLES[table_key]
+        state = (version_tag(cfg.model, Person), [f.name for f in visible_columns(request.user, cfg)])
+    else:
+        return None
+
+    return digest(
+        "tables", sorted(request.GET.lists()), perms, state,
+        # relative date filters ("today", "30d") move at midnight
+        timezone.localdate().isoformat(),
+        # rows carry CSRF-protected forms; a rotated token needs new HTML
+        request.META.get("CSRF_COOKIE"),
+    )
+
 
 @login_required
+@vary_on_headers("HX-Request")
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_tables_etag)
 def tables_page(request):
-    if not can_access_tables(request.user):
+    perms = permissions(request)
+    if not perms.access_tables:
         raise Http404()
 
     # -----------------------------
@@ -46,11 +104,7 @@ def tables_page(request):
     # CASE A) FORM RESULTS (JSON)
     # -----------------------------
     if str(selected_key).startswith("form:"):
-        try:
-            form_id = int(str(selected_key).split(":", 1)[1])
-        except (ValueError, IndexError):
-            raise Http404("Invalid form key")
-
+        form_id = _form_id_or_404(selected_key)
         form_def = get_object_or_404(FormDefinition, id=form_id)
         selected = SimpleNamespace(
             key=f"form:{form_def.id}",
@@ -62,50 +116,37 @@ def tables_page(request):
         column_keys = [f.key for f in fields]
         column_names = [f.label for f in fields]
 
-        subs = FormSubmission.objects.filter(form=form_def)
+        subs = filtered_submissions(request, form_def, fields)
 
-        # Row-level visibility for staff (optional but matches your style)
-        if not can_view_all(request.user) and hasattr(FormSubmission, "submitted_by_id"):
-            subs = subs.filter(submitted_by=request.user)
+        # Sort by any question (typed column) or newest first
+        by_key = {f.key: f for f in fields}
+        sort_name, descending = parse_sort(request.GET.get("sort"), by_key)
+        cursor = request.GET.get("cursor")
+        subs = subs.select_related("submitted_by")
 
-        # Date filter (FormSubmission has created_at DateTimeField)
-        if date_filter != "all":
-            today = timezone.localdate()
-
-            if date_filter == "today":
-                start = today
-            elif date_filter == "week":
-                start = today - timedelta(days=7)
-            elif date_filter == "month":
-                start = date(today.year, today.month, 1)
-            elif date_filter == "30d":
-                start = today - timedelta(days=30)
-            else:
-                start = None
-
-            if start:
-                subs = subs.filter(submitted_at__date__gte=start)
-
-
-        # Search in JSON + username
-        if q:
-            subs = subs.filter(
-                Q(answers__icontains=q) |
-                Q(submitted_by__username__icontains=q)
+        if sort_name in by_key:
+            subs, sort_column = annotate_sort_value(subs, by_key[sort_name])
+            page, next_cursor = keyset_page(
+                subs, "sort_value", descending, cursor, field=sort_column,
             )
-
-        subs = subs.order_by("-id")[:200]
+        else:
+            page, next_cursor = keyset_page(subs, "id", descending, cursor)
 
         # Build rows for template
         rows = []
-        for s in subs:
+        for s in page:
             rows.append({
                 "answers": s.answers or {},
                 "submitted_by": getattr(s.submitted_by, "username", "") if s.submitted_by else "",
                 "submitted_at": s.submitted_at,
             })
 
-        # Add meta cols
+        # Add meta cols ("Submitted At" sorts by id, which follows it)
+        header_columns = _sortable_headers(
+            request, selected.key,
+            [(f.key, f.label) for f in fields] + [(None, "Submitted By"), ("id", "Submitted At")],
+            sort_name, descending,
+        )
         column_names += ["Submitted By", "Submitted At"]
         column_keys += ["__submitted_by", "__submitted_at"]
 
@@ -119,7 +160,13 @@ def tables_page(request):
             "q": q,
             "date_filter": date_filter,
             "can_add": False,      # we don’t add submissions from Tables page
+            "can_import": perms.add_records,
             "mode": "form",
+            "sort": request.GET.get("sort", ""),
+            "header_columns": header_columns,
+            "extra_params": [(k, v) for k, v in request.GET.items() if k.partition(".")[0] in ("eq", "min", "max")],
+            "cursor": cursor,
+            "next_query": _next_page_query(request, selected.key, next_cursor),
         }
 
         template_name = "crm/tables.html"
@@ -134,51 +181,44 @@ def tables_page(request):
     cfg = _get_table_or_404(selected_key)
     selected = cfg
 
-    qs = cfg.model.objects.all()
-
-    # Row-level visibility for staff
-    if not can_view_all(request.user) and hasattr(cfg.model, "created_by"):
-        qs = qs.filter(created_by=request.user)
-
-    # ---- SEARCH ----
-    if q and cfg.search_fields:
-        search_q = Q()
-        for field in cfg.search_fields:
-            search_q |= Q(**{f"{field}__icontains": q})
-        qs = qs.filter(search_q)
-
-    # ---- DATE FILTER ----
-    if cfg.date_field and date_filter != "all":
-        today = timezone.localdate()
-
-        if date_filter == "today":
-            start = today
-        elif date_filter == "week":
-            start = today - timedelta(days=7)
-        elif date_filter == "month":
-            start = date(today.year, today.month, 1)
-        elif date_filter == "30d":
-            start = today - timedelta(days=30)
-        else:
-            start = None
+    # FTS5 index lookup; unsorted searches are ordered by relevance.
+    rank_results = is_ranked(cfg, q, cfg.model.objects.db) and not request.GET.get("sort")
+    qs = filtered_queryset(request, cfg, ranked=rank_results)
 
-        if start:
-            field_obj = cfg.model._meta.get_field(cfg.date_field)
+    # Only the user's chosen columns are fetched (crm.columns)
+    all_fields = table_columns(cfg)
+    fields = visible_columns(request.user, cfg)
+    column_names = [f.verbose_name.title() for f in fields]
+    column_keys = [f.name for f in fields]
 
-            # DateTimeField -> use __date__gte
-            if isinstance(field_obj, models.DateTimeField):
-                qs = qs.filter(**{f"{cfg.date_field}__date__gte": start})
-            else:
-                # DateField -> use __gte
-                qs = qs.filter(**{f"{cfg.date_field}__gte": start})
+    # ---- SORT + KEYSET PAGE ----
+    sort_name, descending = parse_sort(request.GET.get("sort"), [f.name for f in all_fields])
+    sort_field = cfg.model._meta.get_field(sort_name)
+    cursor = request.GET.get("cursor")
 
-    qs = qs.order_by("-id")[:200]
+    owner_field = getattr(cfg.model, "OWNER_FIELD", None)
+    owner_attname = cfg.model._meta.get_field(owner_field).attname if owner_field else None
+    sort_key = "search_rank" if rank_results else sort_field.attname
+    proj = projection(fields, sort_key, *filter(None, [owner_attname]))
 
-    fields = [f for f in cfg.model._meta.fields if f.name != "id"]
-    column_names = [f.verbose_name.title() for f in fields]
-    column_keys = [f.name for f in fields]
+    if rank_results:
+        page, next_cursor = keyset_page(
+            proj.apply(qs), sort_key, False, cursor, row_key=proj.row_key(sort_key),
+        )
+    else:
+        page, next_cursor = keyset_page(
+            proj.apply(qs), sort_key, descending, cursor, field=sort_field, row_key=proj.row_key(sort_key),
+        )
 
-    display_rows = [{"obj": r, "can_manage": can_manage_record(request.user, r)} for r in qs]
+    owner_i = proj.index.get(owner_attname)
+    display_rows = [
+        {
+            "id": row[0],
+            "cells": cells,
+            "can_manage": perms.can_manage_owned_by(row[owner_i] if owner_i is not None else None),
+        }
+        for row, cells in zip(page, proj.cells(page))
+    ]
 
     context = {
         "tables": dropdown,
@@ -188,8 +228,16 @@ def tables_page(request):
         "column_keys": column_keys,
         "q": q,
         "date_filter": date_filter,
-        "can_add": can_add_records(request.user),
+        "can_add": perms.add_records,
+        "can_import": perms.add_records,
         "mode": "model",
+        "sort": request.GET.get("sort", ""),
+        "header_columns": _sortable_headers(
+            request, cfg.key, [(f.name, f.verbose_name.title()) for f in fields], sort_name, descending,
+        ),
+        "column_choices": [(f.name, f.verbose_name.title(), f in fields) for f in all_fields],
+        "cursor": cursor,
+        "next_query": _next_page_query(request, cfg.key, next_cursor),
     }
 
     template_name = "crm/tables.html"
@@ -199,6 +247,188 @@ def tables_page(request):
     return render(request, template_name, context)
 
 
+# -----------------------------
+# Export (CSV / XLSX, streamed)
+# -----------------------------
+@login_required
+def tables_export(request):
+    """
+    Same table, filters and sort as tables_page, every matching row.
+    Rows come from values_list().iterator() so no model instances are
+    built and memory stays flat for any export size.
+    """
+    if not permissions(request).access_tables:
+        raise Http404()
+
+    fmt = request.GET.get("format") or "csv"
+    if fmt not in EXPORT_FORMATS:
+        raise Http404("Unknown export format")
+
+    table_key = request.GET.get("table") or ""
+    if table_key.startswith("form:"):
+        label, header, rows = _export_form(request, table_key)
+    else:
+        label, header, rows = _export_model(request, _get_table_or_404(table_key))
+
+    writer, content_type = EXPORT_FORMATS[fmt]
+    chunks = writer(header, rows, sheet_name=label) if fmt == "xlsx" else writer(header, rows)
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    filename = f"{slugify(label) or 'export'}-{timezone.localdate():%Y%m%d}.{fmt}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _export_model(request, cfg):
+    fields = list(cfg.model._meta.fields)
+    lookups = []
+    for f in fields:
+        # users by username; other FKs as their id
+        if f.is_relation and f.related_model is get_user_model():
+            lookups.append(f"{f.name}__{get_user_model().USERNAME_FIELD}")
+        else:
+            lookups.append(f.attname)
+
+    qs = filtered_queryset(request, cfg)
+    sort_name, descending = parse_sort(request.GET.get("sort"), [f.name for f in fields])
+    qs = qs.order_by(*ordering_for(cfg.model._meta.get_field(sort_name).attname, descending))
+
+    rows = qs.values_list(*lookups).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return cfg.label, [f.verbose_name.title() for f in fields], rows
+
+
+def _export_form(request, table_key):
+    form_def = get_object_or_404(FormDefinition, id=_form_id_or_404(table_key))
+    fields = list(FormField.objects.filter(form=form_def).order_by("order", "id"))
+    subs = filtered_submissions(request, form_def, fields)
+
+    by_key = {f.key: f for f in fields}
+    sort_name, descending = parse_sort(request.GET.get("sort"), by_key)
+    if sort_name in by_key:
+        subs, _ = annotate_sort_value(subs, by_key[sort_name])
+        subs = subs.order_by(*ordering_for("sort_value", descending))
+    else:
+        subs = subs.order_by(*ordering_for("id", descending))
+
+    submissions = subs.values_list("id", "answers", "submitted_by__username", "submitted_at")
+
+    def rows():
+        for pk, answers, username, submitted_at in submissions.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            answers = answers or {}
+            yield (
+                pk,
+                *(typed_answer(f.field_type, answers.get(f.key)) for f in fields),
+                username or "",
+                submitted_at,
+            )
+
+    header = ["ID", *(f.label for f in fields), "Submitted By", "Submitted At"]
+    return form_def.name, header, rows()
+
+
+# -----------------------------
+# Shared filters (tables page + export)
+# -----------------------------
+def _date_start(date_filter: str):
+    today = timezone.localdate()
+    if date_filter == "today":
+        return today
+    if date_filter == "week":
+        return today - timedelta(days=7)
+    if date_filter == "month":
+        return date(today.year, today.month, 1)
+    if date_filter == "30d":
+        return today - timedelta(days=30)
+    return None
+
+
+def _midnight(day: date) -> datetime:
+    """Start of `day` in the current time zone (a plain column comparison, unlike __date)."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _form_id_or_404(table_key: str) -> int:
+    try:
+        return int(str(table_key).split(":", 1)[1])
+    except (ValueError, IndexError):
+        raise Http404("Invalid form key")
+
+
+def filtered_queryset(request, cfg, ranked: bool = False):
+    """cfg.model rows the user may see, after the q/date filters in request.GET."""
+    qs = cfg.model.objects.all()
+
+    # Row-level visibility for staff
+    if hasattr(qs, "visible_to"):
+        qs = qs.visible_to(permissions(request))
+
+    # ---- SEARCH ----
+    qs = search_queryset(cfg, qs, (request.GET.get("q") or "").strip(), ranked=ranked)
+
+    # ---- DATE FILTER ----
+    start = _date_start(request.GET.get("date") or "all")
+    if cfg.date_field and start:
+        field_obj = cfg.model._meta.get_field(cfg.date_field)
+
+        # DateTimeField -> compare with local midnight so the index is usable
+        if isinstance(field_obj, models.DateTimeField):
+            qs = qs.filter(**{f"{cfg.date_field}__gte": _midnight(start)})
+        else:
+            # DateField -> use __gte
+            qs = qs.filter(**{f"{cfg.date_field}__gte": start})
+
+    return qs
+
+
+def filtered_submissions(request, form_def, fields):
+    """form_def submissions the user may see, after the q/date/eq./min./max. filters."""
+    # Row-level visibility for staff
+    subs = FormSubmission.objects.visible_to(permissions(request)).filter(form=form_def)
+
+    start = _date_start(request.GET.get("date") or "all")
+    if start:
+        subs = subs.filter(submitted_at__gte=_midnight(start))
+
+    # Search + eq./min./max. filters go through the typed answer index
+    subs = search_submissions(subs, form_def, (request.GET.get("q") or "").strip())
+    return filter_submissions(subs, form_def, parse_answer_filters(request.GET, fields))
+
+
+def _next_page_query(request, table_key: str, next_cursor):
+    """Querystring for the "load more" row: same filters, next cursor."""
+    if not next_cursor:
+        return ""
+    params = request.GET.copy()
+    params["table"] = table_key
+    params["cursor"] = next_cursor
+    return params.urlencode()
+
+
+def _sortable_headers(request, table_key: str, columns, sort_name: str, descending: bool):
+    """
+    columns: [(sort_key or None, label), ...]
+    Column headers with a link that toggles sort on that column.
+    Changing sort always starts again from the first page.
+    """
+    headers = []
+    for key, label in columns:
+        if key is None:
+            headers.append({"name": label, "sort_query": "", "direction": ""})
+            continue
+
+        params = request.GET.copy()
+        params.pop("cursor", None)
+        params["table"] = table_key
+
+        active = key == sort_name
+        params["sort"] = key if (active and descending) else f"-{key}"
+
+        headers.append({
+            "name": label,
+            "sort_query": params.urlencode(),
+            "direction": ("desc" if descending else "asc") if active else "",
+        })
+    return headers
 
 
 def _get_table_or_404(key: str):
@@ -226,7 +456,7 @@ def _editable_field_names(cfg):
 def table_add_record(request, table_key: str):
     cfg = _get_table_or_404(table_key)
 
-    if not can_add_records(request.user):
+    if not permissions(request).add_records:
         raise Http404()  # or return 403; MVP-friendly to hide it
 
     FormClass = cfg.form
@@ -252,7 +482,8 @@ def table_edit_record(request, table_key: str, pk: int):
     cfg = _get_table_or_404(table_key)
     obj = get_object_or_404(cfg.model, pk=pk)
 
-    if not can_manage_record(request.user, obj):
+    perms = permissions(request)
+    if not perms.can_manage(obj):
         raise Http404()
 
     FormClass = cfg.form
@@ -273,7 +504,8 @@ def table_delete_record(request, table_key: str, pk: int):
     cfg = _get_table_or_404(table_key)
     obj = get_object_or_404(cfg.model, pk=pk)
 
-    if not can_manage_record(request.user, obj):
+    perms = permissions(request)
+    if not perms.can_manage(obj):
         raise Http404()
 
     if request.method == "POST":
@@ -282,21 +514,32 @@ def table_delete_record(request, table_key: str, pk: int):
 
     return render(request, "crm/table_confirm_delete.html", {"selected": cfg, "obj": obj})
 
+@login_required
+@require_POST
+def table_columns_update(request, table_key: str):
+    """POST: save which columns this user sees for a model table."""
+    if not permissions(request).access_tables:
+        raise Http404()
+    cfg = _get_table_or_404(table_key)
+    save_visible_columns(request.user, cfg, request.POST.getlist("columns"))
+    return redirect(f"{reverse('tables_page')}?table={cfg.key}")
+
 def table_row_display(request, table_key: str, pk: int):
     cfg = _get_table_or_404(table_key)
     obj = get_object_or_404(cfg.model, pk=pk)
 
     # Visibility (staff shouldn't be able to fetch other people’s rows)
-    if not can_view_all(request.user) and hasattr(obj, "created_by_id") and obj.created_by_id != request.user.id:
+    perms = permissions(request)
+    if not perms.can_view(obj):
         raise Http404()
 
     html = render_to_string(
         "crm/partials/table_row_display.html",
         {
             "selected": cfg,
-            "row_obj": obj,
-            "column_keys": [f.name for f in cfg.model._meta.fields if f.name != "id"],
-            "can_manage": can_manage_record(request.user, obj),
+            "row_id": obj.pk,
+            "cells": instance_cells(obj, visible_columns(request.user, cfg)),
+            "can_manage": perms.can_manage(obj),
         },
         request=request,
     )
@@ -307,14 +550,15 @@ def table_row_edit(request, table_key: str, pk: int):
     cfg = _get_table_or_404(table_key)
     obj = get_object_or_404(cfg.model, pk=pk)
 
-    if not can_manage_record(request.user, obj):
+    perms = permissions(request)
+    if not perms.can_manage(obj):
         raise Http404()
 
     FormClass = cfg.form
     form = FormClass(instance=obj)
 
     editable = _editable_field_names(cfg)
-    column_keys = [f.name for f in cfg.model._meta.fields if f.name != "id"]
+    column_keys = [f.name for f in visible_columns(request.user, cfg)]
 
     html = render_to_string(
         "crm/partials/table_row_edit.html",
@@ -334,13 +578,14 @@ def table_row_save(request, table_key: str, pk: int):
     cfg = _get_table_or_404(table_key)
     obj = get_object_or_404(cfg.model, pk=pk)
 
-    if not can_manage_record(request.user, obj):
+    perms = permissions(request)
+    if not perms.can_manage(obj):
         raise Http404()
 
     FormClass = cfg.form
     form = FormClass(request.POST, instance=obj)
 
-    column_keys = [f.name for f in cfg.model._meta.fields if f.name != "id"]
+    columns = visible_columns(request.user, cfg)
 
     if form.is_valid():
         form.save()
@@ -348,9 +593,9 @@ def table_row_save(request, table_key: str, pk: int):
             "crm/partials/table_row_display.html",
             {
                 "selected": cfg,
-                "row_obj": obj,
-                "column_keys": column_keys,
-                "can_manage": can_manage_record(request.user, obj),
+                "row_id": obj.pk,
+                "cells": instance_cells(obj, columns),
+                "can_manage": perms.can_manage(obj),
             },
             request=request,
         )
@@ -365,7 +610,7 @@ def table_row_save(request, table_key: str, pk: int):
             "row_obj": obj,
             "form": form,
             "editable_fields": editable,
-            "column_keys": column_keys,
+            "column_keys": [f.name for f in columns],
         },
         request=request,
     )
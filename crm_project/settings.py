@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 AUTH_USER_MODEL = "accounts.User"
@@ -52,6 +53,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'crm.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,6 +65,12 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'crm_project.urls'
 
+# Per-view query/latency profiling (crm.profiling), report at /profiling/.
+# Off unless CRM_PROFILING=1; CRM_PROFILING_MEMORY=1 adds tracemalloc (slow;
+# peaks are kept only for requests that ran with no other request in flight).
+CRM_PROFILING = os.environ.get('CRM_PROFILING') == '1'
+CRM_PROFILING_MEMORY = os.environ.get('CRM_PROFILING_MEMORY') == '1'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -90,12 +98,52 @@ WSGI_APPLICATION = 'crm_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# SQLite profile for many volunteers submitting at once, applied to every
+# new connection. WAL lets readers run alongside the single writer, and
+# IMMEDIATE transactions take the write lock up front so busy_timeout can
+# queue writers instead of failing with "database is locked".
+# CRM_SQLITE_TUNING=0 falls back to SQLite's defaults (see bench_sqlite_writes).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',      # durable at WAL checkpoints; safe with WAL
+    'busy_timeout': 5000,         # ms to wait for the write lock
+    'cache_size': -20000,         # negative = KiB, ~20 MB page cache per connection
+    'mmap_size': 134217728,       # 128 MB of the file read via mmap
+    'temp_store': 'MEMORY',
+}
+SQLITE_TUNING = os.environ.get('CRM_SQLITE_TUNING', '1') != '0'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
+if SQLITE_TUNING:
+    DATABASES['default'].update({
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # keep connections between requests; check them before reuse
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    })
+
+# Cache of computed chart responses (crm.result_cache). "locmem" is a
+# per-process LRU capped at MAX_BYTES; "django" uses CACHES[ALIAS] (file,
+# database, memcached...) so every worker shares it; "none" turns it off.
+# Entries are keyed on the data version, so writes never leave them stale.
+CRM_RESULT_CACHE = {
+    'BACKEND': os.environ.get('CRM_RESULT_CACHE', 'locmem'),
+    'MAX_BYTES': 32 * 1024 * 1024,
+    'ALIAS': 'default',
+}
+
+# Memory-mapped copy of the graphs' numeric columns (crm.snapshot), kept
+# current by `manage.py refresh_snapshot`. Without one the graphs read
+# SQLite directly.
+CRM_SNAPSHOT_DIR = os.environ.get('CRM_SNAPSHOT_DIR', BASE_DIR / 'snapshots')
 
 
 # Password validation
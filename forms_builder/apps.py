@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class FormsBuilderConfig(AppConfig):
     name = 'forms_builder'
+
+    def ready(self):
+        from . import signals  # noqa: F401
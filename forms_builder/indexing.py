@@ -0,0 +1,296 @@
+"""
+Typed side index for FormSubmission.answers (the FormAnswer table).
+
+Every submission gets one FormAnswer row per question of its form holding
+the answer as lower-cased text plus a typed column (number / decimal /
+date) chosen by FormField.field_type, and one FormAnswerWord row per word
+of that text. Search, filters and per-column sort on form results then
+run against indexed columns instead of the JSON blob.
+
+The index is maintained by signals (see forms_builder.signals); code that
+uses bulk_create() must call index_submissions() itself.
+"""
+import re
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import F, FilteredRelation, Q
+from django.utils.dateparse import parse_date
+
+from .models import FormAnswer, FormAnswerWord, FormField, FormSubmission
+
+
+WORD_MAX = 64  # FormAnswerWord.word; longer words are indexed by their first 64 characters
+_WORD_RE = re.compile(r"\w+")
+
+# Which FormAnswer column holds the typed value for each question type
+TYPED_COLUMN = {
+    FormField.TEXT: "value_text",
+    FormField.CHOICE: "value_text",
+    FormField.NUMBER: "value_number",
+    FormField.DECIMAL: "value_decimal",
+    FormField.DATE: "value_date",
+}
+
+_DECIMAL_LIMIT = Decimal("1e14")  # max_digits=20, decimal_places=6
+
+
+def normalise_text(value) -> str:
+    return str(value).strip().lower()
+
+
+def words(text: str) -> list[str]:
+    """The distinct search words of some (normalised) text, in order."""
+    return list(dict.fromkeys(w[:WORD_MAX] for w in _WORD_RE.findall(text)))
+
+
+def _to_int(raw):
+    try:
+        return int(Decimal(str(raw)))
+    except (InvalidOperation, ValueError, TypeError):
+        return None
+
+
+def _to_decimal(raw):
+    try:
+        d = Decimal(str(raw)).quantize(Decimal("0.000001"))
+    except (InvalidOperation, ValueError, TypeError):
+        return None
+    return d if abs(d) < _DECIMAL_LIMIT else None
+
+
+def _to_date(raw):
+    if isinstance(raw, date):
+        return raw
+    try:
+        return parse_date(str(raw)[:10])
+    except ValueError:
+        return None
+
+
+def answer_columns(field_type: str, raw) -> dict:
+    """
+    Map one JSON answer value to FormAnswer column values.
+    Unparseable values keep their text but get a NULL typed column.
+    """
+    cols = {"value_text": "", "value_number": None, "value_decimal": None, "value_date": None}
+    if raw is None or raw == "":
+        return cols
+
+    cols["value_text"] = normalise_text(raw)
+    if field_type == FormField.NUMBER:
+        cols["value_number"] = _to_int(raw)
+    elif field_type == FormField.DECIMAL:
+        cols["value_decimal"] = _to_decimal(raw)
+    elif field_type == FormField.DATE:
+        cols["value_date"] = _to_date(raw)
+    return cols
+
+
+def typed_answer(field_type: str, raw):
+    """An answer as int/Decimal/date for its question type; unparseable values come back unchanged."""
+    if raw is None or raw == "":
+        return None
+    column = TYPED_COLUMN.get(field_type, "value_text")
+    if column == "value_text":
+        return raw
+    value = answer_columns(field_type, raw)[column]
+    return raw if value is None else value
+
+
+def coerce_filter_value(field_type: str, raw):
+    """Turn a filter value from the querystring into the typed column's type."""
+    column = TYPED_COLUMN.get(field_type, "value_text")
+    if column == "value_number":
+        return _to_int(raw)
+    if column == "value_decimal":
+        return _to_decimal(raw)
+    if column == "value_date":
+        return _to_date(raw)
+    return normalise_text(raw)
+
+
+# -----------------------------
+# Writing
+# -----------------------------
+def _rows_for(submission_id: int, form_id: int, answers: dict, fields) -> list[FormAnswer]:
+    answers = answers or {}
+    return [
+        FormAnswer(
+            submission_id=submission_id,
+            form_id=form_id,
+            key=f.key,
+            **answer_columns(f.field_type, answers.get(f.key)),
+        )
+        for f in fields
+    ]
+
+
+def _word_rows(rows) -> list[FormAnswerWord]:
+    return [
+        FormAnswerWord(submission_id=r.submission_id, form_id=r.form_id, key=r.key, word=w)
+        for r in rows
+        for w in words(r.value_text)
+    ]
+
+
+def _save(rows, batch_size: int = 1000):
+    FormAnswer.objects.bulk_create(rows, batch_size=batch_size)
+    FormAnswerWord.objects.bulk_create(_word_rows(rows), batch_size=batch_size)
+
+
+def delete_answers(**filters):
+    """Drop the FormAnswer and FormAnswerWord rows matching `filters` (form/key/submission lookups)."""
+    FormAnswer.objects.filter(**filters).delete()
+    FormAnswerWord.objects.filter(**filters).delete()
+
+
+def index_submissions(submissions, fields=None):
+    """
+    (Re)build the FormAnswer rows of the given submissions, which must all
+    belong to the same form. `fields` defaults to that form's questions.
+    """
+    submissions = list(submissions)
+    if not submissions:
+        return
+
+    form_id = submissions[0].form_id
+    if fields is None:
+        fields = list(FormField.objects.filter(form_id=form_id).only("key", "field_type"))
+
+    delete_answers(submission__in=[s.pk for s in submissions])
+
+    rows = []
+    for s in submissions:
+        rows.extend(_rows_for(s.pk, form_id, s.answers, fields))
+    _save(rows)
+
+
+def index_submission(submission, fields=None):
+    index_submissions([submission], fields)
+
+
+def reindex_field(field, chunk_size: int = 2000):
+    """
+    Rebuild one question's column across every submission of its form,
+    e.g. after its type changed or it was added to a form with results.
+    """
+    delete_answers(form_id=field.form_id, key=field.key)
+
+    subs = (
+        FormSubmission.objects.filter(form_id=field.form_id)
+        .order_by()
+        .values_list("id", "answers")
+    )
+    batch = []
+    for sub_id, answers in subs.iterator(chunk_size=chunk_size):
+        batch.extend(_rows_for(sub_id, field.form_id, answers, [field]))
+        if len(batch) >= chunk_size:
+            _save(batch)
+            batch = []
+    if batch:
+        _save(batch)
+
+
+def reindex_form(form_def, chunk_size: int = 2000) -> int:
+    """Rebuild the whole index for one form. Returns the number of submissions."""
+    fields = list(FormField.objects.filter(form=form_def).only("key", "field_type"))
+    delete_answers(form=form_def)
+
+    subs = (
+        FormSubmission.objects.filter(form=form_def)
+        .order_by()
+        .values_list("id", "answers")
+    )
+    total = 0
+    batch = []
+    for sub_id, answers in subs.iterator(chunk_size=chunk_size):
+        batch.extend(_rows_for(sub_id, form_def.id, answers, fields))
+        total += 1
+        if len(batch) >= chunk_size:
+            _save(batch)
+            batch = []
+    if batch:
+        _save(batch)
+    return total
+
+
+# -----------------------------
+# Reading
+# -----------------------------
+def _prefix_range(column: str, prefix: str) -> dict:
+    # col >= 'abc' AND col < 'abc\U0010ffff' can use the (form, key, col)
+    # index; LIKE 'abc%' cannot on SQLite (case-insensitive LIKE).
+    return {f"{column}__gte": prefix, f"{column}__lt": prefix + "\U0010ffff"}
+
+
+def search_submissions(qs, form_def, q: str):
+    """
+    Keep submissions whose answers contain a word starting with each word
+    of `q` (case-insensitive; "smi" finds "John Smith"), or whose
+    submitter's username contains `q`.
+    """
+    q = normalise_text(q)
+    if not q:
+        return qs
+
+    terms = words(q)
+    if terms:
+        answers = Q()
+        for term in terms:
+            answers &= Q(pk__in=FormAnswerWord.objects.filter(
+                form=form_def, **_prefix_range("word", term)
+            ).values("submission_id"))
+    else:
+        # only punctuation: nothing to look up by word
+        answers = Q(pk__in=FormAnswer.objects.filter(form=form_def, value_text__contains=q).values("submission_id"))
+
+    return qs.filter(answers | Q(submitted_by__username__icontains=q))
+
+
+def parse_answer_filters(params, fields) -> list[tuple]:
+    """
+    Read answer filters from a querystring:
+        eq.<key>=value    equality
+        min.<key>=value   >= (number/decimal/date/text)
+        max.<key>=value   <=
+    Returns [(field, lookup, typed_value), ...]; invalid values are ignored.
+    """
+    by_key = {f.key: f for f in fields}
+    lookups = {"eq": "exact", "min": "gte", "max": "lte"}
+    parsed = []
+
+    for name, raw in params.items():
+        prefix, _, key = name.partition(".")
+        if prefix not in lookups or key not in by_key or raw in (None, ""):
+            continue
+        field = by_key[key]
+        value = coerce_filter_value(field.field_type, raw)
+        if value is None or value == "":
+            continue
+        parsed.append((field, lookups[prefix], value))
+    return parsed
+
+
+def filter_submissions(qs, form_def, filters):
+    for field, lookup, value in filters:
+        column = TYPED_COLUMN.get(field.field_type, "value_text")
+        matching = FormAnswer.objects.filter(
+            form=form_def, key=field.key, **{f"{column}__{lookup}": value}
+        ).values("submission_id")
+        qs = qs.filter(pk__in=matching)
+    return qs
+
+
+def annotate_sort_value(qs, field):
+    """
+    Add `sort_value` = this question's typed answer (LEFT JOIN on the
+    (submission, key) unique index, NULL if unanswered).
+    Returns (qs, column_field) where column_field can decode cursors.
+    """
+    column = TYPED_COLUMN.get(field.field_type, "value_text")
+    qs = qs.annotate(
+        sort_answer=FilteredRelation("answer_index", condition=Q(answer_index__key=field.key)),
+        sort_value=F(f"sort_answer__{column}"),
+    )
+    return qs, FormAnswer._meta.get_field(column)
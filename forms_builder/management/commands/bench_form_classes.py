@@ -0,0 +1,86 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from forms_builder.models import FormDefinition, FormField
+from forms_builder.utils import build_dynamic_form, clear_form_class_cache, get_form_class
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare building the form_fill form class per request against the "
+        "schema-versioned cache. Uses a throwaway form unless --form is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--form", type=int, help="FormDefinition id to benchmark.")
+        parser.add_argument("--questions", type=int, default=15, help="Questions on the throwaway form.")
+        parser.add_argument("--iterations", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                form_def = self._form(options)
+                self._run(form_def, options["iterations"])
+                raise _Rollback()  # never keep the throwaway form
+        except _Rollback:
+            pass
+
+    def _form(self, options):
+        if options["form"]:
+            try:
+                return FormDefinition.objects.get(pk=options["form"])
+            except FormDefinition.DoesNotExist:
+                raise CommandError(f"Form {options['form']} does not exist")
+
+        form_def = FormDefinition.objects.create(name="bench (temporary)")
+        types = [FormField.TEXT, FormField.NUMBER, FormField.DECIMAL, FormField.DATE, FormField.CHOICE]
+        for i in range(options["questions"]):
+            FormField.objects.create(
+                form=form_def,
+                key=f"q{i}",
+                label=f"Question {i}",
+                field_type=types[i % len(types)],
+                choices_text="\n".join(f"Option {n}" for n in range(20)),
+                order=i,
+            )
+        form_def.refresh_from_db()
+        return form_def
+
+    def _time(self, label, fn, iterations):
+        fn()  # warm up
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                fn()
+            elapsed = time.perf_counter() - start
+
+        per_call_us = elapsed / iterations * 1e6
+        queries = len(ctx.captured_queries) / iterations
+        self.stdout.write(f"{label:<10} {per_call_us:9.1f} µs/request  {queries:.1f} queries/request")
+        return per_call_us
+
+    def _run(self, form_def, iterations):
+        self.stdout.write(f"Form {form_def.pk} ({form_def.fields.count()} questions), {iterations} iterations")
+
+        def uncached():
+            fields = FormField.objects.filter(form=form_def).order_by("order", "id")
+            build_dynamic_form(fields)()
+
+        def cached():
+            get_form_class(form_def)()
+
+        clear_form_class_cache()
+        before = self._time("rebuild", uncached, iterations)
+        after = self._time("cached", cached, iterations)
+
+        saved = before - after
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved {saved:.1f} µs/request ({saved / before:.0%})"
+        ))
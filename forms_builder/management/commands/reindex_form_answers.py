@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from forms_builder.indexing import reindex_form
+from forms_builder.models import FormDefinition
+
+
+class Command(BaseCommand):
+    help = "Rebuild the typed FormAnswer index from FormSubmission.answers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("form_ids", nargs="*", type=int, help="Only these forms (default: all).")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        forms = FormDefinition.objects.order_by("id")
+        if options["form_ids"]:
+            forms = forms.filter(id__in=options["form_ids"])
+            missing = set(options["form_ids"]) - set(forms.values_list("id", flat=True))
+            if missing:
+                raise CommandError(f"Unknown form id(s): {sorted(missing)}")
+
+        for form_def in forms:
+            n = reindex_form(form_def, chunk_size=options["chunk_size"])
+            self.stdout.write(f"{form_def.name}: indexed {n} submission(s)")
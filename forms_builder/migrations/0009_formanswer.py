@@ -0,0 +1,101 @@
+# Generated by Django 6.0 on 2026-10-18 10:12
+
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.dateparse import parse_date
+
+
+# Frozen copy of forms_builder.indexing.answer_columns() as of this
+# migration (value_text was a 255-character CharField; 0013 widens it)
+TEXT_MAX = 255
+DECIMAL_LIMIT = Decimal("1e14")
+
+
+def answer_columns(field_type, raw):
+    cols = {"value_text": "", "value_number": None, "value_decimal": None, "value_date": None}
+    if raw is None or raw == "":
+        return cols
+
+    cols["value_text"] = str(raw).strip().lower()[:TEXT_MAX]
+    if field_type == "number":
+        try:
+            cols["value_number"] = int(Decimal(str(raw)))
+        except (InvalidOperation, ValueError, TypeError):
+            pass
+    elif field_type == "decimal":
+        try:
+            d = Decimal(str(raw)).quantize(Decimal("0.000001"))
+        except (InvalidOperation, ValueError, TypeError):
+            d = None
+        cols["value_decimal"] = d if d is not None and abs(d) < DECIMAL_LIMIT else None
+    elif field_type == "date":
+        if isinstance(raw, date):
+            cols["value_date"] = raw
+        else:
+            try:
+                cols["value_date"] = parse_date(str(raw)[:10])
+            except ValueError:
+                pass
+    return cols
+
+
+def backfill_answer_index(apps, schema_editor):
+    FormField = apps.get_model("forms_builder", "FormField")
+    FormSubmission = apps.get_model("forms_builder", "FormSubmission")
+    FormAnswer = apps.get_model("forms_builder", "FormAnswer")
+
+    fields_by_form = {}
+    for f in FormField.objects.all().only("form_id", "key", "field_type"):
+        fields_by_form.setdefault(f.form_id, []).append(f)
+
+    batch = []
+    for sub_id, form_id, answers in FormSubmission.objects.values_list("id", "form_id", "answers").iterator():
+        for f in fields_by_form.get(form_id, []):
+            batch.append(FormAnswer(
+                submission_id=sub_id,
+                form_id=form_id,
+                key=f.key,
+                **answer_columns(f.field_type, (answers or {}).get(f.key)),
+            ))
+        if len(batch) >= 2000:
+            FormAnswer.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        FormAnswer.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms_builder', '0008_formfield_is_displayed'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='formsubmission',
+            name='answers',
+            field=models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder),
+        ),
+        migrations.CreateModel(
+            name='FormAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.SlugField(db_index=False)),
+                ('value_text', models.CharField(blank=True, max_length=255)),
+                ('value_number', models.BigIntegerField(blank=True, null=True)),
+                ('value_decimal', models.DecimalField(blank=True, decimal_places=6, max_digits=20, null=True)),
+                ('value_date', models.DateField(blank=True, null=True)),
+                ('form', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='forms_builder.formdefinition')),
+                ('submission', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='answer_index', to='forms_builder.formsubmission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['form', 'key', 'value_text'], name='formanswer_text_idx'), models.Index(fields=['form', 'key', 'value_number'], name='formanswer_number_idx'), models.Index(fields=['form', 'key', 'value_decimal'], name='formanswer_decimal_idx'), models.Index(fields=['form', 'key', 'value_date'], name='formanswer_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('submission', 'key'), name='formanswer_submission_key')],
+            },
+        ),
+        migrations.RunPython(backfill_answer_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms_builder', '0009_formanswer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formdefinition',
+            name='schema_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
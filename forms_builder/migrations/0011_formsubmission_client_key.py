@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 18:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms_builder', '0010_formdefinition_schema_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formsubmission',
+            name='client_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='formsubmission',
+            constraint=models.UniqueConstraint(fields=('form', 'client_key'), name='formsubmission_client_key'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 6.0 on 2026-10-18 18:57
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copies of forms_builder.indexing.normalise_text() / words()
+WORD_MAX = 64
+WORD_RE = re.compile(r"\w+")
+
+
+def normalise_text(value):
+    return str(value).strip().lower()
+
+
+def split_words(text):
+    return list(dict.fromkeys(w[:WORD_MAX] for w in WORD_RE.findall(text)))
+
+
+def index_words(apps, schema_editor, chunk_size=2000):
+    """Restore the text cut at 255 characters and index the words of every answer."""
+    FormSubmission = apps.get_model("forms_builder", "FormSubmission")
+    FormAnswer = apps.get_model("forms_builder", "FormAnswer")
+    FormAnswerWord = apps.get_model("forms_builder", "FormAnswerWord")
+
+    def flush(answers_by_id):
+        rows = list(FormAnswer.objects.filter(submission_id__in=answers_by_id).exclude(value_text=""))
+        cut, word_rows = [], []
+        for row in rows:
+            text = normalise_text((answers_by_id[row.submission_id] or {}).get(row.key, row.value_text))
+            if text != row.value_text:
+                row.value_text = text
+                cut.append(row)
+            word_rows.extend(
+                FormAnswerWord(submission_id=row.submission_id, form_id=row.form_id, key=row.key, word=w)
+                for w in split_words(row.value_text)
+            )
+        FormAnswer.objects.bulk_update(cut, ["value_text"], batch_size=1000)
+        FormAnswerWord.objects.bulk_create(word_rows, batch_size=1000)
+
+    chunk = {}
+    subs = FormSubmission.objects.order_by().values_list("id", "answers")
+    for sub_id, answers in subs.iterator(chunk_size=chunk_size):
+        chunk[sub_id] = answers
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = {}
+    if chunk:
+        flush(chunk)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms_builder', '0012_formsubmission_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='formanswer',
+            name='value_text',
+            field=models.TextField(blank=True),
+        ),
+        migrations.CreateModel(
+            name='FormAnswerWord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.SlugField(db_index=False)),
+                ('word', models.CharField(max_length=64)),
+                ('form', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='forms_builder.formdefinition')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='forms_builder.formsubmission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['form', 'word', 'submission'], name='formanswerword_word_idx')],
+            },
+        ),
+        migrations.RunPython(index_words, migrations.RunPython.noop),
+    ]
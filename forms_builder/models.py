@@ -1,6 +1,9 @@
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
+from accounts.permissions import VisibleQuerySet
+
 
 class FormDefinition(models.Model):
     KIND_GENERIC = "GENERIC"
@@ -24,6 +27,9 @@ class FormDefinition(models.Model):
 
     is_system = models.BooleanField(default=False)  # 🔒 system form flag
 
+    # Bumped whenever questions change; keys the compiled form class cache
+    schema_version = models.PositiveIntegerField(default=1)
+
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -75,8 +81,6 @@ class FormField(models.Model):
     def __str__(self):
         return f"{self.form.name}: {self.label}"
 
-
-class FormSubmission(models.Model):
     def choices_list(self):
         return [
             (c.strip(), c.strip())
@@ -85,18 +89,103 @@ class FormSubmission(models.Model):
         ]
 
 
+class FormSubmission(models.Model):
+    OWNER_FIELD = "submitted_by"  # see accounts.permissions
 
     form = models.ForeignKey(
         FormDefinition,
         on_delete=models.CASCADE,
-        related_name="submissions"
+        related_name="submissions",
+        db_index=False,  # covered by formsubmission_form_idx
     )
     submitted_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.PROTECT
     )
     submitted_at = models.DateTimeField(auto_now_add=True)
-    answers = models.JSONField(default=dict)
+    # DjangoJSONEncoder so date/decimal answers from cleaned_data serialise
+    answers = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    # Idempotency key from offline clients (views_sync); NULL for web submissions
+    client_key = models.CharField(max_length=64, null=True, blank=True, editable=False)
+
+    objects = VisibleQuerySet.as_manager()
 
     class Meta:
         ordering = ["-submitted_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["form", "client_key"], name="formsubmission_client_key"),
+        ]
+        indexes = [
+            # Results/Tables: WHERE form = ? ORDER BY id DESC
+            models.Index(fields=["form", "-id"], name="formsubmission_form_idx"),
+            # Staff see their own submissions, optionally since a date
+            models.Index(fields=["form", "submitted_by", "submitted_at"], name="formsubmission_owner_idx"),
+        ]
+
+
+class FormAnswer(models.Model):
+    """
+    Typed, indexed copy of one answer in FormSubmission.answers
+    (one row per submission + question). Maintained on write by
+    forms_builder.indexing so results can be searched, filtered and
+    sorted in SQL instead of scanning the JSON.
+    """
+    submission = models.ForeignKey(
+        FormSubmission,
+        on_delete=models.CASCADE,
+        related_name="answer_index",
+        db_index=False,  # covered by the (submission, key) constraint
+    )
+    form = models.ForeignKey(
+        FormDefinition,
+        on_delete=models.CASCADE,
+        related_name="+",
+        db_index=False,  # covered by the (form, key, ...) indexes
+    )
+    key = models.SlugField(max_length=50, db_index=False)
+
+    # lower-cased text of every answer, in full (text filters + text/choice sort)
+    value_text = models.TextField(blank=True)
+    value_number = models.BigIntegerField(null=True, blank=True)
+    value_decimal = models.DecimalField(max_digits=20, decimal_places=6, null=True, blank=True)
+    value_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["submission", "key"], name="formanswer_submission_key"),
+        ]
+        indexes = [
+            models.Index(fields=["form", "key", "value_text"], name="formanswer_text_idx"),
+            models.Index(fields=["form", "key", "value_number"], name="formanswer_number_idx"),
+            models.Index(fields=["form", "key", "value_decimal"], name="formanswer_decimal_idx"),
+            models.Index(fields=["form", "key", "value_date"], name="formanswer_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.submission_id}.{self.key}"
+
+
+class FormAnswerWord(models.Model):
+    """
+    One word of one answer (FormAnswer.value_text split on non-word
+    characters), so free-text search on form results can match a word
+    anywhere in an answer through the (form, word) index.
+    """
+    submission = models.ForeignKey(FormSubmission, on_delete=models.CASCADE, related_name="+")
+    form = models.ForeignKey(
+        FormDefinition,
+        on_delete=models.CASCADE,
+        related_name="+",
+        db_index=False,  # covered by the (form, word) index
+    )
+    key = models.SlugField(max_length=50, db_index=False)
+    word = models.CharField(max_length=64)
+
+    class Meta:
+        indexes = [
+            # prefix range on word, submission_id read from the index
+            models.Index(fields=["form", "word", "submission"], name="formanswerword_word_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.submission_id}.{self.key}: {self.word}"
@@ -0,0 +1,47 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import FormField, FormSubmission
+from .indexing import delete_answers, index_submission, reindex_field
+from .utils import bump_schema_version
+
+
+@receiver(post_save, sender=FormSubmission)
+def index_saved_submission(sender, instance, raw=False, **kwargs):
+    if raw:
+        return  # loaddata
+    index_submission(instance)
+
+
+@receiver(pre_save, sender=FormField)
+def remember_field_schema(sender, instance, raw=False, **kwargs):
+    instance._indexed_as = None
+    if raw or not instance.pk:
+        return
+    instance._indexed_as = (
+        FormField.objects.filter(pk=instance.pk).values_list("key", "field_type").first()
+    )
+
+
+@receiver(post_save, sender=FormField)
+def reindex_changed_field(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    # Any question change (label, required, choices...) invalidates the
+    # cached form class for this form.
+    bump_schema_version(instance.form_id)
+
+    before = getattr(instance, "_indexed_as", None)
+    if not created and before == (instance.key, instance.field_type):
+        return  # label/order/required changes don't affect the index
+
+    if before and before[0] != instance.key:
+        delete_answers(form_id=instance.form_id, key=before[0])
+    reindex_field(instance)
+
+
+@receiver(post_delete, sender=FormField)
+def drop_deleted_field(sender, instance, **kwargs):
+    bump_schema_version(instance.form_id)
+    delete_answers(form_id=instance.form_id, key=instance.key)
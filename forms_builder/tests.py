@@ -1,3 +1,167 @@
+import json
+from datetime import date
+from decimal import Decimal
+
 from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import User
+from .indexing import filter_submissions, parse_answer_filters, search_submissions
+from .models import FormAnswer, FormDefinition, FormField, FormSubmission
+from .utils import clear_form_class_cache, get_form_class
+
+
+class AnswerIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("manager", password="x", role="MANAGER")
+        self.form = FormDefinition.objects.create(name="Coffee", created_by=self.user)
+        self.fields = [
+            FormField.objects.create(form=self.form, key="name", label="Name", order=0),
+            FormField.objects.create(form=self.form, key="cups", label="Cups", field_type=FormField.NUMBER, order=1),
+            FormField.objects.create(form=self.form, key="spend", label="Spend", field_type=FormField.DECIMAL, order=2),
+            FormField.objects.create(form=self.form, key="visit", label="Visit", field_type=FormField.DATE, order=3),
+        ]
+
+    def submit(self, **answers):
+        return FormSubmission.objects.create(form=self.form, submitted_by=self.user, answers=answers)
+
+    def ids(self, qs):
+        return set(qs.values_list("id", flat=True))
+
+    def test_submission_is_indexed_with_typed_columns(self):
+        s = self.submit(name="Ada Lovelace", cups=3, spend=Decimal("4.50"), visit=date(2025, 5, 1))
+        row = {a.key: a for a in FormAnswer.objects.filter(submission=s)}
+
+        self.assertEqual(row["name"].value_text, "ada lovelace")
+        self.assertEqual(row["cups"].value_number, 3)
+        self.assertEqual(row["spend"].value_decimal, Decimal("4.5"))
+        self.assertEqual(row["visit"].value_date, date(2025, 5, 1))
+
+    def test_search_and_range_filters(self):
+        a = self.submit(name="Ada", cups=1, visit="2025-01-10")
+        b = self.submit(name="Bob", cups=4, visit="2025-03-02")
+        c = self.submit(name="Adam", cups=9)
+        base = FormSubmission.objects.filter(form=self.form)
+
+        self.assertEqual(self.ids(search_submissions(base, self.form, "AD")), {a.id, c.id})
+
+        filters = parse_answer_filters({"min.cups": "2", "max.cups": "9", "eq.bogus": "1"}, self.fields)
+        self.assertEqual(self.ids(filter_submissions(base, self.form, filters)), {b.id, c.id})
+
+        filters = parse_answer_filters({"max.visit": "2025-02-01"}, self.fields)
+        self.assertEqual(self.ids(filter_submissions(base, self.form, filters)), {a.id})
+
+    def test_search_matches_words_anywhere_in_an_answer(self):
+        john = self.submit(name="John Smith")
+        jane = self.submit(name="Jane Smithson-Hale")
+        self.submit(name="Blacksmith")
+        long = self.submit(name="x " * 200 + "Zebra")
+        base = FormSubmission.objects.filter(form=self.form)
+
+        self.assertEqual(self.ids(search_submissions(base, self.form, "smith")), {john.id, jane.id})
+        self.assertEqual(self.ids(search_submissions(base, self.form, "hale jane")), {jane.id})
+        self.assertEqual(self.ids(search_submissions(base, self.form, "john hale")), set())
+        # answers are indexed in full, not cut at 255 characters
+        self.assertEqual(self.ids(search_submissions(base, self.form, "zebra")), {long.id})
+        self.assertTrue(FormAnswer.objects.get(submission=long, key="name").value_text.endswith("zebra"))
+
+    def test_changing_question_type_reindexes_existing_answers(self):
+        s = self.submit(name="42")
+        name = self.fields[0]
+        name.field_type = FormField.NUMBER
+        name.save()
+        self.assertEqual(FormAnswer.objects.get(submission=s, key="name").value_number, 42)
+
+    def test_tables_page_sorts_by_question(self):
+        for cups in (5, None, 2, 7):
+            self.submit(name="x", cups=cups)
+        self.client.force_login(self.user)
+
+        res = self.client.get(reverse("tables_page"), {"table": f"form:{self.form.id}", "sort": "cups"})
+        cups = [r["answers"].get("cups") for r in res.context["rows"]]
+        self.assertEqual(cups, [2, 5, 7, None])
+
+
+class FormClassCacheTests(TestCase):
+    def setUp(self):
+        clear_form_class_cache()
+        self.user = User.objects.create_user("manager", password="x", role="MANAGER")
+        self.form = FormDefinition.objects.create(name="Coffee", created_by=self.user)
+        self.a = FormField.objects.create(form=self.form, key="a", label="A", order=0)
+        self.b = FormField.objects.create(
+            form=self.form, key="b", label="B", field_type=FormField.CHOICE,
+            choices_text="Tea\nCoffee", order=1,
+        )
+
+    def fresh(self):
+        return FormDefinition.objects.get(pk=self.form.pk)
+
+    def test_cache_hit_costs_no_queries(self):
+        form_def = self.fresh()
+        first = get_form_class(form_def)
+        with self.assertNumQueries(0):
+            self.assertIs(get_form_class(form_def), first)
+        self.assertEqual(first.base_fields["b"].choices, [("Tea", "Tea"), ("Coffee", "Coffee")])
+
+    def test_question_changes_and_reorder_invalidate(self):
+        before = get_form_class(self.fresh())
+
+        self.a.label = "Renamed"
+        self.a.save()
+        edited = get_form_class(self.fresh())
+        self.assertIsNot(edited, before)
+        self.assertEqual(edited.base_fields["a"].label, "Renamed")
+
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse("fields_reorder", args=[self.form.pk]),
+            data=f'{{"ids": [{self.b.pk}, {self.a.pk}]}}',
+            content_type="application/json",
+        )
+        self.assertEqual(list(get_form_class(self.fresh()).base_fields), ["b", "a"])
+
+
+class SyncApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("vol", password="x", role="VOLUNTEER")
+        self.form = FormDefinition.objects.create(name="Coffee", created_by=self.user)
+        FormField.objects.create(form=self.form, key="name", label="Name", required=True, order=0)
+        FormField.objects.create(
+            form=self.form, key="drink", label="Drink", field_type=FormField.CHOICE,
+            choices_text="Tea\nCoffee", order=1,
+        )
+        self.client.force_login(self.user)
+
+    def sync(self, *entries):
+        res = self.client.post(
+            reverse("form_sync", args=[self.form.pk]),
+            data=json.dumps({"submissions": list(entries)}),
+            content_type="application/json",
+        )
+        self.assertEqual(res.status_code, 200)
+        return [(r["client_key"], r["status"]) for r in res.json()["results"]]
+
+    def test_schema_describes_questions(self):
+        schema = self.client.get(reverse("form_schema", args=[self.form.pk])).json()
+        self.assertEqual([f["key"] for f in schema["fields"]], ["name", "drink"])
+        self.assertEqual(schema["fields"][1]["choices"], ["Tea", "Coffee"])
+        self.assertEqual(schema["sync_url"], reverse("form_sync", args=[self.form.pk]))
+
+    def test_batch_is_validated_and_idempotent(self):
+        a = {"client_key": "a", "answers": {"name": "Ada", "drink": "Tea"}}
+        b = {"client_key": "b", "answers": {"name": "Bob"}}
+        bad = {"client_key": "c", "answers": {"drink": "Gin"}}
+
+        self.assertEqual(
+            self.sync(a, b, bad, a),
+            [("a", "created"), ("b", "created"), ("c", "invalid"), ("a", "duplicate")],
+        )
+        # client retries after a dropped response
+        self.assertEqual(self.sync(a, b), [("a", "duplicate"), ("b", "duplicate")])
+
+        subs = FormSubmission.objects.filter(form=self.form)
+        self.assertEqual(subs.count(), 2)
+        self.assertEqual(self.ids(search_submissions(subs, self.form, "ad")), {subs.get(client_key="a").id})
 
-# Create your tests here.
+    def ids(self, qs):
+        return set(qs.values_list("id", flat=True))
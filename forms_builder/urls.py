@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import forms_page, form_create, form_fill, form_results, form_delete,fields_reorder
 from .views_questions import questions_list, question_add, question_edit, question_delete
+from .views_sync import form_schema, form_sync
 
 
 
@@ -8,6 +9,8 @@ urlpatterns = [
     path("forms/", forms_page, name="forms_page"),
     path("forms/new/", form_create, name="form_create"),
     path("forms/<int:pk>/fill/", form_fill, name="form_fill"),
+    path("forms/<int:pk>/schema/", form_schema, name="form_schema"),
+    path("forms/<int:pk>/sync/", form_sync, name="form_sync"),
     path("forms/<int:pk>/results/", form_results, name="form_results"),
     path("forms/<int:pk>/questions/", questions_list, name="questions_list"),
     path("forms/<int:pk>/questions/new/", question_add, name="question_add"),
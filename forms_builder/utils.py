@@ -1,5 +1,11 @@
+import threading
+from collections import OrderedDict
+
 from django import forms
-from .models import FormField
+from django.conf import settings
+from django.db.models import F
+
+from .models import FormDefinition, FormField
 
 def build_dynamic_form(fields):
     """
@@ -34,3 +40,54 @@ def build_dynamic_form(fields):
             form_fields[f.key] = forms.CharField(**common)
 
     return type("DynamicForm", (forms.Form,), form_fields)
+
+
+# -----------------------------
+# Compiled form class cache
+# -----------------------------
+# Keyed by (form id, schema_version). Every process reads schema_version
+# from the FormDefinition row it already loaded for the request, so a
+# bump in one worker invalidates the cached class in all of them.
+# Django copies base_fields per form instance, so sharing a class is safe.
+FORM_CLASS_CACHE_SIZE = getattr(settings, "FORMS_BUILDER_FORM_CACHE_SIZE", 128)
+
+_form_classes: OrderedDict = OrderedDict()
+_form_classes_lock = threading.Lock()
+
+
+def get_form_class(form_def):
+    """
+    Cached build_dynamic_form() for a FormDefinition (LRU, size
+    FORMS_BUILDER_FORM_CACHE_SIZE). Costs no queries on a hit.
+    """
+    key = (form_def.pk, form_def.schema_version)
+
+    with _form_classes_lock:
+        form_class = _form_classes.get(key)
+        if form_class is not None:
+            _form_classes.move_to_end(key)
+            return form_class
+
+    fields = FormField.objects.filter(form=form_def).order_by("order", "id")
+    form_class = build_dynamic_form(fields)
+
+    with _form_classes_lock:
+        # Older versions of this form can never be hit again
+        for stale in [k for k in _form_classes if k[0] == form_def.pk]:
+            del _form_classes[stale]
+
+        _form_classes[key] = form_class
+        while len(_form_classes) > FORM_CLASS_CACHE_SIZE:
+            _form_classes.popitem(last=False)
+
+    return form_class
+
+
+def bump_schema_version(form_id: int):
+    """Call after any change to a form's questions (add/edit/delete/reorder)."""
+    FormDefinition.objects.filter(pk=form_id).update(schema_version=F("schema_version") + 1)
+
+
+def clear_form_class_cache():
+    with _form_classes_lock:
+        _form_classes.clear()
@@ -8,7 +8,9 @@ from django.views.decorators.http import require_POST
 from accounts.utils import can_manage_forms, can_fill_forms
 from .models import FormDefinition, FormField, FormSubmission
 from .forms import FormDefinitionForm
-from .utils import build_dynamic_form
+from .utils import get_form_class, bump_schema_version
+from .indexing import search_submissions, parse_answer_filters, filter_submissions
+from .views_sync import MAX_SYNC_BATCH
 
 
 @login_required
@@ -50,8 +52,7 @@ def form_fill(request, pk: int):
     if form_def.is_system or form_def.kind == FormDefinition.KIND_HEALTHCHECK:
         return redirect("diabetes_risk_form", pk=form_def.id)
 
-    fields = FormField.objects.filter(form=form_def).order_by("order", "id")
-    DynamicForm = build_dynamic_form(fields)
+    DynamicForm = get_form_class(form_def)
 
     if request.method == "POST":
         form = DynamicForm(request.POST)
@@ -74,7 +75,8 @@ def form_fill(request, pk: int):
     return render(request, "forms_builder/form_fill.html", {
         "form_def": form_def,
         "form": form,
-        "fields_count": fields.count(),
+        "fields_count": len(DynamicForm.base_fields),
+        "max_sync_batch": MAX_SYNC_BATCH,
     })
 
 
@@ -89,14 +91,12 @@ def form_results(request, pk: int):
 
     qs = FormSubmission.objects.filter(form=form_def).order_by("-submitted_at")
 
-    q = (request.GET.get("q") or "").strip().lower()
-    submissions = list(qs[:500])
+    # Search / eq.<key> / min.<key> / max.<key> run on the typed answer index
+    q = (request.GET.get("q") or "").strip()
+    qs = search_submissions(qs, form_def, q)
+    qs = filter_submissions(qs, form_def, parse_answer_filters(request.GET, fields))
 
-    if q:
-        submissions = [
-            s for s in submissions
-            if any(q in str(v).lower() for v in (s.answers or {}).values())
-        ]
+    submissions = list(qs[:500])
 
     column_keys = [f.key for f in fields]
     column_labels = [f.label for f in fields]
@@ -147,4 +147,5 @@ def fields_reorder(request, pk: int):
         f.order = id_to_pos[f.id]
 
     FormField.objects.bulk_update(qs, ["order"])
+    bump_schema_version(form_def.id)  # bulk_update skips the FormField signals
     return JsonResponse({"ok": True})
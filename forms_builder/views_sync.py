@@ -0,0 +1,138 @@
+"""
+Offline sync for form_fill: a client downloads the form schema, queues
+entries locally, then posts them in one batch. Each entry carries a
+client_key so a retried sync never creates duplicates.
+"""
+import json
+
+from django.contrib.auth.decorators import login_required
+from django.db import IntegrityError, transaction
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
+
+from accounts.utils import can_fill_forms
+from .indexing import index_submissions
+from .models import FormDefinition, FormField, FormSubmission
+from .utils import get_form_class
+
+
+MAX_SYNC_BATCH = 500
+CLIENT_KEY_MAX = FormSubmission._meta.get_field("client_key").max_length
+
+
+def _fillable_form_or_404(request, pk: int) -> FormDefinition:
+    if not can_fill_forms(request.user):
+        raise Http404()
+    form_def = get_object_or_404(FormDefinition, pk=pk)
+    # System forms are filled through their own coded form (see form_fill)
+    if form_def.is_system or form_def.kind == FormDefinition.KIND_HEALTHCHECK:
+        raise Http404()
+    return form_def
+
+
+@login_required
+@require_GET
+def form_schema(request, pk: int):
+    form_def = _fillable_form_or_404(request, pk)
+    fields = FormField.objects.filter(form=form_def).order_by("order", "id")
+
+    return JsonResponse({
+        "id": form_def.id,
+        "name": form_def.name,
+        "schema_version": form_def.schema_version,
+        "sync_url": reverse("form_sync", args=[form_def.id]),
+        "max_batch": MAX_SYNC_BATCH,
+        "fields": [
+            {
+                "key": f.key,
+                "label": f.label,
+                "type": f.field_type,
+                "required": f.required,
+                "choices": [value for value, _ in f.choices_list()] if f.field_type == FormField.CHOICE else [],
+            }
+            for f in fields
+        ],
+    })
+
+
+@login_required
+@require_POST
+def form_sync(request, pk: int):
+    """
+    POST {"submissions": [{"client_key": "...", "answers": {...}}, ...]}
+
+    Every entry gets a result, in order: "created" (with id), "duplicate"
+    (already synced; id of the stored row) or "invalid" (with errors).
+    Valid entries are saved even when others are invalid, in one
+    transaction with a single bulk_create.
+    """
+    form_def = _fillable_form_or_404(request, pk)
+
+    try:
+        entries = json.loads(request.body.decode("utf-8")).get("submissions")
+    except (ValueError, UnicodeDecodeError, AttributeError):
+        entries = None
+    if not isinstance(entries, list):
+        return JsonResponse({"ok": False, "error": "Expected {\"submissions\": [...]}"}, status=400)
+    if len(entries) > MAX_SYNC_BATCH:
+        return JsonResponse({"ok": False, "error": f"At most {MAX_SYNC_BATCH} submissions per sync"}, status=400)
+
+    DynamicForm = get_form_class(form_def)
+
+    results = []
+    valid = {}  # client_key -> (result index, cleaned answers)
+    for entry in entries:
+        entry = entry if isinstance(entry, dict) else {}
+        key = entry.get("client_key")
+        answers = entry.get("answers")
+
+        if not isinstance(key, str) or not 0 < len(key) <= CLIENT_KEY_MAX:
+            results.append({"client_key": key, "status": "invalid",
+                            "errors": {"client_key": [f"Required, at most {CLIENT_KEY_MAX} characters."]}})
+            continue
+        if key in valid:
+            results.append({"client_key": key, "status": "duplicate"})
+            continue
+
+        form = DynamicForm(data=answers if isinstance(answers, dict) else {})
+        if not form.is_valid():
+            results.append({"client_key": key, "status": "invalid", "errors": form.errors.get_json_data()})
+            continue
+
+        valid[key] = (len(results), form.cleaned_data)
+        results.append({"client_key": key, "status": "created"})
+
+    # A concurrent sync of the same queue can win the unique constraint;
+    # then re-read what exists and try once more.
+    for attempt in range(2):
+        existing = dict(
+            FormSubmission.objects.filter(form=form_def, client_key__in=list(valid))
+            .values_list("client_key", "id")
+        )
+        new = [
+            FormSubmission(form=form_def, submitted_by=request.user, answers=cleaned, client_key=key)
+            for key, (_, cleaned) in valid.items()
+            if key not in existing
+        ]
+        try:
+            with transaction.atomic():
+                FormSubmission.objects.bulk_create(new, batch_size=500)
+                index_submissions(new)  # bulk_create skips the post_save indexer
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+
+    ids = {**existing, **{s.client_key: s.pk for s in new}}
+    for key, (i, _) in valid.items():
+        results[i]["id"] = ids[key]
+        if key in existing:
+            results[i]["status"] = "duplicate"
+    # repeats inside the batch point at the same row
+    for r in results:
+        if r["status"] == "duplicate" and "id" not in r:
+            r["id"] = ids.get(r["client_key"])
+
+    return JsonResponse({"ok": True, "schema_version": form_def.schema_version, "results": results})